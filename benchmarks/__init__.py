@@ -0,0 +1 @@
+"""Load-testing harness and fake Ollama server for the chatbot backend."""
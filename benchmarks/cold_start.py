@@ -0,0 +1,210 @@
+"""@file cold_start.py
+@description The cold-start benchmark. It measures how quickly a new backend
+process becomes useful: how long importing each module takes in a fresh
+interpreter (with the packages that account for most of it, from
+`python -X importtime`), and the time from spawning the production launcher
+to the first 200 from `/api/health`. Every measurement is repeated in a new
+process and the results are written as JSON, tagged with the git commit so
+runs can be compared.
+
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --compare reports/cold-start-baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+from benchmarks.load_test import ROOT, _free_port, _git_commit, _stop, percentile
+
+# Modules whose import time is reported: the app, and the agent stack it
+# imports lazily.
+DEFAULT_MODULES = "src.server,src.agent.context"
+
+
+def parse_importtime(output: str) -> dict[str, tuple[int, int]]:
+    """Parses the report `python -X importtime` writes to stderr.
+
+    Args:
+    ----
+        output: The interpreter's stderr.
+
+    Returns:
+    -------
+        The self and cumulative import time of each module, in microseconds.
+
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|", 2)
+        with contextlib.suppress(ValueError):
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def heaviest_packages(times: dict[str, tuple[int, int]], limit: int = 10) -> dict[str, float]:
+    """Sums the self time of every module by top-level package.
+
+    Returns
+    -------
+        The `limit` packages with the most import time, in milliseconds.
+
+    """
+    totals: Counter = Counter()
+    for name, (self_us, _) in times.items():
+        totals[name.split(".", 1)[0]] += self_us
+    return {package: round(us / 1000, 1) for package, us in totals.most_common(limit)}
+
+
+def measure_import(module: str) -> tuple[float, dict[str, tuple[int, int]]]:
+    """Imports a module in a new interpreter.
+
+    Returns
+    -------
+        The module's cumulative import time in milliseconds, and the
+        per-module import times.
+
+    Raises
+    ------
+        RuntimeError: If the import fails.
+
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],  # noqa: S603
+        cwd=ROOT, capture_output=True, text=True, check=False,
+    )
+    times = parse_importtime(result.stderr)
+    if result.returncode != 0 or module not in times:
+        msg = f"Importing {module} failed:\n{result.stderr[-2000:]}"
+        raise RuntimeError(msg)
+    return times[module][1] / 1000, times
+
+
+def measure_startup(timeout: float = 30.0) -> float:
+    """Starts the launcher with one worker and waits for a healthy response.
+
+    Model warm-up is disabled and Ollama is not needed: `/api/health` does
+    not call it.
+
+    Returns
+    -------
+        Milliseconds from spawning the process to the first 200 from
+        `/api/health`.
+
+    Raises
+    ------
+        RuntimeError: If the server exits or is not healthy within `timeout`.
+
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    env = {**os.environ, "WARMUP_ON_STARTUP": "false"}
+    started = time.perf_counter()
+    process = subprocess.Popen([  # noqa: S603
+        sys.executable, "-m", "src.launcher", "--host", "127.0.0.1", "--port", str(port), "--workers", "1",
+    ], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                msg = f"The server exited with code {process.returncode}"
+                raise RuntimeError(msg)
+            with contextlib.suppress(httpx.HTTPError):
+                if httpx.get(url, timeout=0.5).status_code == httpx.codes.OK:
+                    return (time.perf_counter() - started) * 1000
+            time.sleep(0.01)
+    finally:
+        _stop(process)
+    msg = f"Timed out waiting for {url}"
+    raise RuntimeError(msg)
+
+
+def _summary(values: list[float]) -> dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 1),
+        "min": round(min(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    """Describes how the median import and startup times moved.
+
+    Args:
+    ----
+        baseline: A previous results file.
+        current: The results of this run.
+
+    Returns:
+    -------
+        One line per measurement present in both runs.
+
+    """
+    pairs = [
+        (f"import {module}", baseline["imports"].get(module, {}).get("ms"), result["ms"])
+        for module, result in current["imports"].items()
+    ]
+    pairs.append(("startup to /api/health", baseline.get("startup_ms"), current["startup_ms"]))
+    lines = []
+    for label, before, after in pairs:
+        if before and before["p50"]:
+            change = (after["p50"] - before["p50"]) / before["p50"]
+            lines.append(f"{label}: p50 {before['p50']} -> {after['p50']} ms ({change:+.1%})")
+    return lines
+
+
+def main() -> None:
+    """Runs the cold-start benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Measure the chatbot backend's import time and cold start.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per measurement.")
+    parser.add_argument("--modules", default=DEFAULT_MODULES, help="Comma-separated modules to time the import of.")
+    parser.add_argument("--output", default=str(ROOT / "reports" / "cold-start.json"))
+    parser.add_argument("--compare", help="A previous results file to compare against.")
+    args = parser.parse_args()
+    runs = max(1, args.runs)
+
+    imports = {}
+    for module in (name.strip() for name in args.modules.split(",") if name.strip()):
+        samples = [measure_import(module) for _ in range(runs)]
+        imports[module] = {
+            "ms": _summary([total for total, _ in samples]),
+            # From the last run, when the disk cache is warmest.
+            "heaviest_packages_ms": heaviest_packages(samples[-1][1]),
+        }
+        print(f"import {module}: p50={imports[module]['ms']['p50']} ms", file=sys.stderr)  # noqa: T201
+    startup = _summary([measure_startup() for _ in range(runs)])
+    print(f"startup to /api/health: p50={startup['p50']} ms", file=sys.stderr)  # noqa: T201
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "runs": runs,
+            "prewarm_agent_stack": os.environ.get("PREWARM_AGENT_STACK", "true"),
+        },
+        "imports": imports,
+        "startup_ms": startup,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}", file=sys.stderr)  # noqa: T201
+
+    if args.compare:
+        for line in compare(json.loads(Path(args.compare).read_text()), report):
+            print(line, file=sys.stderr)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""@file fake_ollama.py
+@description A stand-in for the Ollama server used by the load-testing
+harness. It implements `/api/chat` (NDJSON streaming, tool calls and the
+empty-message load requests sent by warm-up) and `/api/tags`, with a
+configurable time to first token, token rate, response length and failure
+rate, so the backend can be benchmarked without a GPU or real models.
+
+Run it on its own with:
+
+    python -m benchmarks.fake_ollama --port 11435 --ttft 0.2 --tokens-per-second 40
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+# Arguments used when the fake model decides to call one of the agent's tools.
+TOOL_ARGUMENTS = {
+    "calculator": {"expression": "6*7"},
+    "text_analyzer": {"text": "The quick brown fox jumps over the lazy dog"},
+    "unit_converter": {"value": 10, "from_unit": "km", "to_unit": "miles"},
+}
+
+
+@dataclass
+class FakeOllamaConfig:
+    """Timing and behaviour of the fake server."""
+
+    ttft: float = 0.2
+    tokens_per_second: float = 40.0
+    response_tokens: int = 64
+    failure_rate: float = 0.0
+    tool_calls: bool = True
+    models: list[str] = field(default_factory=lambda: ["fake-model"])
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _line(payload: dict) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _pick_tool_call(tools: list[dict]) -> dict | None:
+    # Call the first offered tool we know valid arguments for.
+    for tool in tools:
+        name = tool.get("function", {}).get("name")
+        if name in TOOL_ARGUMENTS:
+            return {"function": {"name": name, "arguments": TOOL_ARGUMENTS[name]}}
+    return None
+
+
+def _final_chunk(model: str, started: float, ttft: float, eval_count: int, prompt_tokens: int) -> dict:
+    total = time.perf_counter() - started
+    return {
+        "model": model,
+        "created_at": _now(),
+        "message": {"role": "assistant", "content": ""},
+        "done": True,
+        "done_reason": "stop",
+        "total_duration": int(total * 1e9),
+        "load_duration": 0,
+        "prompt_eval_count": prompt_tokens,
+        "prompt_eval_duration": int(ttft * 1e9),
+        "eval_count": eval_count,
+        "eval_duration": max(1, int((total - ttft) * 1e9)),
+    }
+
+
+def create_app(config: FakeOllamaConfig | None = None) -> FastAPI:  # noqa: C901
+    """Builds the fake Ollama application.
+
+    Args:
+    ----
+        config: Timing and behaviour settings. Defaults to `FakeOllamaConfig()`.
+
+    Returns:
+    -------
+        A FastAPI app serving `/api/chat`, `/api/tags` and `/api/ps`.
+
+    """
+    config = config or FakeOllamaConfig()
+    app = FastAPI(title="Fake Ollama")
+    app.state.config = config
+
+    @app.get("/api/tags")
+    async def tags() -> dict:
+        return {"models": [{"name": name, "model": name, "size": 0} for name in config.models]}
+
+    @app.get("/api/ps")
+    async def running() -> dict:
+        # Every model counts as loaded; health checks only need an answer.
+        return {"models": [{"name": name, "model": name, "size_vram": 0} for name in config.models]}
+
+    @app.post("/api/chat", response_model=None)
+    async def chat(request: Request) -> Response:
+        body = await request.json()
+        model = body.get("model", "")
+        messages = body.get("messages", [])
+        started = time.perf_counter()
+
+        if model not in config.models:
+            return JSONResponse({"error": f"model '{model}' not found"}, status_code=404)
+        if random.random() < config.failure_rate:  # noqa: S311
+            return JSONResponse({"error": "injected failure"}, status_code=500)
+        if not messages:
+            # Warm-up requests only load (or unload) the model.
+            return JSONResponse({"model": model, "created_at": _now(), "done": True, "done_reason": "load"})
+
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        tool_call = None
+        if config.tool_calls and body.get("tools") and messages[-1].get("role") != "tool":
+            tool_call = _pick_tool_call(body["tools"])
+
+        async def generate() -> AsyncIterator[bytes]:
+            await asyncio.sleep(config.ttft)
+            if tool_call is not None:
+                yield _line({
+                    "model": model,
+                    "created_at": _now(),
+                    "message": {"role": "assistant", "content": "", "tool_calls": [tool_call]},
+                    "done": False,
+                })
+                yield _line(_final_chunk(model, started, config.ttft, 1, prompt_tokens))
+                return
+
+            interval = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+            for index in range(config.response_tokens):
+                if index:
+                    await asyncio.sleep(interval)
+                yield _line({
+                    "model": model,
+                    "created_at": _now(),
+                    "message": {"role": "assistant", "content": f"token{index} "},
+                    "done": False,
+                })
+            yield _line(_final_chunk(model, started, config.ttft, config.response_tokens, prompt_tokens))
+
+        if body.get("stream", True) is False:
+            chunks = [orjson.loads(line) async for line in generate()]
+            content = "".join(chunk["message"]["content"] for chunk in chunks[:-1])
+            final = chunks[-1]
+            final["message"] = chunks[0]["message"] if tool_call is not None else {
+                "role": "assistant",
+                "content": content,
+            }
+            return JSONResponse(final)
+        return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+    return app
+
+
+def main() -> None:
+    """Runs the fake Ollama server from the command line."""
+    parser = argparse.ArgumentParser(description="Fake Ollama server for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with a 500.")
+    parser.add_argument("--no-tool-calls", action="store_true", help="Never answer with a tool call.")
+    parser.add_argument("--models", default="fake-model", help="Comma-separated model names to report.")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        failure_rate=args.failure_rate,
+        tool_calls=not args.no_tool_calls,
+        models=[name.strip() for name in args.models.split(",") if name.strip()],
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+"""@file load_test.py
+@description The load-testing harness. It starts the fake Ollama server and
+the backend as separate processes (or targets an already running backend),
+drives `/api/chat` and `/api/agent/chat` at each requested concurrency level
+(and, for a local backend, each worker count), and writes throughput, error
+counts and p50/p95/p99 time to first token and total latency as JSON, tagged
+with the git commit so runs can be compared.
+
+    python -m benchmarks.load_test --concurrency 1,4,16 --requests 64
+    python -m benchmarks.load_test --compare reports/benchmark-baseline.json
+    python -m benchmarks.load_test --workers 1,2,4 --ttft 0 --tokens-per-second 0
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The request sent to each route. The agent prompt invites a tool call.
+ROUTE_PAYLOADS = {
+    "chat": ("/api/chat", {"messages": [{"role": "user", "content": "Tell me a story."}]}),
+    "agent": (
+        "/api/agent/chat",
+        {"messages": [{"role": "user", "content": "What is 6*7?"}], "tool_choice": "auto"},
+    ),
+}
+
+
+@dataclass
+class Sample:
+    """The outcome of one request."""
+
+    ok: bool
+    latency: float
+    ttft: float | None = None
+    error: str | None = None
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Returns the `pct`-th percentile of `values` by linear interpolation."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _is_token(route: str, event: dict) -> bool:
+    # The first content the user would see: an Ollama message chunk for
+    # `/api/chat`, a `message_delta` (or the final message) for the agent.
+    if route == "chat":
+        return bool(event.get("message", {}).get("content"))
+    return event.get("type") in ("message_delta", "message") and bool(event.get("content"))
+
+
+async def measure_request(client: httpx.AsyncClient, route: str, model: str) -> Sample:
+    """Sends one streaming request and times it.
+
+    Args:
+    ----
+        client: A client pointed at the backend.
+        route: `chat` or `agent`.
+        model: The model to request.
+
+    Returns:
+    -------
+        The request's time to first token and total latency, or the error
+        that made it fail.
+
+    """
+    path, payload = ROUTE_PAYLOADS[route]
+    started = time.perf_counter()
+    ttft = None
+    try:
+        async with client.stream("POST", path, json={"model": model, **payload}) as response:
+            if response.status_code != httpx.codes.OK:
+                await response.aread()
+                return Sample(ok=False, latency=time.perf_counter() - started, error=f"HTTP {response.status_code}")
+            error = None
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if ttft is None and _is_token(route, event):
+                    ttft = time.perf_counter() - started
+                if "error" in event or event.get("type") == "error":
+                    error = str(event.get("error") or event.get("content"))
+    except httpx.HTTPError as e:
+        return Sample(ok=False, latency=time.perf_counter() - started, error=type(e).__name__)
+    return Sample(ok=error is None, latency=time.perf_counter() - started, ttft=ttft, error=error)
+
+
+def _distribution(values: list[float]) -> dict[str, float | None]:
+    def ms(value: float | None) -> float | None:
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "p50": ms(percentile(values, 50)),
+        "p95": ms(percentile(values, 95)),
+        "p99": ms(percentile(values, 99)),
+        "mean": ms(sum(values) / len(values)) if values else None,
+        "max": ms(max(values)) if values else None,
+    }
+
+
+def summarize(samples: list[Sample], wall_time: float) -> dict:
+    """Aggregates the samples of one route and concurrency level.
+
+    Args:
+    ----
+        samples: The outcome of every request of the level.
+        wall_time: Seconds from the first request to the last response.
+
+    Returns:
+    -------
+        Request and error counts, throughput in successful requests per
+        second, and TTFT and latency percentiles in milliseconds.
+
+    """
+    succeeded = [sample for sample in samples if sample.ok]
+    errors: dict[str, int] = {}
+    for sample in samples:
+        if not sample.ok:
+            errors[sample.error or "unknown"] = errors.get(sample.error or "unknown", 0) + 1
+    return {
+        "requests": len(samples),
+        "succeeded": len(succeeded),
+        "errors": errors,
+        "wall_time_s": round(wall_time, 3),
+        "throughput_rps": round(len(succeeded) / wall_time, 3) if wall_time > 0 else None,
+        "ttft_ms": _distribution([sample.ttft for sample in succeeded if sample.ttft is not None]),
+        "latency_ms": _distribution([sample.latency for sample in succeeded]),
+    }
+
+
+async def run_level(
+        client: httpx.AsyncClient,
+        route: str,
+        model: str,
+        concurrency: int,
+        requests: int,
+) -> dict:
+    """Sends `requests` requests with `concurrency` of them in flight at once.
+
+    Returns
+    -------
+        The `summarize()` report for the level, plus its route and
+        concurrency.
+
+    """
+    remaining = iter(range(requests))
+    samples: list[Sample] = []
+
+    async def worker() -> None:
+        for _ in remaining:
+            samples.append(await measure_request(client, route, model))  # noqa: PERF401
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"route": route, "concurrency": concurrency, **summarize(samples, time.perf_counter() - started)}
+
+
+async def run_benchmark(  # noqa: PLR0913
+        base_url: str,
+        routes: list[str],
+        concurrency_levels: list[int],
+        requests: int,
+        model: str,
+        warmup: int = 2,
+) -> list[dict]:
+    """Runs every route at every concurrency level against a backend.
+
+    Args:
+    ----
+        base_url: The backend's base URL.
+        routes: Routes to drive (`chat`, `agent`).
+        concurrency_levels: Numbers of concurrent requests to test.
+        requests: Requests sent per route and level.
+        model: The model to request.
+        warmup: Untimed requests sent per route before measuring.
+
+    Returns:
+    -------
+        One report per route and concurrency level.
+
+    """
+    widest = max(concurrency_levels)
+    limits = httpx.Limits(max_connections=widest * 2, max_keepalive_connections=widest)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=limits) as client:
+        results = []
+        for route in routes:
+            for _ in range(warmup):
+                await measure_request(client, route, model)
+            for concurrency in concurrency_levels:
+                result = await run_level(client, route, model, concurrency, requests)
+                results.append(result)
+                print(  # noqa: T201
+                    f"{route:>5} c={concurrency:<3} rps={result['throughput_rps']} "
+                    f"ttft p50/p95/p99={_triple(result['ttft_ms'])} "
+                    f"latency p50/p95/p99={_triple(result['latency_ms'])} "
+                    f"errors={sum(result['errors'].values())}",
+                    file=sys.stderr,
+                )
+        return results
+
+
+def _triple(distribution: dict) -> str:
+    return "/".join("-" if distribution[key] is None else f"{distribution[key]:.0f}" for key in ("p50", "p95", "p99"))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            msg = f"Process serving {url} exited with code {process.returncode}"
+            raise RuntimeError(msg)
+        with contextlib.suppress(httpx.HTTPError):
+            if httpx.get(url, timeout=1.0).status_code == httpx.codes.OK:
+                return
+        time.sleep(0.2)
+    msg = f"Timed out waiting for {url}"
+    raise RuntimeError(msg)
+
+
+def _stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    with contextlib.suppress(subprocess.TimeoutExpired):
+        process.wait(timeout=10)
+
+
+@contextlib.contextmanager
+def fake_ollama_server(args: argparse.Namespace) -> Iterator[int]:
+    """Starts the fake Ollama server in its own process.
+
+    Yields
+    ------
+        The port it listens on.
+
+    """
+    ollama_port = _free_port()
+    fake_ollama = subprocess.Popen([  # noqa: S603
+        sys.executable, "-m", "benchmarks.fake_ollama",
+        "--port", str(ollama_port),
+        "--ttft", str(args.ttft),
+        "--tokens-per-second", str(args.tokens_per_second),
+        "--response-tokens", str(args.response_tokens),
+        "--failure-rate", str(args.failure_rate),
+        "--models", args.model,
+    ], cwd=ROOT)
+    try:
+        _wait_until_ready(f"http://127.0.0.1:{ollama_port}/api/tags", fake_ollama)
+        yield ollama_port
+    finally:
+        _stop(fake_ollama)
+
+
+@contextlib.contextmanager
+def local_backend(args: argparse.Namespace, ollama_port: int, workers: int) -> Iterator[str]:
+    """Starts the backend with the production launcher.
+
+    Args:
+    ----
+        args: The command-line options.
+        ollama_port: The port of the fake Ollama server.
+        workers: The number of worker processes.
+
+    Yields:
+    ------
+        The backend's base URL.
+
+    """
+    backend_port = _free_port()
+    env = {
+        **os.environ,
+        "OLLAMA_HOST": "http://127.0.0.1",
+        "OLLAMA_PORT": str(ollama_port),
+        "DEFAULT_MODEL": args.model,
+        "WARMUP_ON_STARTUP": "false",
+    }
+    # The backend's logs are discarded to keep the report readable; they are
+    # still produced, so their cost is part of the measurement.
+    backend = subprocess.Popen([  # noqa: S603
+        sys.executable, "-m", "src.launcher",
+        "--host", "127.0.0.1", "--port", str(backend_port), "--workers", str(workers),
+    ], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_until_ready(f"http://127.0.0.1:{backend_port}/api/health", backend)
+        yield f"http://127.0.0.1:{backend_port}"
+    finally:
+        _stop(backend)
+
+
+def _git_commit() -> str | None:
+    with contextlib.suppress(OSError, subprocess.CalledProcessError):
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],  # noqa: S603, S607
+            cwd=ROOT,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    return None
+
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    """Describes how each level's p95 latency, p95 TTFT and throughput moved.
+
+    Args:
+    ----
+        baseline: A previous results file.
+        current: The results of this run.
+
+    Returns:
+    -------
+        One line per route, concurrency level and worker count present in
+        both runs.
+
+    """
+    def level(result: dict) -> tuple:
+        return result["route"], result["concurrency"], result.get("workers")
+
+    previous = {level(result): result for result in baseline["results"]}
+    lines = []
+    for result in current["results"]:
+        before = previous.get(level(result))
+        if before is None:
+            continue
+        changes = []
+        for label, key, sub in (
+                ("latency p95", "latency_ms", "p95"),
+                ("ttft p95", "ttft_ms", "p95"),
+                ("rps", "throughput_rps", None),
+        ):
+            old = before[key] if sub is None else before[key][sub]
+            new = result[key] if sub is None else result[key][sub]
+            if old and new is not None:
+                changes.append(f"{label} {old} -> {new} ({(new - old) / old:+.1%})")
+        workers = f" w={result['workers']}" if result.get("workers") else ""
+        lines.append(f"{result['route']} c={result['concurrency']}{workers}: " + ", ".join(changes))
+    return lines
+
+
+def main() -> None:
+    """Runs the load test from the command line."""
+    parser = argparse.ArgumentParser(description="Load-test the chatbot backend against a fake Ollama server.")
+    parser.add_argument("--target", help="Benchmark a running backend instead of starting one.")
+    parser.add_argument("--routes", default="chat,agent", help="Comma-separated routes: chat, agent.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels.")
+    parser.add_argument("--workers", default="1", help="Comma-separated backend worker counts to compare.")
+    parser.add_argument("--requests", type=int, default=32, help="Requests per route and concurrency level.")
+    parser.add_argument("--model", default="fake-model")
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output", default=str(ROOT / "reports" / "benchmark.json"))
+    parser.add_argument("--compare", help="A previous results file to compare against.")
+    args = parser.parse_args()
+
+    routes = [route.strip() for route in args.routes.split(",") if route.strip()]
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    worker_counts = [int(count) for count in args.workers.split(",") if count.strip()]
+
+    async def run(base_url: str) -> list[dict]:
+        return await run_benchmark(base_url, routes, levels, args.requests, args.model)
+
+    if args.target:
+        results = asyncio.run(run(args.target))
+    else:
+        results = []
+        with fake_ollama_server(args) as ollama_port:
+            for workers in worker_counts:
+                print(f"--- {workers} worker(s) ---", file=sys.stderr)  # noqa: T201
+                with local_backend(args, ollama_port, workers) as base_url:
+                    results.extend({**result, "workers": workers} for result in asyncio.run(run(base_url)))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "target": args.target or "local",
+            "fake_ollama": None if args.target else {
+                "ttft": args.ttft,
+                "tokens_per_second": args.tokens_per_second,
+                "response_tokens": args.response_tokens,
+                "failure_rate": args.failure_rate,
+            },
+            "requests_per_level": args.requests,
+        },
+        "results": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"Results written to {output}", file=sys.stderr)  # noqa: T201
+
+    if args.compare:
+        for line in compare(json.loads(Path(args.compare).read_text()), report):
+            print(line, file=sys.stderr)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
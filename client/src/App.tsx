@@ -260,12 +260,34 @@ export default function App() {
               const toolCall = { tool: event.tool, args: event.args };
               toolCalls.push(toolCall);
               setCurrentToolCalls([...toolCalls]);
+              // Tokens streamed before a tool call belong to an intermediate step
+              accumulatedContent = '';
             }
             else if (event.type === 'tool_result' && event.tool && event.result) {
               const toolResult = { tool: event.tool, result: event.result };
               toolResults.push(toolResult);
               setCurrentToolResults([...toolResults]);
             }
+            else if (event.type === 'message_start') {
+              // A new LLM call; text streamed before belonged to an earlier turn
+              accumulatedContent = '';
+            }
+            else if (event.type === 'message_delta' && event.content) {
+              // Append streamed tokens as they arrive
+              accumulatedContent += event.content;
+
+              const assistantMessage: Message = {
+                role: 'assistant',
+                content: accumulatedContent,
+                timestamp: Date.now(),
+                toolCalls: toolCalls.length > 0 ? toolCalls : undefined,
+                toolResults: toolResults.length > 0 ? toolResults : undefined,
+              };
+
+              updateConversation(currentConversationId, {
+                messages: [...newMessages, assistantMessage]
+              });
+            }
             else if (event.type === 'message' && event.content) {
               // Accumulate content for final message
               accumulatedContent = event.content;
@@ -45,7 +45,7 @@ export interface Conversation {
 }
 
 export interface AgentEvent {
-  type: 'status' | 'tool_call' | 'tool_result' | 'message' | 'done' | 'error';
+  type: 'status' | 'tool_call' | 'tool_result' | 'message_start' | 'message_delta' | 'message' | 'done' | 'error';
   content?: string;
   tool?: string;
   args?: Record<string, any>;
@@ -0,0 +1,240 @@
+"""@file admission.py
+@description This module implements admission control in front of Ollama.
+Each model gets a fixed number of concurrent upstream generations. Requests
+beyond that wait in a bounded, priority-ordered queue; once the queue is full
+(or a request has waited too long) the request is rejected immediately so the
+route can answer with a 429 and a `Retry-After` hint instead of letting
+latency grow without bound.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from src.config import ADMISSION_MAX_CONCURRENT_PER_MODEL, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT
+
+# Weight of the latest sample in the moving averages used for stats.
+_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejectedError(Exception):
+    """Raised when a request cannot be admitted for a model."""
+
+    def __init__(self: "AdmissionRejectedError", model_name: str, reason: str, retry_after: int) -> None:
+        super().__init__(f"Model '{model_name}' is at capacity ({reason}). Retry after {retry_after}s.")
+        self.model_name = model_name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _ModelGate:
+    active: int = 0
+    waiters: list[tuple[int, int, asyncio.Future]] = field(default_factory=list)
+    admitted: int = 0
+    rejected: int = 0
+    avg_wait: float = 0.0
+    avg_hold: float = 0.0
+
+
+class AdmissionController:
+    """Bounds concurrent upstream generations per model."""
+
+    def __init__(
+            self: "AdmissionController",
+            max_concurrent: int = ADMISSION_MAX_CONCURRENT_PER_MODEL,
+            max_queue: int = ADMISSION_MAX_QUEUE,
+            max_wait: float = ADMISSION_MAX_WAIT,
+    ) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self._gates: dict[str, _ModelGate] = {}
+        self._sequence = itertools.count()
+
+    def _gate(self: "AdmissionController", model_name: str) -> _ModelGate:
+        return self._gates.setdefault(model_name, _ModelGate())
+
+    def _retry_after(self: "AdmissionController", gate: _ModelGate) -> int:
+        # Rough time until a queued request would be served.
+        backlog = len(gate.waiters) + 1
+        return max(1, math.ceil(gate.avg_hold * backlog / self.max_concurrent))
+
+    def _reject(self: "AdmissionController", model_name: str, gate: _ModelGate, reason: str) -> None:
+        gate.rejected += 1
+        raise AdmissionRejectedError(model_name, reason, self._retry_after(gate))
+
+    def _leave_queue(
+            self: "AdmissionController",
+            model_name: str,
+            gate: _ModelGate,
+            entry: tuple[int, int, asyncio.Future],
+    ) -> None:
+        # A waiter gives up: drop it from the queue, or pass on the slot if it
+        # was handed over just as it gave up.
+        waiter = entry[2]
+        if waiter.done() and not waiter.cancelled():
+            self.release(model_name)
+        else:
+            waiter.cancel()
+            gate.waiters.remove(entry)
+            heapq.heapify(gate.waiters)
+
+    async def acquire(self: "AdmissionController", model_name: str, priority: int = 0) -> None:
+        """Waits for a generation slot for a model.
+
+        Args:
+        ----
+            model_name: The model the request will run on.
+            priority: Higher values are served first among queued requests.
+
+        Raises:
+        ------
+            AdmissionRejectedError: If the wait queue is full or the request
+                                    waited longer than `max_wait`.
+
+        """
+        gate = self._gate(model_name)
+        if gate.active < self.max_concurrent and not gate.waiters:
+            gate.active += 1
+            gate.admitted += 1
+            return
+
+        if len(gate.waiters) >= self.max_queue:
+            self._reject(model_name, gate, "queue full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (-priority, next(self._sequence), waiter)
+        heapq.heappush(gate.waiters, entry)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self._leave_queue(model_name, gate, entry)
+            self._reject(model_name, gate, "queue timeout")
+        except asyncio.CancelledError:
+            self._leave_queue(model_name, gate, entry)
+            raise
+
+        waited = time.monotonic() - started
+        gate.avg_wait += _EWMA_ALPHA * (waited - gate.avg_wait)
+        gate.admitted += 1
+
+    def release(self: "AdmissionController", model_name: str, held_for: float | None = None) -> None:
+        """Frees a slot, handing it to the highest-priority waiter if any.
+
+        Args:
+        ----
+            model_name: The model whose slot is released.
+            held_for: How long the slot was held, used for `Retry-After`
+                      estimates.
+
+        """
+        gate = self._gate(model_name)
+        if held_for is not None:
+            gate.avg_hold += _EWMA_ALPHA * (held_for - gate.avg_hold)
+
+        while gate.waiters:
+            _, _, waiter = heapq.heappop(gate.waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        gate.active = max(0, gate.active - 1)
+
+    def guard(self: "AdmissionController", model_name: str, stream: AsyncIterator[bytes]) -> "AdmittedStream":
+        """Wraps an already-admitted stream so that its slot is released.
+
+        Args:
+        ----
+            model_name: The model the slot was acquired for.
+            stream: The response stream produced under that slot.
+
+        Returns:
+        -------
+            The stream, releasing the slot once it ends, fails or is closed.
+
+        """
+        return AdmittedStream(self, model_name, stream)
+
+    def get_stats(self: "AdmissionController") -> dict:
+        """Reports queue depth, concurrency and wait times per model.
+
+        Returns
+        -------
+            The configured limits plus, for every model seen so far, the
+            number of active and queued requests, admission and rejection
+            counters, and moving averages of queue wait and slot hold time
+            in milliseconds.
+
+        """
+        return {
+            "max_concurrent_per_model": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "models": {
+                name: {
+                    "active": gate.active,
+                    "queued": sum(1 for *_, waiter in gate.waiters if not waiter.done()),
+                    "admitted": gate.admitted,
+                    "rejected": gate.rejected,
+                    "avg_wait_ms": round(gate.avg_wait * 1000, 2),
+                    "avg_hold_ms": round(gate.avg_hold * 1000, 2),
+                }
+                for name, gate in self._gates.items()
+            },
+        }
+
+
+class AdmittedStream:
+    """A response stream that holds an admission slot until it is finished.
+
+    The slot is released exactly once: when the stream is exhausted, raises,
+    is cancelled while being read, or is closed with `aclose`, including
+    before it was ever read. Unlike the `finally` block of an async
+    generator, which never runs if the generator is not started, this keeps
+    a request that is abandoned before streaming from leaking its slot.
+    """
+
+    def __init__(
+            self: "AdmittedStream",
+            controller: AdmissionController,
+            model_name: str,
+            stream: AsyncIterator[bytes],
+    ) -> None:
+        self._controller = controller
+        self._model_name = model_name
+        self._stream = stream
+        self._started = time.monotonic()
+        self._released = False
+
+    def __aiter__(self: "AdmittedStream") -> "AdmittedStream":
+        """Returns the stream itself; it can be iterated only once."""
+        return self
+
+    async def __anext__(self: "AdmittedStream") -> bytes:
+        """Returns the next item, freeing the slot once there is none."""
+        try:
+            return await anext(self._stream)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self: "AdmittedStream") -> None:
+        """Frees the slot unless it was already freed."""
+        if not self._released:
+            self._released = True
+            self._controller.release(self._model_name, held_for=time.monotonic() - self._started)
+
+    async def aclose(self: "AdmittedStream") -> None:
+        """Closes the underlying stream and frees the slot."""
+        try:
+            if (close := getattr(self._stream, "aclose", None)) is not None:
+                await close()
+        finally:
+            self.release()
+
+
+admission_controller = AdmissionController()
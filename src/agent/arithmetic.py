@@ -0,0 +1,251 @@
+"""Bounded Arithmetic Engine
+Evaluates calculator expressions from their syntax tree, with limits on size and work
+"""
+
+import ast
+import math
+import operator
+from collections.abc import Callable
+from functools import lru_cache
+
+# Limits on what an expression may ask for. They are checked before any
+# work is done, so a pathological expression such as `9**9**9**9` is
+# rejected in microseconds instead of occupying a worker.
+MAX_EXPRESSION_LENGTH = 1000
+# Syntax tree nodes; with no loops or calls back into Python, this bounds
+# the number of evaluation steps.
+MAX_STEPS = 200
+# Size of integer operands and results, in bits (about 1200 digits).
+MAX_INT_BITS = 4096
+# Largest exponent of `**`.
+MAX_EXPONENT = 10_000
+# Largest number of digits `round` may round to, either side of the point.
+# Rounding an integer to `-n` digits computes `10**n`.
+MAX_ROUND_DIGITS = 400
+
+Number = int | float
+Evaluator = Callable[[], Number]
+
+
+class ExpressionError(ValueError):
+    """Raised when an expression is malformed, unsupported or over a limit."""
+
+
+def _check(value: Number) -> Number:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        msg = "Result is too large"
+        raise ExpressionError(msg)
+    if isinstance(value, float) and not math.isfinite(value):
+        msg = "Result is too large" if math.isinf(value) else "Result is not a number"
+        raise ExpressionError(msg)
+    return value
+
+
+def _power(base: Number, exponent: Number) -> Number:
+    if abs(exponent) > MAX_EXPONENT:
+        msg = f"Exponent is too large (limit {MAX_EXPONENT})"
+        raise ExpressionError(msg)
+    # Reject a huge integer power from the size of its operands, before
+    # computing it.
+    if (
+            isinstance(base, int) and isinstance(exponent, int) and exponent > 0
+            and max(abs(base).bit_length() - 1, 0) * exponent > MAX_INT_BITS
+    ):
+        msg = "Result is too large"
+        raise ExpressionError(msg)
+    result = base ** exponent
+    if isinstance(result, complex):
+        msg = "Result is not a real number"
+        raise ExpressionError(msg)
+    return result
+
+
+def _multiply(left: Number, right: Number) -> Number:
+    if isinstance(left, int) and isinstance(right, int) and left.bit_length() + right.bit_length() > MAX_INT_BITS + 1:
+        msg = "Result is too large"
+        raise ExpressionError(msg)
+    return left * right
+
+
+def _log(value: Number, base: Number = math.e) -> float:
+    return math.log(value, base)
+
+
+def _cbrt(value: Number) -> float:
+    # `math.cbrt` only exists from Python 3.11 on. Perfect cubes are snapped
+    # to their exact root, which `** (1 / 3)` misses by a rounding error.
+    root = math.copysign(abs(value) ** (1 / 3), value)
+    nearest = round(root)
+    return float(nearest) if nearest ** 3 == value else root
+
+
+def _round(value: Number, ndigits: Number | None = None) -> Number:
+    if ndigits is None:
+        return round(value)
+    if not isinstance(ndigits, int):
+        msg = "round() takes a whole number of digits"
+        raise ExpressionError(msg)
+    if abs(ndigits) > MAX_ROUND_DIGITS:
+        msg = f"Too many digits to round to (limit {MAX_ROUND_DIGITS})"
+        raise ExpressionError(msg)
+    return round(value, ndigits)
+
+
+_BINARY_OPERATORS: dict[type, Callable[[Number, Number], Number]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: _multiply,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: _power,
+}
+_UNARY_OPERATORS: dict[type, Callable[[Number], Number]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+# Functions callable from an expression, with the number of arguments each
+# accepts. None of them can take more work than their operands' size allows:
+# the float functions convert their operand first, `log` reads an integer's
+# size directly, and the integer results of `round`, `floor` and `ceil` are
+# no larger than their operand or a float.
+FUNCTIONS: dict[str, tuple[Callable[..., Number], range]] = {
+    "sqrt": (math.sqrt, range(1, 2)),
+    "cbrt": (_cbrt, range(1, 2)),
+    "log": (_log, range(1, 3)),
+    "log10": (math.log10, range(1, 2)),
+    "log2": (math.log2, range(1, 2)),
+    "exp": (math.exp, range(1, 2)),
+    "sin": (math.sin, range(1, 2)),
+    "cos": (math.cos, range(1, 2)),
+    "tan": (math.tan, range(1, 2)),
+    "asin": (math.asin, range(1, 2)),
+    "acos": (math.acos, range(1, 2)),
+    "atan": (math.atan, range(1, 2)),
+    "degrees": (math.degrees, range(1, 2)),
+    "radians": (math.radians, range(1, 2)),
+    "abs": (abs, range(1, 2)),
+    "round": (_round, range(1, 3)),
+    "floor": (math.floor, range(1, 2)),
+    "ceil": (math.ceil, range(1, 2)),
+    "min": (min, range(2, 21)),
+    "max": (max, range(2, 21)),
+}
+CONSTANTS: dict[str, float] = {"pi": math.pi, "e": math.e, "tau": math.tau}
+
+
+def _compile_node(node: ast.AST) -> Evaluator:  # noqa: C901
+    # Turns a syntax tree node into a closure that evaluates it. Everything
+    # that can be checked without evaluating is checked here, once per
+    # expression.
+    if isinstance(node, ast.Expression):
+        return _compile_node(node.body)
+
+    if isinstance(node, ast.Constant):
+        if not isinstance(node.value, int | float) or isinstance(node.value, bool):
+            msg = f"Unsupported value: {node.value!r}"
+            raise ExpressionError(msg)
+        value = _check(node.value)
+        return lambda: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            msg = f"Unknown name: {node.id}"
+            raise ExpressionError(msg)
+        value = CONSTANTS[node.id]
+        return lambda: value
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        apply, left, right = _BINARY_OPERATORS[type(node.op)], _compile_node(node.left), _compile_node(node.right)
+        return lambda: _check(apply(left(), right()))
+
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        apply_unary, operand = _UNARY_OPERATORS[type(node.op)], _compile_node(node.operand)
+        return lambda: apply_unary(operand())
+
+    if isinstance(node, ast.Call):
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name not in FUNCTIONS or node.keywords:
+            msg = f"Unsupported function: {ast.unparse(node.func)}"
+            raise ExpressionError(msg)
+        function, arity = FUNCTIONS[name]
+        if len(node.args) not in arity:
+            msg = f"{name}() takes {arity.start} to {arity.stop - 1} arguments"
+            raise ExpressionError(msg)
+        args = [_compile_node(arg) for arg in node.args]
+        return lambda: _check(function(*(arg() for arg in args)))
+
+    msg = f"Unsupported syntax: {ast.unparse(node) if isinstance(node, ast.expr) else type(node).__name__}"
+    raise ExpressionError(msg)
+
+
+@lru_cache(maxsize=512)
+def compile_expression(expression: str) -> Evaluator:
+    """Parses and checks an expression once, returning a function that evaluates it.
+
+    Compiled expressions are cached, so a repeated expression skips parsing.
+    Besides Python's arithmetic operators, `^` is accepted for powers, and
+    the multiplication and division signs for `*` and `/`.
+
+    Args:
+    ----
+        expression: An arithmetic expression, e.g. "sqrt(2) * (75-32)*5/9".
+
+    Returns:
+    -------
+        A function without arguments that computes the expression's value.
+
+    Raises:
+    ------
+        ExpressionError: If the expression is empty, too long, too complex,
+                         malformed, or uses anything but numbers, the
+                         supported operators, `FUNCTIONS` and `CONSTANTS`.
+
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        msg = f"Expression is too long (limit {MAX_EXPRESSION_LENGTH} characters)"
+        raise ExpressionError(msg)
+    source = expression.strip().replace("^", "**").replace("\u00d7", "*").replace("\u00f7", "/")
+    if not source:
+        msg = "Invalid expression"
+        raise ExpressionError(msg)
+    try:
+        tree = ast.parse(source, mode="eval")
+    except (SyntaxError, ValueError) as e:
+        msg = "Invalid expression"
+        raise ExpressionError(msg) from e
+    except RecursionError as e:
+        msg = "Expression is nested too deeply"
+        raise ExpressionError(msg) from e
+
+    steps = sum(1 for _ in ast.walk(tree))
+    if steps > MAX_STEPS:
+        msg = f"Expression is too complex (limit {MAX_STEPS} steps)"
+        raise ExpressionError(msg)
+    return _compile_node(tree)
+
+
+def evaluate(expression: str) -> Number:
+    """Evaluates an arithmetic expression within the engine's limits.
+
+    Raises
+    ------
+        ExpressionError: If the expression is rejected, a result exceeds the
+                         size limits, or a function is given an invalid
+                         argument.
+        ZeroDivisionError: If the expression divides by zero.
+
+    """
+    try:
+        return compile_expression(expression)()
+    except ExpressionError:
+        raise
+    except OverflowError as e:
+        msg = "Result is too large"
+        raise ExpressionError(msg) from e
+    except (TypeError, ValueError) as e:
+        # Raised by math functions given an argument outside their domain,
+        # such as `sqrt(-1)`, or of the wrong kind, such as `round(1, 0.5)`.
+        raise ExpressionError(str(e).capitalize()) from e
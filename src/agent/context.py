@@ -0,0 +1,279 @@
+"""Context Window Management
+Fits the conversation history into a per-model token budget
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.admission import AdmissionRejectedError, admission_controller
+from src.agent.prompts import get_summary_prompt
+from src.agent.registry import get_simple_llm
+from src.config import (
+    CONTEXT_SUMMARY_CACHE_SIZE,
+    CONTEXT_SUMMARY_PRIORITY,
+    CONTEXT_SUMMARY_TOKENS,
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_TOKEN_BUDGETS,
+)
+from src.logger import LOGGER
+from src.warmup import get_keep_alive
+
+# Rough characters-per-token ratio of common LLM tokenizers on English text.
+CHARS_PER_TOKEN = 4
+# Per-message overhead for role markers and separators.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+Summarizer = Callable[[str, list[dict], str], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens in a text without a tokenizer."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_message_tokens(message: dict) -> int:
+    """Estimates the tokens a chat message adds to the prompt."""
+    return estimate_tokens(message.get("content", "")) + MESSAGE_OVERHEAD_TOKENS
+
+
+def get_token_budget(model_name: str) -> int:
+    """Returns the history token budget for a model."""
+    return CONTEXT_TOKEN_BUDGETS.get(model_name, CONTEXT_TOKEN_BUDGET)
+
+
+def _to_langchain(message: dict) -> BaseMessage:
+    if message["role"] == "assistant":
+        return AIMessage(content=message["content"])
+    return HumanMessage(content=message["content"])
+
+
+def _history(messages: list[dict]) -> list[dict]:
+    return [message for message in messages if message.get("role") in ("user", "assistant")]
+
+
+def _group_turns(messages: list[dict]) -> list[list[dict]]:
+    # A turn is a user message followed by the assistant replies to it.
+    turns: list[list[dict]] = []
+    for message in messages:
+        if message["role"] == "user" or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _prefix_keys(messages: list[dict], model_name: str) -> list[str]:
+    # keys[i] identifies messages[:i + 1]; each message is hashed only once.
+    keys = []
+    digest = hashlib.sha256(model_name.encode())
+    for message in messages:
+        digest.update(f"\x00{message['role']}\x00{message['content']}".encode())
+        keys.append(digest.copy().hexdigest())
+    return keys
+
+
+async def summarize_messages(previous_summary: str, messages: list[dict], model_name: str) -> str:
+    """Folds new messages into a running conversation summary using the LLM.
+
+    Args:
+    ----
+        previous_summary: The summary of the messages folded so far.
+        messages: The messages to fold in.
+        model_name: The model used to write the summary.
+
+    Returns:
+    -------
+        The updated summary.
+
+    """
+    llm = get_simple_llm(model_name, temperature=0, keep_alive=get_keep_alive(model_name))
+    max_words = CONTEXT_SUMMARY_TOKENS * CHARS_PER_TOKEN // 6
+    response = await llm.ainvoke(get_summary_prompt(previous_summary, messages, max_words=max_words))
+    return str(response.content).strip()
+
+
+class ContextManager:
+    """Builds the message list sent upstream within a token budget.
+
+    The most recent turns are kept verbatim, together with their assistant
+    replies. Turns that no longer fit are folded into a rolling summary.
+    Summaries are written in the background once a reply is finished, and
+    cached by the hash of the messages they cover, so building a request's
+    history never waits for the LLM: it uses the cached summary of the
+    longest prefix of the older turns and drops the rest. Each refresh only
+    summarizes the turns that fell out of the window since the previous one.
+    """
+
+    def __init__(
+            self: "ContextManager",
+            summarizer: Summarizer | None = None,
+            summary_tokens: int = CONTEXT_SUMMARY_TOKENS,
+            cache_size: int = CONTEXT_SUMMARY_CACHE_SIZE,
+            priority: int = CONTEXT_SUMMARY_PRIORITY,
+    ) -> None:
+        self._summarizer = summarizer or summarize_messages
+        self._summary_tokens = summary_tokens
+        self._cache_size = max(1, cache_size)
+        self._priority = priority
+        self._summaries: OrderedDict[str, str] = OrderedDict()
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    def split(self: "ContextManager", messages: list[dict], budget: int) -> tuple[list[dict], list[dict]]:
+        """Splits the history into older messages and recent messages.
+
+        Args:
+        ----
+            messages: The conversation history, oldest first.
+            budget: The token budget for the whole history.
+
+        Returns:
+        -------
+            A tuple `(older, recent)`. `recent` holds whole turns and always
+            contains at least the latest turn.
+
+        """
+        if sum(estimate_message_tokens(message) for message in messages) <= budget:
+            return [], messages
+
+        limit = budget - self._summary_tokens
+        turns = _group_turns(messages)
+        kept = 0
+        used = 0
+        for turn in reversed(turns):
+            cost = sum(estimate_message_tokens(message) for message in turn)
+            if kept and used + cost > limit:
+                break
+            kept += 1
+            used += cost
+
+        recent = [message for turn in turns[len(turns) - kept:] for message in turn]
+        return messages[:len(messages) - len(recent)], recent
+
+    def cached_summary(self: "ContextManager", older: list[dict], model_name: str) -> tuple[str, int]:
+        """Looks up the cached summary of the longest prefix of `older`.
+
+        Args:
+        ----
+            older: The messages that no longer fit in the window.
+            model_name: The model the summary was written with.
+
+        Returns:
+        -------
+            A tuple `(summary, covered)`, where `covered` is the number of
+            leading messages of `older` the summary covers; `("", 0)` if
+            none is cached.
+
+        """
+        keys = _prefix_keys(older, model_name)
+        for index in range(len(keys) - 1, -1, -1):
+            if keys[index] in self._summaries:
+                self._summaries.move_to_end(keys[index])
+                return self._summaries[keys[index]], index + 1
+        return "", 0
+
+    async def summarize(self: "ContextManager", older: list[dict], model_name: str) -> str:
+        """Returns the rolling summary of `older`, updating it incrementally.
+
+        Args:
+        ----
+            older: The messages that no longer fit in the window.
+            model_name: The model used to write the summary.
+
+        Returns:
+        -------
+            A summary covering all of `older`.
+
+        """
+        previous, start = self.cached_summary(older, model_name)
+        if start == len(older):
+            return previous
+
+        summary = await self._summarizer(previous, older[start:], model_name)
+        summary = summary[:self._summary_tokens * CHARS_PER_TOKEN]
+        self._summaries[_prefix_keys(older, model_name)[-1]] = summary
+        if len(self._summaries) > self._cache_size:
+            self._summaries.popitem(last=False)
+        return summary
+
+    async def refresh(self: "ContextManager", messages: list[dict], model_name: str) -> None:
+        """Summarizes the older turns of a history ahead of its next request.
+
+        The summary is written with a generation slot from the admission
+        controller, taken at a low priority so that it waits for queued
+        requests; if none is granted, the summary is left for a later reply.
+
+        Args:
+        ----
+            messages: The conversation history, including the latest reply.
+            model_name: The model the history will be sent to.
+
+        """
+        older, _ = self.split(_history(messages), get_token_budget(model_name))
+        if not older or self.cached_summary(older, model_name)[1] == len(older):
+            return
+
+        try:
+            await admission_controller.acquire(model_name, priority=self._priority)
+        except AdmissionRejectedError as e:
+            LOGGER.info("Conversation summary skipped | model=%s | reason=%s", model_name, e.reason)
+            return
+        try:
+            await self.summarize(older, model_name)
+        except Exception as e:
+            LOGGER.warning("Conversation summary failed | model=%s | error=%s", model_name, e)
+        finally:
+            admission_controller.release(model_name)
+
+    def schedule_refresh(self: "ContextManager", messages: list[dict], model_name: str) -> None:
+        """Runs `refresh` in the background, once per history.
+
+        Args:
+        ----
+            messages: The conversation history, including the latest reply.
+            model_name: The model the history will be sent to.
+
+        """
+        history = _history(messages)
+        if not history:
+            return
+        key = _prefix_keys(history, model_name)[-1]
+        if key in self._refreshing:
+            return
+        task = asyncio.create_task(self.refresh(history, model_name))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    def build(self: "ContextManager", messages: list[dict], model_name: str) -> list[BaseMessage]:
+        """Converts the chat history into LangChain messages within the budget.
+
+        Args:
+        ----
+            messages: The conversation history as `{"role", "content"}`
+                      dictionaries. Only user and assistant messages are used.
+            model_name: The model the history will be sent to.
+
+        Returns:
+        -------
+            The LangChain messages to send: the cached summary of older
+            turns, if any, followed by the most recent turns. Older turns
+            that no summary covers yet are dropped.
+
+        """
+        older, recent = self.split(_history(messages), get_token_budget(model_name))
+        lc_messages = [_to_langchain(message) for message in recent]
+        if not older:
+            return lc_messages
+
+        summary, covered = self.cached_summary(older, model_name)
+        if covered < len(older):
+            LOGGER.info("Conversation summary not ready, dropping %s older messages", len(older) - covered)
+        if not covered:
+            return lc_messages
+        return [HumanMessage(content=f"Summary of our earlier conversation:\n{summary}"), *lc_messages]
+
+
+context_manager = ContextManager()
@@ -8,18 +8,30 @@ from typing import Literal
 from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
 from langchain_ollama import ChatOllama
 from langgraph.graph import END, StateGraph
-from langgraph.prebuilt import ToolNode
 from logger import LOGGER
 
 from src.agent.prompts import get_system_prompt
 from src.agent.state import AgentState
+from src.agent.tool_executor import execute_tool_calls
 from src.agent.tools import get_tools
+from src.config import OLLAMA_BASE_URL
+from src.http_client import shared_transport
+from src.metrics import NODE_LATENCY
+from src.timing import span
 
 # Maximum iterations to prevent infinite loops
 MAX_ITERATIONS = int(os.getenv("MAX_ITERATIONS", "2"))
 
 
-def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
+def _client_options() -> dict:
+    # The async client (the only one used) sends its requests through the
+    # shared upstream connection pool, and so through the backend pool, like
+    # every other upstream call; `base_url` is only a placeholder whose host
+    # the backend pool replaces.
+    return {"base_url": OLLAMA_BASE_URL, "async_client_kwargs": {"transport": shared_transport}}
+
+
+def create_agent_graph(model_name: str = "llama3.1", **llm_options: object) -> StateGraph:
     """Creates and compiles a LangGraph agent workflow.
 
     This function constructs a stateful graph that defines the agent's
@@ -30,6 +42,9 @@ def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
     Args:
     ----
         model_name: The name of the Ollama model to be used by the agent.
+        **llm_options: Generation options forwarded to `ChatOllama`
+                       (e.g., `temperature`, `num_predict`). They override
+                       the agent defaults.
 
     Returns:
     -------
@@ -41,8 +56,12 @@ def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
     # Initialize the LLM with faster settings
     llm = ChatOllama(
         model=model_name,
-        temperature=0.7,
-        num_predict=512,  # Limit response length for speed
+        **{
+            **_client_options(),
+            "temperature": 0.7,
+            "num_predict": 512,  # Limit response length for speed
+            **llm_options,
+        },
     )
 
     # Get all available tools
@@ -55,11 +74,16 @@ def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
 
     llm_with_tools = llm.bind_tools(tools)
 
-    # Create tool node for executing tools
-    tool_node = ToolNode(tools)
+    # Tools are looked up by name when the model requests them
+    tools_by_name = {tool.name: tool for tool in tools}
 
-    # Define graph nodes
-    def call_model(state: AgentState) -> AgentState:
+    # Per-node latency histograms, bound once per graph
+    agent_node_latency = NODE_LATENCY.labels("agent")
+    tools_node_latency = NODE_LATENCY.labels("tools")
+
+    # Define graph nodes. Nodes are coroutines so that waiting on Ollama or
+    # on tools never blocks the server's event loop.
+    async def call_model(state: AgentState) -> AgentState:
         """Invokes the language model with the current conversation state.
 
         This node is responsible for generating the AI's response, which may
@@ -76,14 +100,18 @@ def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
             incremented iteration count.
 
         """
-        messages = state["messages"]
+        with agent_node_latency.time(), span("node:agent"):
+            messages = state["messages"]
 
-        # Add system prompt if not present
-        if not any(isinstance(msg, SystemMessage) for msg in messages):
-            messages = [SystemMessage(content=get_system_prompt())] + messages
+            # Add system prompt if not present
+            if not any(isinstance(msg, SystemMessage) for msg in messages):
+                with span("prompt"):
+                    messages = [SystemMessage(content=get_system_prompt())] + messages
 
-        # Call the model
-        response = llm_with_tools.invoke(messages)
+            # Call the model
+            with span("llm") as llm_span:
+                response = await llm_with_tools.ainvoke(messages)
+                llm_span.set_llm_stats(response.response_metadata)
 
         # Increment iteration count
         iteration_count = state.get("iteration_count", 0) + 1
@@ -95,12 +123,12 @@ def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
             "tool_results": state.get("tool_results", []),
         }
 
-    def execute_tools(state: AgentState) -> AgentState:
+    async def execute_tools(state: AgentState) -> AgentState:
         """Executes the tools requested by the model in the previous turn.
 
         This node takes the tool calls from the latest AI message and runs
-        them using the `ToolNode`. The results are then added back to the
-        agent's state.
+        them concurrently, each with its own timeout. The results, in the
+        original call order, are then added back to the agent's state.
 
         Args:
         ----
@@ -115,12 +143,13 @@ def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
         # Get the last message (should be AIMessage with tool calls)
         last_message = state["messages"][-1]
 
-        # Execute tools using ToolNode
-        tool_outputs = tool_node.invoke({"messages": [last_message]})
+        # Execute all requested tools concurrently
+        with tools_node_latency.time(), span("node:tools"):
+            tool_messages = await execute_tool_calls(last_message.tool_calls, tools_by_name)
 
         # Store tool results for transparency
         tool_results = state.get("tool_results", [])
-        for tool_msg in tool_outputs["messages"]:
+        for tool_msg in tool_messages:
             if isinstance(tool_msg, ToolMessage):
                 tool_results.append({
                     "tool": tool_msg.name,
@@ -128,7 +157,7 @@ def create_agent_graph(model_name: str = "llama3.1") -> StateGraph:
                 })
 
         return {
-            "messages": tool_outputs["messages"],
+            "messages": tool_messages,
             "tool_results": tool_results,
             "reasoning_steps": state.get("reasoning_steps", []),
             "iteration_count": state.get("iteration_count", 0),
@@ -208,16 +237,21 @@ def create_simple_graph(llm: ChatOllama) -> StateGraph:
         A compiled `StateGraph` that only includes the model-calling node.
 
     """
+    agent_node_latency = NODE_LATENCY.labels("agent")
 
-    def call_model(state: AgentState) -> AgentState:
+    async def call_model(state: AgentState) -> AgentState:
         """Invokes the language model without any tool-calling capabilities."""
-        messages = state["messages"]
+        with agent_node_latency.time(), span("node:agent"):
+            messages = state["messages"]
 
-        # Add system prompt if not present
-        if not any(isinstance(msg, SystemMessage) for msg in messages):
-            messages = [SystemMessage(content=get_system_prompt())] + messages
+            # Add system prompt if not present
+            if not any(isinstance(msg, SystemMessage) for msg in messages):
+                with span("prompt"):
+                    messages = [SystemMessage(content=get_system_prompt())] + messages
 
-        response = llm.invoke(messages)
+            with span("llm") as llm_span:
+                response = await llm.ainvoke(messages)
+                llm_span.set_llm_stats(response.response_metadata)
 
         return {
             "messages": [response],
@@ -234,7 +268,7 @@ def create_simple_graph(llm: ChatOllama) -> StateGraph:
     return workflow.compile()
 
 
-def create_simple_llm(model_name: str = "llama3.1") -> ChatOllama:
+def create_simple_llm(model_name: str = "llama3.1", **llm_options: object) -> ChatOllama:
     """Initializes a `ChatOllama` instance for use in non-agentic mode.
 
     This function provides a straightforward way to create a language model
@@ -244,6 +278,7 @@ def create_simple_llm(model_name: str = "llama3.1") -> ChatOllama:
     Args:
     ----
         model_name: The name of the Ollama model to be used.
+        **llm_options: Generation options forwarded to `ChatOllama`.
 
     Returns:
     -------
@@ -252,5 +287,5 @@ def create_simple_llm(model_name: str = "llama3.1") -> ChatOllama:
     """
     return ChatOllama(
         model=model_name,
-        temperature=0.7,
+        **{**_client_options(), "temperature": 0.7, **llm_options},
     )
@@ -35,3 +35,23 @@ def get_system_prompt(tools: list[dict] | None = None) -> str:
     """
     template = jinja_env.get_template("agent_system_prompt.jinja2")
     return template.render(tools=tools or [])
+
+
+def get_summary_prompt(previous_summary: str, messages: list[dict], max_words: int = 200) -> str:
+    """Renders the prompt used to fold older turns into a rolling summary.
+
+    Args:
+    ----
+        previous_summary: The summary of the turns folded so far (may be
+                          empty).
+        messages: The new messages to fold in, as `{"role", "content"}`
+                  dictionaries.
+        max_words: The length limit given to the model.
+
+    Returns:
+    -------
+        A string containing the rendered summarization prompt.
+
+    """
+    template = jinja_env.get_template("conversation_summary.jinja2")
+    return template.render(previous_summary=previous_summary, messages=messages, max_words=max_words)
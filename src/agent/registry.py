@@ -0,0 +1,127 @@
+"""Agent Registry
+Process-wide LRU caches of compiled agent graphs and simple LLM clients
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Generic, TypeVar
+
+from langchain_ollama import ChatOllama
+from langgraph.graph import StateGraph
+
+from src.agent import graph as agent_graph
+from src.config import MODEL_REGISTRY_SIZE
+
+T = TypeVar("T")
+
+
+class ModelRegistry(Generic[T]):
+    """A bounded, thread-safe LRU cache of objects built per model.
+
+    Entries are keyed by the model name plus the generation options used to
+    build them, so that two requests for the same model with the same
+    settings share a single instance (and its underlying HTTP clients).
+    """
+
+    def __init__(self: "ModelRegistry", factory: Callable[..., T], max_size: int = MODEL_REGISTRY_SIZE) -> None:
+        self._factory = factory
+        self._max_size = max(1, max_size)
+        self._entries: OrderedDict[tuple[Hashable, ...], T] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_key(model_name: str, options: dict) -> tuple[Hashable, ...]:
+        return (model_name, *sorted(options.items()))
+
+    def get(self: "ModelRegistry", model_name: str, **options: object) -> T:
+        """Returns the cached instance for a model, building it on a miss.
+
+        Args:
+        ----
+            model_name: The name of the Ollama model.
+            **options: Generation options forwarded to the factory.
+
+        Returns:
+        -------
+            The cached (or freshly built) instance.
+
+        """
+        key = self._make_key(model_name, options)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+            instance = self._factory(model_name, **options)
+            self._entries[key] = instance
+            if len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+            return instance
+
+    def invalidate(self: "ModelRegistry", model_name: str | None = None) -> int:
+        """Drops cached entries so that they are rebuilt on next use.
+
+        Args:
+        ----
+            model_name: Only drop entries for this model. If omitted, the
+                        whole registry is cleared.
+
+        Returns:
+        -------
+            The number of entries removed.
+
+        """
+        with self._lock:
+            if model_name is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+
+            stale = [key for key in self._entries if key[0] == model_name]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def __len__(self: "ModelRegistry") -> int:
+        """Returns the number of cached entries."""
+        return len(self._entries)
+
+
+def _build_agent_graph(model_name: str, **llm_options: object) -> StateGraph:
+    # Resolved at call time so that a patched builder is honoured.
+    return agent_graph.create_agent_graph(model_name, **llm_options)
+
+
+def _build_simple_llm(model_name: str, **llm_options: object) -> ChatOllama:
+    return agent_graph.create_simple_llm(model_name, **llm_options)
+
+
+_agent_graphs: ModelRegistry[StateGraph] = ModelRegistry(_build_agent_graph)
+_simple_llms: ModelRegistry[ChatOllama] = ModelRegistry(_build_simple_llm)
+
+
+def get_agent_graph(model_name: str, **llm_options: object) -> StateGraph:
+    """Returns a compiled agent graph for the model, reusing a cached one if possible."""
+    return _agent_graphs.get(model_name, **llm_options)
+
+
+def get_simple_llm(model_name: str, **llm_options: object) -> ChatOllama:
+    """Returns a `ChatOllama` client for the model, reusing a cached one if possible."""
+    return _simple_llms.get(model_name, **llm_options)
+
+
+def invalidate_model(model_name: str | None = None) -> int:
+    """Drops cached graphs and LLM clients for a model (or for all models).
+
+    Args:
+    ----
+        model_name: The model whose entries should be dropped. If omitted,
+                    every cached entry is removed.
+
+    Returns:
+    -------
+        The total number of entries removed.
+
+    """
+    return _agent_graphs.invalidate(model_name) + _simple_llms.invalidate(model_name)
@@ -0,0 +1,126 @@
+"""Pure Tool Result Cache
+Memoizes the results of tools marked pure, keyed on their normalized arguments
+"""
+
+import json
+from collections import OrderedDict
+
+from pydantic import ValidationError
+
+from src.config import TOOL_CACHE_MAX_BYTES, TOOL_CACHE_MAX_ENTRIES, TOOL_CACHE_MAX_ENTRY_BYTES
+
+
+def is_pure(tool: object) -> bool:
+    """Checks whether a tool declared itself pure in its `metadata`.
+
+    A pure tool's result depends only on its arguments, so it can be reused
+    for identical calls. Tools are impure unless they say otherwise, which
+    keeps clock-reading tools such as `get_current_time` out of the cache.
+    """
+    return bool((getattr(tool, "metadata", None) or {}).get("pure", False))
+
+
+def make_tool_key(tool: object, args: dict) -> str | None:
+    """Builds a cache key from a tool call's arguments as the tool will see them.
+
+    The arguments are validated with the tool's schema first, so defaults
+    are filled in and values are coerced exactly as for the call itself:
+    `{"text": "a"}` and `{"text": "a", "operation": "base64_encode"}` share a
+    key, as do key orders and `"2"` and `2` for a numeric argument.
+
+    Args:
+    ----
+        tool: The tool being called.
+        args: The arguments the model passed.
+
+    Returns:
+    -------
+        The key, or `None` if the arguments are invalid; the call then runs
+        uncached and reports its own error.
+
+    """
+    schema = getattr(tool, "args_schema", None)
+    try:
+        normalized = schema.model_validate(args).model_dump() if hasattr(schema, "model_validate") else args
+        canonical = json.dumps(normalized, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    except (ValidationError, TypeError, ValueError):
+        return None
+    return f"{tool.name}:{canonical}"
+
+
+class ToolResultCache:
+    """An LRU cache of tool results bounded by entry count and total size.
+
+    An entry's size is that of its key and result, so calls with large text
+    arguments use up the byte budget, and evict older entries, in proportion
+    to their size; one larger than `max_entry_bytes` is not stored at all.
+    """
+
+    def __init__(
+            self: "ToolResultCache",
+            max_entries: int = TOOL_CACHE_MAX_ENTRIES,
+            max_bytes: int = TOOL_CACHE_MAX_BYTES,
+            max_entry_bytes: int = TOOL_CACHE_MAX_ENTRY_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self._entries: OrderedDict[str, tuple[str, int]] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self: "ToolResultCache", key: str) -> str | None:
+        """Returns the cached result for a key, or `None` on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self: "ToolResultCache", key: str, result: str) -> bool:
+        """Stores a result, evicting the least recently used ones if needed.
+
+        Returns
+        -------
+            `False` if the entry is larger than `max_entry_bytes` and was
+            therefore not stored.
+
+        """
+        size = len(key.encode()) + len(result.encode())
+        if size > self.max_entry_bytes or self.max_entries < 1:
+            return False
+
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        self._entries[key] = (result, size)
+        self._size += size
+        while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+        return True
+
+    def clear(self: "ToolResultCache") -> None:
+        """Removes every cached result."""
+        self._entries.clear()
+        self._size = 0
+
+    def get_stats(self: "ToolResultCache") -> dict[str, int]:
+        """Reports cache size and hit/miss counters."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "max_entry_bytes": self.max_entry_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+tool_result_cache = ToolResultCache()
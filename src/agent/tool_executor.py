@@ -0,0 +1,102 @@
+"""Concurrent Tool Execution
+Runs every tool call of one agent turn concurrently, with per-tool timeouts,
+reusing cached results for pure tools
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+
+from src.agent.tool_cache import is_pure, make_tool_key, tool_result_cache
+from src.config import TOOL_MAX_WORKERS, TOOL_TIMEOUT
+from src.metrics import TOOL_CACHE_LOOKUPS, TOOL_ERRORS, TOOL_LATENCY
+from src.timing import span
+
+# Sync tools run here so that a burst of slow tools cannot exhaust the
+# event loop's default executor.
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="agent-tool")
+
+
+def get_tool_timeout(tool: BaseTool) -> float:
+    """Returns the timeout (in seconds) for a tool.
+
+    A tool may override the global `TOOL_TIMEOUT` by declaring a `timeout`
+    entry in its `metadata`.
+    """
+    return float((tool.metadata or {}).get("timeout", TOOL_TIMEOUT))
+
+
+async def _run_tool_call(tool: BaseTool | None, tool_call: dict) -> ToolMessage:
+    with span(f"tool:{tool_call['name']}") as tool_span:
+        key = make_tool_key(tool, tool_call["args"]) if tool is not None and is_pure(tool) else None
+        if key is not None:
+            cached = tool_result_cache.get(key)
+            TOOL_CACHE_LOOKUPS.labels(tool_call["name"], "miss" if cached is None else "hit").inc()
+            tool_span.set(cached=cached is not None)
+            if cached is not None:
+                return ToolMessage(content=cached, name=tool_call["name"], tool_call_id=tool_call["id"])
+
+        message, succeeded = await _invoke_tool(tool, tool_call)
+        if key is not None and succeeded:
+            tool_result_cache.put(key, message.content)
+        return message
+
+
+async def _invoke_tool(tool: BaseTool | None, tool_call: dict) -> tuple[ToolMessage, bool]:
+    # Returns the result and whether the tool returned one (rather than
+    # failing or timing out), as only returned results may be cached.
+    name = tool_call["name"]
+    succeeded = False
+    if tool is None:
+        TOOL_ERRORS.labels(name).inc()
+        content = f"Error: Tool '{name}' is not available"
+    else:
+        started = time.perf_counter()
+        timeout = get_tool_timeout(tool)
+        if getattr(tool, "coroutine", None) is not None:
+            pending = tool.ainvoke(tool_call["args"])
+        else:
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(_tool_pool, partial(tool.invoke, tool_call["args"]))
+        try:
+            content = await asyncio.wait_for(pending, timeout=timeout)
+            succeeded = True
+        except asyncio.TimeoutError:
+            # A timed-out sync tool keeps its worker thread until it returns;
+            # the agent simply stops waiting for it.
+            TOOL_ERRORS.labels(name).inc()
+            content = f"Error: Tool '{name}' timed out after {timeout:g}s"
+        except Exception as e:
+            TOOL_ERRORS.labels(name).inc()
+            content = f"Error: {e!s}"
+        TOOL_LATENCY.labels(name).observe(time.perf_counter() - started)
+
+    return ToolMessage(content=str(content), name=name, tool_call_id=tool_call["id"]), succeeded
+
+
+async def execute_tool_calls(tool_calls: list[dict], tools_by_name: dict[str, BaseTool]) -> list[ToolMessage]:
+    """Executes tool calls concurrently and returns their results in order.
+
+    Async tools are awaited together on the event loop, while sync tools are
+    dispatched to a bounded thread pool. Each call is limited by its own
+    timeout, and failures are reported as error messages instead of aborting
+    the other calls. Calls of pure tools are answered from
+    `tool_result_cache` when an identical call has already returned.
+
+    Args:
+    ----
+        tool_calls: The `tool_calls` of an `AIMessage`.
+        tools_by_name: The available tools, keyed by name.
+
+    Returns:
+    -------
+        One `ToolMessage` per tool call, in the same order as `tool_calls`.
+
+    """
+    return list(await asyncio.gather(*(
+        _run_tool_call(tools_by_name.get(tool_call["name"]), tool_call) for tool_call in tool_calls
+    )))
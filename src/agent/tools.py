@@ -3,29 +3,55 @@
 This module provides a variety of utilities that the agent can use to perform
 tasks such as mathematical calculations, unit conversions, and date and time
 operations. Each tool is decorated with `@tool` to make it discoverable by
-the LangGraph agent. The `get_tools` function at the end of the file gathers
-all defined tools into a list for the agent to use.
+the LangGraph agent. Tools whose result depends only on their arguments are
+also decorated with `@pure`, which lets the executor reuse their results. The
+`get_tools` function at the end of the file gathers all defined tools into a
+list for the agent to use.
 """
 
-import re
 from datetime import datetime
 
-from langchain_core.tools import tool
+from langchain_core.tools import BaseTool, tool
+
+from src.agent.arithmetic import ExpressionError, evaluate
+
+
+def pure(tool_: BaseTool) -> BaseTool:
+    """Marks a tool as pure, so the results of identical calls are reused.
+
+    Only tools whose result depends on nothing but their arguments may be
+    marked; anything reading the clock, the network or other state must not.
+
+    Args:
+    ----
+        tool_: A tool created with `@tool`.
+
+    Returns:
+    -------
+        The same tool, with `pure` set in its metadata.
+
+    """
+    tool_.metadata = {**(tool_.metadata or {}), "pure": True}
+    return tool_
+
 
 # --- Mathematical & Computation Tools ---
 
+@pure
 @tool
 def calculator(expression: str) -> str:
     """Performs mathematical calculations on a given expression.
 
     This tool evaluates a string containing a mathematical expression and returns
-    the result. To ensure safety, it sanitizes the input by removing any
-    characters that are not numbers, operators, or parentheses.
+    the result. Besides the arithmetic operators and parentheses, expressions
+    may use functions such as sqrt, log, exp, sin and round, and the constants
+    pi and e. The expression is evaluated by a bounded engine rather than
+    `eval`, so oversized numbers or expressions are rejected immediately.
 
     Args:
     ----
         expression: A string representing the mathematical expression to be
-                    evaluated (e.g., "2 + 2", "(75-32)*5/9").
+                    evaluated (e.g., "2 + 2", "(75-32)*5/9", "sqrt(2) * 3").
 
     Returns:
     -------
@@ -34,23 +60,16 @@ def calculator(expression: str) -> str:
 
     """
     try:
-        # Remove any potentially dangerous characters/functions
-        # Only allow numbers, operators, parentheses, and basic math functions
-        safe_expression = re.sub(r"[^0-9+\-*/().\s]", "", expression)
-
-        if not safe_expression:
-            return "Error: Invalid expression"
-
-        # Evaluate the expression
-        result = eval(safe_expression, {"__builtins__": {}}, {}) # noqa: S307
+        result = evaluate(expression)
         return f"Result: {result}"
 
     except ZeroDivisionError:
         return "Error: Division by zero"
-    except Exception as e:
-        return f"Error calculating expression: {e!s}"
+    except ExpressionError as e:
+        return f"Error: {e!s}"
 
 
+@pure
 @tool
 def unit_converter(value: float, from_unit: str, to_unit: str) -> str:
     """Converts a value from one unit to another.
@@ -149,6 +168,7 @@ def get_timezone_time(timezone: str) -> str:
         return f"Error: {e!s}. Try timezones like 'America/New_York', 'Europe/London', 'Asia/Tokyo'"
 
 
+@pure
 @tool
 def days_between_dates(date1: str, date2: str) -> str:
     """Calculates the number of days between two dates.
@@ -178,6 +198,7 @@ def days_between_dates(date1: str, date2: str) -> str:
 
 # --- Text & String Tools ---
 
+@pure
 @tool
 def text_analyzer(text: str) -> str:
     """Analyzes a given text to provide statistics.
@@ -206,6 +227,7 @@ def text_analyzer(text: str) -> str:
             f"- Avg word length: {chars / words:.1f} chars")
 
 
+@pure
 @tool
 def encode_decode_text(text: str, operation: str = "base64_encode") -> str:
     """Encodes or decodes text using various formats.
@@ -0,0 +1,360 @@
+"""@file backends.py
+@description This module spreads upstream calls over a pool of Ollama
+servers (`OLLAMA_BACKENDS`). Routing happens in an httpx transport, so every
+client built on it is routed the same way: the `/api/chat` proxy, model
+warm-up, the model list and the agent's `ChatOllama`. Each request goes to
+the healthy backend with the fewest outstanding requests, favouring one that
+already has the requested model loaded (as reported by `/api/ps`) over one
+that would have to load it first. A background task checks every backend
+periodically and ejects those that keep failing until they recover. A
+request whose backend cannot be reached, or answers with a server error
+before sending a byte of body, is retried on the next best backend.
+"""
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+
+import httpx
+import orjson
+
+from src.config import (
+    BACKEND_COLD_MODEL_PENALTY,
+    BACKEND_HEALTH_INTERVAL,
+    BACKEND_HEALTH_TIMEOUT,
+    BACKEND_UNHEALTHY_THRESHOLD,
+    OLLAMA_BACKENDS,
+)
+from src.logger import LOGGER
+
+# Request extension that pins a request to one backend (no failover).
+PIN_EXTENSION = "ollama_backend"
+# Request extension naming the model a request is for. Callers that know it
+# set it, so the transport does not have to parse the request body, which
+# holds the whole chat history, to route the request.
+MODEL_EXTENSION = "ollama_model"
+
+# Endpoints whose successful calls leave the model loaded on the backend.
+_GENERATION_PATHS = frozenset({"/api/chat", "/api/generate", "/api/embed", "/api/embeddings"})
+
+# Errors raised before a request reached the backend; safe to retry elsewhere.
+_RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+
+def normalize_model_name(name: str) -> str:
+    """Adds the implicit `:latest` tag, as Ollama does for bare model names."""
+    return name if ":" in name else f"{name}:latest"
+
+
+def _model_names(models: list[dict]) -> set[str]:
+    return {normalize_model_name(model[key]) for model in models for key in ("name", "model") if model.get(key)}
+
+
+@dataclass
+class Backend:
+    """One Ollama server and what the pool knows about it."""
+
+    url: str
+    healthy: bool = True
+    outstanding: int = 0
+    failures: int = 0
+    requests: int = 0
+    errors: int = 0
+    loaded_models: set[str] = field(default_factory=set)
+    available_models: set[str] | None = None
+    last_check: float | None = None
+
+    def has_model(self: "Backend", model: str) -> bool:
+        """Checks whether the backend has the model, if its list is known."""
+        return self.available_models is None or model in self.available_models
+
+
+class BackendPool:
+    """Chooses a backend for each upstream request and tracks backend health."""
+
+    def __init__(  # noqa: PLR0913
+            self: "BackendPool",
+            urls: list[str] = OLLAMA_BACKENDS,
+            health_interval: float = BACKEND_HEALTH_INTERVAL,
+            health_timeout: float = BACKEND_HEALTH_TIMEOUT,
+            unhealthy_threshold: int = BACKEND_UNHEALTHY_THRESHOLD,
+            cold_model_penalty: float = BACKEND_COLD_MODEL_PENALTY,
+    ) -> None:
+        self.backends = [Backend(url.rstrip("/")) for url in dict.fromkeys(urls)]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.unhealthy_threshold = max(1, unhealthy_threshold)
+        self.cold_model_penalty = cold_model_penalty
+        self.failovers = 0
+        self._turn = itertools.count()
+        self._health_task: asyncio.Task | None = None
+        self._health_client: httpx.AsyncClient | None = None
+
+    def get(self: "BackendPool", url: str) -> Backend:
+        """Returns the backend with the given base URL."""
+        url = url.rstrip("/")
+        for backend in self.backends:
+            if backend.url == url:
+                return backend
+        raise KeyError(url)
+
+    def candidates(self: "BackendPool", model: str | None = None) -> list[Backend]:
+        """Ranks the backends a request could be sent to, best first.
+
+        Healthy backends come first; ejected ones are only used when no
+        healthy backend is left, rather than failing outright. Backends known
+        not to have the model are skipped if another one has it. The rest are
+        ordered by outstanding requests, with `cold_model_penalty` added for
+        each backend that does not have the model loaded yet. Ties rotate.
+
+        Args:
+        ----
+            model: The requested model, if the request names one.
+
+        Returns:
+        -------
+            The backends to try, in order.
+
+        """
+        pool = [backend for backend in self.backends if backend.healthy] or self.backends
+        if model is not None:
+            model = normalize_model_name(model)
+            pool = [backend for backend in pool if backend.has_model(model)] or pool
+
+        # Rotating the starting point spreads ties across backends.
+        offset = next(self._turn) % max(1, len(pool))
+        rotated = pool[offset:] + pool[:offset]
+
+        def score(backend: Backend) -> float:
+            cold = model is not None and model not in backend.loaded_models
+            return backend.outstanding + (self.cold_model_penalty if cold else 0)
+
+        return sorted(rotated, key=score)
+
+    def record_success(self: "BackendPool", backend: Backend, loaded_model: str | None = None) -> None:
+        """Notes a request the backend answered.
+
+        Args:
+        ----
+            backend: The backend that answered.
+            loaded_model: The model a successful generation call ran on, which
+                          the backend has now loaded.
+
+        """
+        backend.failures = 0
+        if loaded_model is not None:
+            backend.loaded_models.add(normalize_model_name(loaded_model))
+
+    def record_unloaded(self: "BackendPool", backend: Backend, model: str) -> None:
+        """Notes that the backend has unloaded a model."""
+        backend.loaded_models.discard(normalize_model_name(model))
+
+    def record_failure(self: "BackendPool", backend: Backend, error: object) -> None:
+        """Counts a failure, ejecting the backend after too many in a row."""
+        backend.errors += 1
+        backend.failures += 1
+        if backend.healthy and backend.failures >= self.unhealthy_threshold:
+            backend.healthy = False
+            LOGGER.warning("Ollama backend ejected | backend=%s | error=%s", backend.url, error)
+
+    async def check(self: "BackendPool", backend: Backend) -> None:
+        """Checks one backend's health and loaded models with `/api/ps`."""
+        if self._health_client is None:
+            self._health_client = httpx.AsyncClient(timeout=self.health_timeout)
+        backend.last_check = time.time()
+        try:
+            response = await self._health_client.get(f"{backend.url}/api/ps")
+            response.raise_for_status()
+            loaded = _model_names(response.json().get("models", []))
+        except (httpx.HTTPError, ValueError) as e:
+            self.record_failure(backend, e)
+            return
+        backend.loaded_models = loaded
+        backend.failures = 0
+        if not backend.healthy:
+            backend.healthy = True
+            LOGGER.info("Ollama backend readmitted | backend=%s", backend.url)
+
+    async def check_all(self: "BackendPool") -> None:
+        """Checks every backend concurrently."""
+        await asyncio.gather(*(self.check(backend) for backend in self.backends))
+
+    async def _health_loop(self: "BackendPool") -> None:
+        while True:
+            try:
+                await self.check_all()
+            except Exception:
+                # Keep checking: an ejected backend is only readmitted here.
+                LOGGER.exception("Ollama backend health check failed")
+            await asyncio.sleep(self.health_interval)
+
+    def start(self: "BackendPool") -> None:
+        """Starts the periodic health checks."""
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def stop(self: "BackendPool") -> None:
+        """Stops the health checks and closes their client."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._health_client is not None:
+            await self._health_client.aclose()
+            self._health_client = None
+
+    def record_models(self: "BackendPool", backend: Backend, models: list[dict]) -> None:
+        """Stores the models a backend reported in `/api/tags`."""
+        backend.available_models = _model_names(models)
+
+    def transport(self: "BackendPool", **transport_options: object) -> "PoolTransport":
+        """Builds an httpx transport that routes requests through this pool.
+
+        Args:
+        ----
+            **transport_options: Options of the underlying
+                                 `httpx.AsyncHTTPTransport`, such as `limits`.
+
+        Returns:
+        -------
+            A transport for an `httpx.AsyncClient`; request URLs only need a
+            path, their host is replaced by the chosen backend's.
+
+        """
+        return PoolTransport(self, httpx.AsyncHTTPTransport(**transport_options))
+
+    def get_stats(self: "BackendPool") -> dict:
+        """Reports each backend's health, load and models."""
+        return {
+            "failovers": self.failovers,
+            "health_interval": self.health_interval,
+            "backends": [
+                {
+                    "url": backend.url,
+                    "healthy": backend.healthy,
+                    "outstanding": backend.outstanding,
+                    "requests": backend.requests,
+                    "errors": backend.errors,
+                    "loaded_models": sorted(backend.loaded_models),
+                    "available_models": (
+                        None if backend.available_models is None else len(backend.available_models)
+                    ),
+                    "last_check": backend.last_check,
+                }
+                for backend in self.backends
+            ],
+        }
+
+
+def _request_model(request: httpx.Request) -> str | None:
+    # Taken from the request's extensions when the caller set it. Otherwise,
+    # as for the agent's `ChatOllama` requests, from the JSON body, which is
+    # already in memory but costs a parse of the whole history.
+    if (model := request.extensions.get(MODEL_EXTENSION)) is not None:
+        return model or None
+    if request.method != "POST" or "json" not in request.headers.get("content-type", ""):
+        return None
+    try:
+        model = orjson.loads(request.content).get("model")
+    except (orjson.JSONDecodeError, AttributeError, httpx.RequestNotRead):
+        return None
+    return model if isinstance(model, str) and model else None
+
+
+def _route(request: httpx.Request, backend: Backend) -> None:
+    base = httpx.URL(backend.url)
+    path = base.raw_path.rstrip(b"/") + request.url.raw_path if base.raw_path != b"/" else request.url.raw_path
+    request.url = request.url.copy_with(scheme=base.scheme, host=base.host, port=base.port, raw_path=path)
+    request.headers["Host"] = request.url.netloc.decode("ascii")
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    # Keeps the backend's request counted as outstanding until the response
+    # body has been read and closed.
+
+    def __init__(self: "_ReleasingStream", stream: httpx.AsyncByteStream, backend: Backend) -> None:
+        self._stream = stream
+        self._backend = backend
+        self._released = False
+
+    async def __aiter__(self: "_ReleasingStream"):  # noqa: ANN204
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self: "_ReleasingStream") -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._backend.outstanding -= 1
+
+
+class PoolTransport(httpx.AsyncBaseTransport):
+    """An httpx transport that sends each request to a backend of the pool."""
+
+    def __init__(self: "PoolTransport", pool: BackendPool, inner: httpx.AsyncBaseTransport) -> None:
+        self.pool = pool
+        self.inner = inner
+
+    async def handle_async_request(self: "PoolTransport", request: httpx.Request) -> httpx.Response:
+        """Sends a request to the best backend, failing over until one answers.
+
+        A request pinned with the `ollama_backend` extension goes to that
+        backend only. The `ollama_model` extension names the request's model;
+        without it, the model is read from the JSON body.
+
+        Raises
+        ------
+            httpx.TransportError: The last connection error, if no backend
+                                  could be reached.
+
+        """
+        model = _request_model(request)
+        pinned = request.extensions.get(PIN_EXTENSION)
+        candidates = [self.pool.get(pinned)] if pinned else self.pool.candidates(model)
+        for attempt, backend in enumerate(candidates):
+            last = attempt == len(candidates) - 1
+            _route(request, backend)
+            backend.outstanding += 1
+            backend.requests += 1
+            try:
+                response = await self.inner.handle_async_request(request)
+            except _RETRYABLE_ERRORS as e:
+                backend.outstanding -= 1
+                self.pool.record_failure(backend, e)
+                if last:
+                    raise
+                self.pool.failovers += 1
+                LOGGER.warning("Failing over from Ollama backend %s: %s", backend.url, e)
+                continue
+
+            if response.status_code >= httpx.codes.INTERNAL_SERVER_ERROR and not last:
+                # Nothing has been read from the body yet, so the client
+                # never sees this attempt.
+                await response.aclose()
+                backend.outstanding -= 1
+                self.pool.record_failure(backend, f"HTTP {response.status_code}")
+                self.pool.failovers += 1
+                LOGGER.warning("Failing over from Ollama backend %s: HTTP %s", backend.url, response.status_code)
+                continue
+
+            if response.status_code < httpx.codes.INTERNAL_SERVER_ERROR:
+                # Only a successful generation call shows the model is loaded;
+                # a 404 may mean the backend does not even have it.
+                generated = response.is_success and request.url.path in _GENERATION_PATHS
+                self.pool.record_success(backend, model if generated else None)
+            return httpx.Response(
+                status_code=response.status_code,
+                headers=response.headers,
+                stream=_ReleasingStream(response.stream, backend),
+                extensions=response.extensions,
+            )
+        msg = "No Ollama backend is configured"
+        raise httpx.ConnectError(msg, request=request)
+
+    async def aclose(self: "PoolTransport") -> None:
+        """Closes the underlying transport's connections."""
+        await self.inner.aclose()
+
+
+backend_pool = BackendPool()
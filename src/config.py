@@ -19,11 +19,196 @@ OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://localhost")
 OLLAMA_PORT = int(os.environ.get("OLLAMA_PORT", 11434))
 
 # Construct the base URL for the Ollama API
-OLLAMA_API_BASE = f"{OLLAMA_HOST}:{OLLAMA_PORT}/api/chat"
-OLLAMA_TAGS_URL = f"{OLLAMA_HOST}:{OLLAMA_PORT}/api/tags"
+OLLAMA_BASE_URL = f"{OLLAMA_HOST}:{OLLAMA_PORT}"
+OLLAMA_API_BASE = f"{OLLAMA_BASE_URL}/api/chat"
+OLLAMA_TAGS_URL = f"{OLLAMA_BASE_URL}/api/tags"
+
+# --- Ollama Backends ---
+
+# Comma-separated base URLs of the Ollama servers requests are spread over,
+# e.g. "http://gpu1:11434,http://gpu2:11434". Defaults to OLLAMA_HOST:OLLAMA_PORT.
+OLLAMA_BACKENDS = [
+    url.strip().rstrip("/") for url in os.environ.get("OLLAMA_BACKENDS", "").split(",") if url.strip()
+] or [OLLAMA_BASE_URL]
+# Seconds between health checks (`/api/ps`) of every backend, and the time
+# limit of each check.
+BACKEND_HEALTH_INTERVAL = float(os.environ.get("BACKEND_HEALTH_INTERVAL", 10.0))
+BACKEND_HEALTH_TIMEOUT = float(os.environ.get("BACKEND_HEALTH_TIMEOUT", 2.0))
+# Consecutive failed checks or requests after which a backend is ejected until
+# a health check succeeds again.
+BACKEND_UNHEALTHY_THRESHOLD = int(os.environ.get("BACKEND_UNHEALTHY_THRESHOLD", 2))
+# How many outstanding requests a backend with the model already loaded is
+# preferred by over one that would have to load it first.
+BACKEND_COLD_MODEL_PENALTY = float(os.environ.get("BACKEND_COLD_MODEL_PENALTY", 4))
 
 # --- Feature Flags ---
 
 # Enable or disable agent mode (tool calling)
 # Set to "true" or "1" to enable
 ENABLE_AGENT_MODE = os.environ.get("ENABLE_AGENT_MODE", "true").lower() in ("true", "1")
+# Import the agent stack (LangChain, LangGraph, Jinja) in a background thread
+# once the server has started, so the first `/api/agent/chat` request does not
+# pay for it. When disabled it is imported on the first agent request only,
+# which suits deployments that serve `/api/chat` alone.
+PREWARM_AGENT_STACK = os.environ.get("PREWARM_AGENT_STACK", "true").lower() in ("true", "1")
+
+# --- Agent Registry ---
+
+# Maximum number of compiled agent graphs (and, separately, simple LLM clients)
+# kept in memory. Entries are keyed by model name plus generation options and
+# the least recently used one is evicted once the limit is reached.
+MODEL_REGISTRY_SIZE = int(os.environ.get("MODEL_REGISTRY_SIZE", 8))
+
+# --- Upstream HTTP Client ---
+
+# Connection pool settings for the shared client used for all Ollama calls.
+UPSTREAM_TIMEOUT = float(os.environ.get("UPSTREAM_TIMEOUT", 30.0))
+UPSTREAM_MAX_CONNECTIONS = int(os.environ.get("UPSTREAM_MAX_CONNECTIONS", 100))
+UPSTREAM_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", 20))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.environ.get("UPSTREAM_KEEPALIVE_EXPIRY", 30.0))
+
+# --- Tool Execution ---
+
+# Default time limit (in seconds) for a single tool call. Individual tools can
+# override it with a `timeout` entry in their metadata.
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", 10.0))
+# Size of the thread pool used to run synchronous tools concurrently.
+TOOL_MAX_WORKERS = int(os.environ.get("TOOL_MAX_WORKERS", 4))
+# Results of pure tools (those with `pure` in their metadata) are cached by
+# their arguments: at most this many entries and bytes (arguments plus result)
+# in total, and calls whose arguments plus result exceed the per-entry limit
+# are not cached.
+TOOL_CACHE_MAX_ENTRIES = int(os.environ.get("TOOL_CACHE_MAX_ENTRIES", 1024))
+TOOL_CACHE_MAX_BYTES = int(os.environ.get("TOOL_CACHE_MAX_BYTES", 4 * 1024 * 1024))
+TOOL_CACHE_MAX_ENTRY_BYTES = int(os.environ.get("TOOL_CACHE_MAX_ENTRY_BYTES", 64 * 1024))
+
+# --- Model List Cache ---
+
+# Seconds a fetched model list is considered fresh.
+MODEL_CACHE_TTL = float(os.environ.get("MODEL_CACHE_TTL", 30.0))
+# Seconds past the TTL during which the stale list is still served while a
+# background refresh runs.
+MODEL_CACHE_STALE_TTL = float(os.environ.get("MODEL_CACHE_STALE_TTL", 300.0))
+# Minimum seconds between refetches of the list triggered by a model name
+# that is not in it.
+MODEL_CACHE_MISS_REFRESH_INTERVAL = float(os.environ.get("MODEL_CACHE_MISS_REFRESH_INTERVAL", 5.0))
+# Reject chat requests for models that Ollama does not report.
+VALIDATE_MODEL_NAMES = os.environ.get("VALIDATE_MODEL_NAMES", "true").lower() in ("true", "1")
+
+# --- Admission Control ---
+
+# Concurrent upstream generations allowed per model.
+ADMISSION_MAX_CONCURRENT_PER_MODEL = int(os.environ.get("ADMISSION_MAX_CONCURRENT_PER_MODEL", 2))
+# Requests allowed to wait for a slot per model before new ones get a 429.
+ADMISSION_MAX_QUEUE = int(os.environ.get("ADMISSION_MAX_QUEUE", 16))
+# Seconds a request may wait in the queue before it is rejected.
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", 30.0))
+
+# --- Response Cache ---
+
+# Opt-in exact-match cache of complete chat responses. Only deterministic
+# requests (temperature 0 or a fixed seed) are cached unless the client sends
+# `X-Response-Cache: force`.
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE_ENABLED", "false").lower() in ("true", "1")
+# Total size budget of cached responses, in bytes.
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
+# --- Model Warm-up & keep_alive ---
+
+# Preload models in the background when the server starts, so the first
+# request does not pay the model load time.
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "true").lower() in ("true", "1")
+# Models to preload in addition to DEFAULT_MODEL (comma-separated).
+WARMUP_MODELS = list(dict.fromkeys(
+    [DEFAULT_MODEL] + [name.strip() for name in os.environ.get("WARMUP_MODELS", "").split(",") if name.strip()]
+))
+# How long Ollama keeps a model loaded after a request, sent with every
+# upstream call (a duration such as "30m", seconds, or -1 to never unload).
+MODEL_KEEP_ALIVE = os.environ.get("MODEL_KEEP_ALIVE", "30m")
+# Per-model overrides of MODEL_KEEP_ALIVE, e.g. "qwen3:8b=-1,llama3.1=10m".
+MODEL_KEEP_ALIVE_OVERRIDES = dict(
+    entry.strip().rsplit("=", 1)
+    for entry in os.environ.get("MODEL_KEEP_ALIVE_OVERRIDES", "").split(",")
+    if "=" in entry
+)
+
+# --- Context Window ---
+
+# Token budget for the conversation history sent upstream, per model.
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 6000))
+# Per-model overrides of CONTEXT_TOKEN_BUDGET, e.g. "qwen3:8b=12000,llama3.1=4000".
+CONTEXT_TOKEN_BUDGETS = {
+    name.strip(): int(budget)
+    for name, budget in (
+        entry.rsplit("=", 1) for entry in os.environ.get("CONTEXT_TOKEN_BUDGETS", "").split(",") if "=" in entry
+    )
+}
+# Part of the budget reserved for the rolling summary of older turns.
+CONTEXT_SUMMARY_TOKENS = int(os.environ.get("CONTEXT_SUMMARY_TOKENS", 512))
+# Number of rolling summaries kept in memory.
+CONTEXT_SUMMARY_CACHE_SIZE = int(os.environ.get("CONTEXT_SUMMARY_CACHE_SIZE", 256))
+# Admission priority of the summaries written in the background after a
+# reply; below the default of 0, so they wait for queued user requests.
+CONTEXT_SUMMARY_PRIORITY = int(os.environ.get("CONTEXT_SUMMARY_PRIORITY", -10))
+
+# --- Sessions ---
+
+# Where server-side conversation history is kept: "memory" (LRU) or "sqlite".
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory").lower()
+# Maximum number of sessions kept by the in-memory backend.
+SESSION_MAX_SESSIONS = int(os.environ.get("SESSION_MAX_SESSIONS", 1000))
+# Database file used by the SQLite backend.
+SESSION_SQLITE_PATH = os.environ.get("SESSION_SQLITE_PATH", "sessions.db")
+
+# --- Workers & Shared Caches ---
+
+# Address and number of worker processes used by the production launcher
+# (`python -m src.launcher`).
+SERVER_HOST = os.environ.get("SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.environ.get("SERVER_PORT", 8000))
+SERVER_WORKERS = int(os.environ.get("SERVER_WORKERS", os.cpu_count() or 1))
+# Seconds a stopping worker waits for in-flight requests and streams to
+# finish before cancelling them.
+SHUTDOWN_DRAIN_TIMEOUT = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT", 30.0))
+# SQLite database (WAL mode) holding the caches shared by all workers: the
+# model list and the response cache. Empty keeps them in process memory; the
+# launcher picks a temporary file when it starts more than one worker.
+SHARED_CACHE_PATH = os.environ.get("SHARED_CACHE_PATH", "")
+
+# --- Resumable Streams ---
+
+# Events of each chat stream kept in memory so a client that reconnects with
+# `Last-Event-ID` can continue where it stopped.
+STREAM_BUFFER_EVENTS = int(os.environ.get("STREAM_BUFFER_EVENTS", 4096))
+# Seconds a finished stream stays available for resumption once no client is
+# reading it.
+STREAM_GRACE_PERIOD = float(os.environ.get("STREAM_GRACE_PERIOD", 120.0))
+# Seconds a running stream keeps generating after its last client
+# disconnected. If nobody resumes it in time, the upstream request is
+# cancelled so Ollama stops generating. 0 cancels immediately.
+STREAM_CANCEL_AFTER = float(os.environ.get("STREAM_CANCEL_AFTER", 10.0))
+
+# --- Profiling ---
+
+# Opt-in sampling profiler for slow requests. Once a request has run for
+# PROFILE_THRESHOLD seconds, its call stacks (including suspended coroutines)
+# are sampled every PROFILE_INTERVAL seconds until it finishes.
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "false").lower() in ("true", "1")
+PROFILE_THRESHOLD = float(os.environ.get("PROFILE_THRESHOLD", 1.0))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.01))
+# Directory holding captured profiles, and how many are kept there before the
+# oldest is deleted.
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 50))
+
+# --- Logging ---
+
+# Minimum level written to the log (DEBUG, INFO, WARNING, ERROR).
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# "json" for one JSON object per line, or "pretty" for readable local output.
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+# Share of DEBUG records kept (0-1), to keep verbose debugging affordable.
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", 1.0))
+# Records buffered for the background writer; further records are dropped
+# rather than blocking the caller.
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
@@ -0,0 +1,122 @@
+"""@file http_client.py
+@description This module owns the shared, pooled HTTP client used for every
+upstream call to Ollama. The client is created once in the FastAPI lifespan
+hook (see `src/server.py`) so that keep-alive connections are reused across
+chat turns instead of paying TCP setup on every request. Its transport sends
+each request to one of the configured Ollama backends (see `src/backends.py`).
+Clients that cannot be given the shared client, such as the agent's
+`ChatOllama`, use `shared_transport` to reach the same pool.
+"""
+import httpx
+
+from src.backends import backend_pool
+from src.config import (
+    UPSTREAM_KEEPALIVE_EXPIRY,
+    UPSTREAM_MAX_CONNECTIONS,
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+    UPSTREAM_TIMEOUT,
+)
+from src.logger import LOGGER
+
+_client: httpx.AsyncClient | None = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Builds a new `httpx.AsyncClient` with the configured pool limits.
+
+    Returns
+    -------
+        An `httpx.AsyncClient` whose connection pool is bounded by
+        `UPSTREAM_MAX_CONNECTIONS` and keeps idle connections alive for
+        `UPSTREAM_KEEPALIVE_EXPIRY` seconds, routing requests through the
+        backend pool.
+
+    """
+    limits = httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(transport=backend_pool.transport(limits=limits), timeout=UPSTREAM_TIMEOUT)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared upstream client, creating it on first use.
+
+    The client is normally created by the application lifespan hook. Lazy
+    creation keeps the module usable when the lifespan is not run (for
+    example, when the app is driven through `httpx.ASGITransport`).
+
+    Returns
+    -------
+        The process-wide `httpx.AsyncClient`.
+
+    """
+    global _client  # noqa: PLW0603
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Closes the shared upstream client and releases its pooled connections."""
+    global _client  # noqa: PLW0603
+    if _client is not None:
+        await _client.aclose()
+        LOGGER.info("Upstream HTTP client closed")
+    _client = None
+
+
+class SharedTransport(httpx.AsyncBaseTransport):
+    """Sends requests through the shared client's transport.
+
+    Clients that must own their `httpx.AsyncClient`, such as the agent's
+    `ChatOllama`, use this so their requests share the shared client's
+    connection pool, `UPSTREAM_MAX_*` limits and pool statistics. Closing
+    such a client leaves the shared pool open; `close_http_client` closes it.
+    """
+
+    async def handle_async_request(self: "SharedTransport", request: httpx.Request) -> httpx.Response:
+        """Hands the request to the transport of the current shared client."""
+        return await get_http_client()._transport.handle_async_request(request)  # noqa: SLF001
+
+    async def aclose(self: "SharedTransport") -> None:
+        """Does nothing: the shared pool outlives the clients using it."""
+
+
+shared_transport = SharedTransport()
+
+
+def get_pool_stats() -> dict[str, int | float | None]:
+    """Reports the state of the shared client's connection pool.
+
+    Returns
+    -------
+        A dictionary with the configured limits and the number of open,
+        in-use and idle connections. All counters are zero before the first
+        upstream call has been made.
+
+    """
+    stats: dict[str, int | float | None] = {
+        "max_connections": UPSTREAM_MAX_CONNECTIONS,
+        "max_keepalive_connections": UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+        "keepalive_expiry": UPSTREAM_KEEPALIVE_EXPIRY,
+        "connections": 0,
+        "in_use": 0,
+        "idle": 0,
+    }
+    if _client is None or _client.is_closed:
+        return stats
+
+    # httpx does not expose pool state publicly; read it from httpcore,
+    # beneath the backend routing transport.
+    transport = getattr(_client, "_transport", None)
+    pool = getattr(getattr(transport, "inner", transport), "_pool", None)
+    connections = [conn for conn in getattr(pool, "connections", []) if not conn.is_closed()]
+    idle = sum(1 for conn in connections if conn.is_idle())
+    stats.update({
+        "connections": len(connections),
+        "in_use": len(connections) - idle,
+        "idle": idle,
+    })
+    return stats
@@ -0,0 +1,88 @@
+"""@file launcher.py
+@description This is the production entry point. It runs the FastAPI app in
+several uvicorn worker processes behind one listening socket, so JSON
+encoding, request validation and tool execution use more than one core.
+On SIGTERM or SIGINT every worker stops accepting connections, waits up to
+`SHUTDOWN_DRAIN_TIMEOUT` seconds for in-flight requests and streams, and
+then shuts down.
+
+With more than one worker, the launcher points the workers at a shared
+SQLite cache (`SHARED_CACHE_PATH`) and a shared Prometheus directory
+(`PROMETHEUS_MULTIPROC_DIR`) unless they are already set. Resumable streams,
+admission limits and the in-memory session store remain per worker: use
+`SESSION_BACKEND=sqlite` to share sessions, and note that
+`ADMISSION_MAX_CONCURRENT_PER_MODEL` applies to each worker.
+
+    python -m src.launcher --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import uvicorn
+
+from src.config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SHUTDOWN_DRAIN_TIMEOUT
+
+
+def prepare_shared_state(workers: int) -> Path | None:
+    """Sets up the state the worker processes share, before they start.
+
+    Workers inherit the environment, so the paths chosen here are used by
+    all of them. Values already set by the operator are kept.
+
+    Args:
+    ----
+        workers: The number of worker processes.
+
+    Returns:
+    -------
+        The temporary run directory holding the shared state, which the
+        caller removes once the workers have exited, or None if none was
+        needed.
+
+    """
+    if workers < 2 or ("SHARED_CACHE_PATH" in os.environ and "PROMETHEUS_MULTIPROC_DIR" in os.environ):  # noqa: PLR2004
+        return None
+    run_dir = Path(tempfile.mkdtemp(prefix="ollama-chatbot-"))
+    os.environ.setdefault("SHARED_CACHE_PATH", str(run_dir / "shared-cache.db"))
+    metrics_dir = run_dir / "metrics"
+    metrics_dir.mkdir()
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", str(metrics_dir))
+    return run_dir
+
+
+def main() -> None:
+    """Runs the server with several worker processes."""
+    parser = argparse.ArgumentParser(description="Run the chatbot backend with several worker processes.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument(
+        "--drain-timeout",
+        type=float,
+        default=SHUTDOWN_DRAIN_TIMEOUT,
+        help="Seconds to wait for in-flight requests on shutdown.",
+    )
+    args = parser.parse_args()
+    workers = max(1, args.workers)
+
+    run_dir = prepare_shared_state(workers)
+    try:
+        uvicorn.run(
+            "src.server:app",
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            timeout_graceful_shutdown=int(args.drain_timeout),
+            # Logging is configured by the app itself (`src/logger.py`).
+            log_config=None,
+        )
+    finally:
+        if run_dir is not None:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,37 @@
+"""@file logger.py
+@description This module configures application logging. Log calls only put
+the record on a bounded in-memory queue; formatting and writing happen on a
+background thread, so a log line never blocks the event loop or adds latency
+to a streaming response. Output is one JSON object per line, tagged with the
+ID of the request that emitted it. The level comes from `LOG_LEVEL`, and
+high-volume DEBUG records can be sampled with `LOG_DEBUG_SAMPLE_RATE`.
+"""
 import logging
 import logging.config
+import logging.handlers
+import queue
+import random
 import sys
+import uuid
+from collections.abc import Callable, MutableMapping
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from logging import LogRecord
 
+import orjson
+
+from src.config import LOG_DEBUG_SAMPLE_RATE, LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE
+
 LOGGER = logging.getLogger()
 
+# The ID of the request being handled, attached to every record it logs.
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed in `extra=`.
+_STANDARD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_listener: logging.handlers.QueueListener | None = None
+
 
 class PrettyPrintFormatter(logging.Formatter):
     """A custom log formatter for enhancing readability during local development.
@@ -28,19 +55,97 @@ class PrettyPrintFormatter(logging.Formatter):
 
         """
         log_entry = f"{record.levelname}: [{record.name}] {record.getMessage()}"
+        if getattr(record, "request_id", None):
+            log_entry += f" | request={record.request_id}"
         if record.exc_info:
             log_entry += f"\nException: {self.formatException(record.exc_info)}"
         return log_entry
 
 
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single-line JSON object.
+
+    The object holds the timestamp, level, logger name, message and request
+    ID, any fields passed with `extra=`, and the traceback if there is one.
+    """
+
+    def format(self: "JsonFormatter", record: LogRecord) -> str:
+        """Formats a log record as JSON.
+
+        Args:
+        ----
+            record: The `LogRecord` to be formatted.
+
+        Returns:
+        -------
+            The JSON document, without a trailing newline.
+
+        """
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update((key, value) for key, value in vars(record).items() if key not in _STANDARD_ATTRS)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records with the current request ID and samples DEBUG records.
+
+    It runs in the caller's context, before the record is queued, so the
+    request ID is read where the record was emitted and sampled-out records
+    cost nothing further.
+    """
+
+    def __init__(self: "RequestContextFilter", debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE) -> None:
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self: "RequestContextFilter", record: LogRecord) -> bool:
+        """Returns False for DEBUG records left out by sampling."""
+        if record.levelno <= logging.DEBUG and random.random() >= self.debug_sample_rate:  # noqa: S311
+            return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records for the listener thread without ever blocking.
+
+    Records are queued as they are: the message is formatted on the
+    listener thread rather than the caller's. When the queue is full the
+    record is dropped and counted instead of waiting for space.
+    """
+
+    def __init__(self: "NonBlockingQueueHandler", log_queue: queue.Queue) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self: "NonBlockingQueueHandler", record: LogRecord) -> LogRecord:
+        """Returns the record unchanged; the listener runs in this process."""
+        return record
+
+    def enqueue(self: "NonBlockingQueueHandler", record: LogRecord) -> None:
+        """Queues a record, dropping it if the queue is full."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
 def initialize_logger() -> None:
     """Sets up the root logger for the application.
 
     This function configures the application's logging system by first
     disabling all existing loggers from imported modules. This ensures that
     only the application's own logs are displayed. It then calls
-    `_set_root_logger` to configure the root logger with the custom
-    `PrettyPrintFormatter`.
+    `_set_root_logger` to route the root logger through the log queue.
     """
     # Disable all other loggers in imported modules
     logging.config.dictConfig({"version": 1, "disable_existing_loggers": True})
@@ -48,16 +153,75 @@ def initialize_logger() -> None:
 
 
 def _set_root_logger() -> None:
-    """Configures the root logger with a custom formatter and stream handler.
+    """Routes the root logger through a queue to a background writer thread.
 
     This internal function clears any existing handlers on the root logger,
-    sets the logging level to DEBUG, and adds a new handler that streams logs
-    to standard output using the `PrettyPrintFormatter`.
+    sets the level from `LOG_LEVEL`, and adds a non-blocking queue handler.
+    A `QueueListener` thread takes records off the queue and writes them to
+    standard output with the `JsonFormatter` (or the `PrettyPrintFormatter`
+    when `LOG_FORMAT` is "pretty").
     """
+    global _listener  # noqa: PLW0603
+    shutdown_logger()
+
     logger = logging.getLogger()
     logger.handlers.clear()
-    formatter = PrettyPrintFormatter()
-    logger.setLevel(logging.DEBUG)
+    logger.setLevel(LOG_LEVEL)
+
     stdout_handler = logging.StreamHandler(sys.stdout)
-    stdout_handler.setFormatter(formatter)
-    logger.addHandler(stdout_handler)
+    stdout_handler.setFormatter(PrettyPrintFormatter() if LOG_FORMAT == "pretty" else JsonFormatter())
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, stdout_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logger() -> None:
+    """Writes out the records still queued and stops the listener thread.
+
+    The queue handler is removed as well, so records logged afterwards are
+    not left in a queue nobody reads.
+    """
+    global _listener  # noqa: PLW0603
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    logger = logging.getLogger()
+    for handler in [handler for handler in logger.handlers if isinstance(handler, NonBlockingQueueHandler)]:
+        logger.removeHandler(handler)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware that gives each HTTP request an ID for its log records.
+
+    The ID is taken from the `X-Request-ID` request header when the client
+    (or a proxy) sends one, generated otherwise, and returned in the
+    response's `X-Request-ID` header. Tasks started by the request inherit
+    it, so background stream and tool tasks log under the same ID.
+    """
+
+    def __init__(self: "RequestIdMiddleware", app: Callable) -> None:
+        self.app = app
+
+    async def __call__(self: "RequestIdMiddleware", scope: MutableMapping, receive: Callable, send: Callable) -> None:
+        """Runs the request with its ID set in the logging context."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")[:128] or uuid.uuid4().hex
+
+        async def send_with_id(message: MutableMapping) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,111 @@
+"""@file metrics.py
+@description This module defines the Prometheus metrics exported on
+`/metrics`: time to first token, total latency and generation speed per model
+and route, latency of the agent graph nodes and of each tool, tool errors,
+agent iterations, and in-flight and cancelled streams. Every observation is a
+lock-protected counter update, cheap enough to leave on under full load. When
+the launcher runs several workers it sets `PROMETHEUS_MULTIPROC_DIR`, and
+`/metrics` aggregates the values of every worker.
+"""
+import os
+from collections.abc import Mapping
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.multiprocess import MultiProcessCollector
+
+# Latency buckets (seconds) spanning a cached reply to a long generation.
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+TIME_TO_FIRST_TOKEN = Histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from the start of a chat stream to its first content token.",
+    ["route", "model"],
+    buckets=_LATENCY_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "chat_request_duration_seconds",
+    "Time from the start of a chat stream to its last event.",
+    ["route", "model"],
+    buckets=_LATENCY_BUCKETS,
+)
+TOKENS_PER_SECOND = Histogram(
+    "chat_generation_tokens_per_second",
+    "Generation speed reported by Ollama (eval_count / eval_duration).",
+    ["route", "model"],
+    buckets=(1, 2.5, 5, 10, 20, 30, 40, 60, 80, 100, 150, 200, 300),
+)
+NODE_LATENCY = Histogram(
+    "agent_node_duration_seconds",
+    "Time spent in each agent graph node.",
+    ["node"],
+    buckets=_LATENCY_BUCKETS,
+)
+TOOL_LATENCY = Histogram(
+    "agent_tool_duration_seconds",
+    "Time spent in each tool call, including timeouts.",
+    ["tool"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+TOOL_ERRORS = Counter(
+    "agent_tool_errors_total",
+    "Tool calls that failed, timed out or named an unknown tool.",
+    ["tool"],
+)
+TOOL_CACHE_LOOKUPS = Counter(
+    "agent_tool_cache_lookups_total",
+    "Calls of pure tools, by whether the result came from the cache.",
+    ["tool", "result"],
+)
+AGENT_ITERATIONS = Histogram(
+    "agent_iterations",
+    "Agent node runs (LLM calls) per agent request.",
+    ["model"],
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10),
+)
+STREAMS_IN_FLIGHT = Gauge(
+    "chat_streams_in_flight",
+    "Chat streams currently generating.",
+    ["route"],
+    multiprocess_mode="livesum",
+)
+STREAMS_CANCELLED = Counter(
+    "chat_streams_cancelled_total",
+    "Streams cancelled because their client disconnected and did not resume.",
+)
+
+
+def observe_generation_speed(route: str, model_name: str, stats: Mapping) -> None:
+    """Records tokens/sec from the statistics in Ollama's final chunk.
+
+    Args:
+    ----
+        route: The route label (`chat`, `agent` or `session`).
+        model_name: The model that generated the response.
+        stats: A mapping with Ollama's `eval_count` and `eval_duration`
+               (in nanoseconds), such as the final chunk of `/api/chat` or a
+               LangChain message's `response_metadata`. Missing or zero
+               values are ignored.
+
+    """
+    eval_count = stats.get("eval_count")
+    eval_duration = stats.get("eval_duration")
+    if eval_count and eval_duration:
+        TOKENS_PER_SECOND.labels(route, model_name).observe(eval_count * 1e9 / eval_duration)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Renders every registered metric in the Prometheus text format.
+
+    With several workers the values are read from every worker's files in
+    `PROMETHEUS_MULTIPROC_DIR` and summed, so any worker can answer.
+
+    Returns
+    -------
+        The exposition body and its content type.
+
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
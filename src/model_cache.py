@@ -0,0 +1,280 @@
+"""@file model_cache.py
+@description This module caches the list of models reported by Ollama's
+`/api/tags` endpoint. Entries are served from memory while fresh; once the
+TTL has passed they are still served (stale-while-revalidate) while a
+background task fetches a new list. The cached list also lets the chat
+endpoints reject unknown model names without a round-trip to Ollama. With
+several workers, the list is also kept in the shared cache, so one worker's
+fetch serves them all. With several Ollama backends, the list is the union
+of what each of them reports.
+"""
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections.abc import Awaitable, Callable
+
+import httpx
+
+from src.backends import PIN_EXTENSION, Backend, backend_pool
+from src.config import (
+    MODEL_CACHE_MISS_REFRESH_INTERVAL,
+    MODEL_CACHE_STALE_TTL,
+    MODEL_CACHE_TTL,
+    OLLAMA_TAGS_URL,
+    SHARED_CACHE_PATH,
+)
+from src.http_client import get_http_client
+from src.logger import LOGGER
+from src.shared_cache import SharedValueStore
+
+# Name of the model list in the shared cache.
+_SHARED_NAME = "model_list"
+
+
+async def _fetch_backend_models(backend: Backend) -> list[dict]:
+    response = await get_http_client().get(OLLAMA_TAGS_URL, extensions={PIN_EXTENSION: backend.url})
+    response.raise_for_status()
+    models = response.json().get("models", [])
+    backend_pool.record_models(backend, models)
+    return models
+
+
+async def fetch_models() -> list[dict]:
+    """Fetches the list of available models from the Ollama backends.
+
+    Every healthy backend is asked concurrently, and the backend pool notes
+    which backend has which model so requests are only routed to backends
+    that can serve them. A backend that fails is left out of the list.
+
+    Returns
+    -------
+        The `models` arrays returned by the backends' `/api/tags` endpoints,
+        merged by model name.
+
+    Raises
+    ------
+        httpx.HTTPError: If no backend returned its list.
+
+    """
+    backends = [backend for backend in backend_pool.backends if backend.healthy] or backend_pool.backends
+    results = await asyncio.gather(
+        *(_fetch_backend_models(backend) for backend in backends), return_exceptions=True
+    )
+    merged: dict[str, dict] = {}
+    errors = []
+    for backend, result in zip(backends, results, strict=True):
+        if isinstance(result, httpx.HTTPError):
+            LOGGER.warning("Could not list models | backend=%s | error=%s", backend.url, result)
+            errors.append(result)
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        for model in result:
+            merged.setdefault(model.get("name") or model.get("model"), model)
+    if errors and len(errors) == len(backends):
+        raise errors[0]
+    return list(merged.values())
+
+
+class ModelListCache:
+    """An in-memory, stale-while-revalidate cache of the Ollama model list.
+
+    When given a shared store, a worker whose copy is no longer fresh first
+    adopts a newer list written by another worker, and only fetches from
+    Ollama if there is none.
+    """
+
+    def __init__(  # noqa: PLR0913
+            self: "ModelListCache",
+            fetcher: Callable[[], Awaitable[list[dict]]],
+            ttl: float = MODEL_CACHE_TTL,
+            stale_ttl: float = MODEL_CACHE_STALE_TTL,
+            shared: SharedValueStore | None = None,
+            miss_refresh_interval: float = MODEL_CACHE_MISS_REFRESH_INTERVAL,
+    ) -> None:
+        self._fetcher = fetcher
+        self._shared = shared
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._miss_refresh_interval = miss_refresh_interval
+        self._models: list[dict] | None = None
+        self._etag: str | None = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task | None = None
+
+    @property
+    def etag(self: "ModelListCache") -> str | None:
+        """The entity tag of the cached list, or `None` if nothing is cached."""
+        return self._etag
+
+    async def get_models(self: "ModelListCache") -> list[dict]:
+        """Returns the model list, fetching it only when necessary.
+
+        Fresh entries are returned directly. Entries older than the TTL but
+        within the stale window are returned immediately while a background
+        refresh is scheduled. Otherwise the list is fetched synchronously.
+
+        Returns
+        -------
+            The list of model objects reported by Ollama.
+
+        Raises
+        ------
+            Exception: If the list must be fetched and the fetch fails.
+
+        """
+        if self._shared is not None and not self._is_fresh():
+            await self._load_shared()
+        if self._models is not None:
+            age = time.monotonic() - self._fetched_at
+            if age < self._ttl:
+                return self._models
+            if age < self._ttl + self._stale_ttl:
+                self._schedule_refresh()
+                return self._models
+        return await self.refresh()
+
+    async def refresh(self: "ModelListCache", *, force: bool = False) -> list[dict]:
+        """Fetches a new model list and stores it in the cache.
+
+        Concurrent callers share a single upstream fetch.
+
+        Args:
+        ----
+            force: Fetch even if another caller has just refreshed the list.
+
+        Returns:
+        -------
+            The freshly fetched list of models.
+
+        """
+        async with self._lock:
+            if not force and self._shared is not None and not self._is_fresh():
+                await self._load_shared()
+            if not force and self._is_fresh():
+                return self._models
+            return await self._fetch()
+
+    async def _fetch(self: "ModelListCache") -> list[dict]:
+        # Callers hold `_lock`.
+        models = await self._fetcher()
+        serialized = json.dumps(models, sort_keys=True, default=str).encode()
+        self._store(models, serialized, time.monotonic())
+        if self._shared is not None:
+            try:
+                await asyncio.to_thread(self._shared.set, _SHARED_NAME, serialized)
+            except sqlite3.Error as e:
+                LOGGER.warning("Could not share the model list: %s", e)
+        return models
+
+    async def _refresh_after_miss(self: "ModelListCache") -> list[dict]:
+        # Refetches the list unless it was fetched within the last
+        # `miss_refresh_interval` seconds, so a model pulled since the last
+        # fetch is found at once, while requests for a name that does not
+        # exist cause at most one fetch per interval.
+        async with self._lock:
+            if self._models is not None and time.monotonic() - self._fetched_at < self._miss_refresh_interval:
+                return self._models
+            return await self._fetch()
+
+    def _is_fresh(self: "ModelListCache") -> bool:
+        return self._models is not None and time.monotonic() - self._fetched_at < self._ttl
+
+    def _store(self: "ModelListCache", models: list[dict], serialized: bytes, fetched_at: float) -> None:
+        self._etag = f'"{hashlib.sha256(serialized).hexdigest()[:32]}"'
+        self._models = models
+        self._fetched_at = fetched_at
+
+    async def _load_shared(self: "ModelListCache") -> None:
+        # Adopt the shared list if another worker fetched it after we did.
+        # Its age is carried over, so it expires at the same time everywhere.
+        try:
+            entry = await asyncio.to_thread(self._shared.get, _SHARED_NAME)
+        except sqlite3.Error as e:
+            LOGGER.warning("Could not read the shared model list: %s", e)
+            return
+        if entry is None:
+            return
+        serialized, updated_at = entry
+        fetched_at = time.monotonic() - max(0.0, time.time() - updated_at)
+        if self._models is None or fetched_at > self._fetched_at:
+            self._store(json.loads(serialized), serialized, fetched_at)
+
+    def _schedule_refresh(self: "ModelListCache") -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self: "ModelListCache") -> None:
+        # Not forced: the local copy is stale anyway, and another worker may
+        # already have put a fresh list in the shared cache.
+        try:
+            await self.refresh()
+        except Exception as e:
+            LOGGER.warning("Background model list refresh failed: %s", e)
+
+    async def is_known_model(self: "ModelListCache", model_name: str) -> bool:
+        """Checks whether Ollama reports a model with the given name.
+
+        A bare name such as `llama3` also matches its `:latest` tag. A name
+        missing from the cached list is looked up again in a refetched list
+        (at most once per `miss_refresh_interval`), so a newly pulled model
+        is not rejected until the TTL expires. If the model list cannot be
+        fetched, the check passes so that the request reaches Ollama and
+        fails with its own error.
+
+        Args:
+        ----
+            model_name: The model name sent by the client.
+
+        Returns:
+        -------
+            `False` only if the model list is available and does not contain
+            the model.
+
+        """
+        try:
+            if _lists_model(await self.get_models(), model_name):
+                return True
+            return _lists_model(await self._refresh_after_miss(), model_name)
+        except Exception as e:
+            LOGGER.warning("Could not verify model '%s': %s", model_name, e)
+            return True
+
+    def invalidate(self: "ModelListCache") -> None:
+        """Drops the cached list so the next lookup fetches it again."""
+        self._models = None
+        self._etag = None
+        self._fetched_at = 0.0
+
+
+def _lists_model(models: list[dict], model_name: str) -> bool:
+    names = {model.get(key) for model in models for key in ("name", "model")}
+    return model_name in names or f"{model_name}:latest" in names
+
+
+def etag_matches(if_none_match: str | None, etag: str | None) -> bool:
+    """Checks an `If-None-Match` request header against an entity tag.
+
+    Args:
+    ----
+        if_none_match: The raw header value (may list several tags).
+        etag: The current entity tag.
+
+    Returns:
+    -------
+        `True` if the client already holds the current representation.
+
+    """
+    if not if_none_match or etag is None:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+model_list_cache = ModelListCache(
+    fetch_models,
+    shared=SharedValueStore(SHARED_CACHE_PATH) if SHARED_CACHE_PATH else None,
+)
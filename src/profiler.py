@@ -0,0 +1,325 @@
+"""@file profiler.py
+@description This module is an opt-in sampling profiler for slow requests.
+Once a request has been running longer than a threshold, a background thread
+samples its call stacks at a fixed interval until it finishes: the frames of
+whichever of the request's tasks is running on the event loop, and the await
+chain of each of its suspended tasks, so time spent waiting on Ollama shows up
+next to time spent on the CPU. Requests that finish under the threshold are
+never sampled, which keeps the overhead low enough for production. Captured
+profiles are kept in a bounded ring of files on disk and can be read back as
+folded stacks, the input format of flamegraph.pl, speedscope and inferno.
+"""
+import asyncio
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import Counter
+from collections.abc import Awaitable, Callable, MutableMapping
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from types import FrameType
+
+import orjson
+
+from src.config import PROFILE_DIR, PROFILE_INTERVAL, PROFILE_MAX_FILES, PROFILE_THRESHOLD
+from src.logger import LOGGER
+
+_PROFILE_ID = re.compile(r"\d{13}-[0-9a-f]{8}")
+
+
+class ProfileNotFoundError(KeyError):
+    """Raised when a profile ID is unknown or has left the ring."""
+
+
+@dataclass
+class ProfiledRequest:
+    """A request in flight, the tasks it spawned and its samples so far."""
+
+    method: str
+    path: str
+    loop: asyncio.AbstractEventLoop
+    thread_id: int
+    started: float = field(default_factory=time.perf_counter)
+    started_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+    tasks: set[asyncio.Task] = field(default_factory=set)
+    stacks: Counter = field(default_factory=Counter)
+    samples: int = 0
+    context_token: Token | None = None
+
+
+_current_request: ContextVar[ProfiledRequest | None] = ContextVar("profiled_request", default=None)
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    # Library frames are shown relative to site-packages, our own relative
+    # to the working directory.
+    path = Path(filename)
+    if "site-packages" in path.parts:
+        return "/".join(path.parts[path.parts.index("site-packages") + 1:])
+    try:
+        return str(path.relative_to(Path.cwd()))
+    except ValueError:
+        return path.name
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _live_stack(frame: FrameType, task: asyncio.Task) -> list[str]:
+    # The running thread's frames, cut at the task's outermost coroutine so
+    # the event loop's own frames are left out.
+    root = getattr(task.get_coro(), "cr_frame", None)
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        if frame is root:
+            break
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _await_stack(coro: object) -> list[str]:
+    # A suspended task has no thread stack; follow the chain of coroutines
+    # (and generators) it is awaiting instead, outermost first.
+    labels = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        labels.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return labels
+
+
+def to_folded(profile: dict) -> str:
+    """Renders a profile as folded stacks, one `frame;frame;... count` per line.
+
+    The first frame of each stack is `running` or `waiting`, separating time
+    on the CPU from time suspended in an `await`.
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(profile["stacks"].items()))
+
+
+class ProfileStore:
+    """A bounded ring of profiles, one JSON file each; the oldest is deleted first."""
+
+    def __init__(
+            self: "ProfileStore",
+            directory: str | Path = PROFILE_DIR,
+            max_profiles: int = PROFILE_MAX_FILES,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_profiles = max(1, max_profiles)
+
+    def _files(self: "ProfileStore") -> list[Path]:
+        # IDs start with a millisecond timestamp, so names sort oldest first.
+        if not self.directory.is_dir():
+            return []
+        return sorted(self.directory.glob("*.json"))
+
+    def save(self: "ProfileStore", profile: dict) -> None:
+        """Writes a profile and trims the ring to `max_profiles` files."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f"{profile['id']}.json").write_bytes(orjson.dumps(profile))
+        for path in self._files()[:-self.max_profiles]:
+            path.unlink(missing_ok=True)
+
+    def get(self: "ProfileStore", profile_id: str) -> dict:
+        """Reads one profile.
+
+        Raises
+        ------
+            ProfileNotFoundError: If no profile has this ID.
+
+        """
+        path = self.directory / f"{profile_id}.json"
+        if not _PROFILE_ID.fullmatch(profile_id) or not path.is_file():
+            raise ProfileNotFoundError(profile_id)
+        return orjson.loads(path.read_bytes())
+
+    def list(self: "ProfileStore") -> list[dict]:
+        """Summarizes the stored profiles, newest first, without their stacks."""
+        summaries = []
+        for path in reversed(self._files()):
+            try:
+                profile = orjson.loads(path.read_bytes())
+            except (OSError, orjson.JSONDecodeError):
+                continue
+            summaries.append({key: value for key, value in profile.items() if key != "stacks"})
+        return summaries
+
+
+class SamplingProfiler:
+    """Samples the stacks of requests that run longer than a threshold."""
+
+    def __init__(
+            self: "SamplingProfiler",
+            store: ProfileStore,
+            threshold: float = PROFILE_THRESHOLD,
+            interval: float = PROFILE_INTERVAL,
+    ) -> None:
+        self.store = store
+        self.threshold = threshold
+        self.interval = interval
+        self.profiled = 0
+        self._active: dict[int, ProfiledRequest] = {}
+        self._loops: weakref.WeakSet = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _task_factory(
+            self: "SamplingProfiler",
+            loop: asyncio.AbstractEventLoop,
+            coro: Awaitable,
+            **kwargs: object,
+    ) -> asyncio.Task:
+        # Attributes every task to the request whose context created it, so
+        # the graph, tool calls and background stream tasks are sampled too.
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        request = _current_request.get()
+        if request is not None:
+            request.tasks.add(task)
+        return task
+
+    def _install(self: "SamplingProfiler", loop: asyncio.AbstractEventLoop) -> None:
+        if loop not in self._loops:
+            loop.set_task_factory(self._task_factory)
+            self._loops.add(loop)
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+            self._thread.start()
+
+    def begin(self: "SamplingProfiler", method: str, path: str) -> ProfiledRequest:
+        """Starts tracking the current request; must be called from its task."""
+        loop = asyncio.get_running_loop()
+        self._install(loop)
+        request = ProfiledRequest(method=method, path=path, loop=loop, thread_id=threading.get_ident())
+        if (task := asyncio.current_task()) is not None:
+            request.tasks.add(task)
+        request.context_token = _current_request.set(request)
+        self._active[id(request)] = request
+        return request
+
+    def end(self: "SamplingProfiler", request: ProfiledRequest, status: int | None) -> dict | None:
+        """Stops tracking a request.
+
+        Returns
+        -------
+            The request's profile, or None if it was never sampled.
+
+        """
+        with self._lock:
+            self._active.pop(id(request), None)
+        if request.context_token is not None:
+            _current_request.reset(request.context_token)
+            request.context_token = None
+        if not request.samples:
+            return None
+        self.profiled += 1
+        return {
+            "id": f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}",
+            "method": request.method,
+            "path": request.path,
+            "status": status,
+            "started_at": request.started_at,
+            "duration_ms": round((time.perf_counter() - request.started) * 1000, 2),
+            "threshold_ms": round(self.threshold * 1000, 2),
+            "interval_ms": round(self.interval * 1000, 2),
+            "samples": request.samples,
+            "stacks": dict(request.stacks),
+        }
+
+    def _run(self: "SamplingProfiler") -> None:
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            with self._lock:
+                for request in list(self._active.values()):
+                    if now - request.started >= self.threshold:
+                        self._sample(request)
+
+    def _sample(self: "SamplingProfiler", request: ProfiledRequest) -> None:
+        running = asyncio.current_task(request.loop)
+        loop_frame = sys._current_frames().get(request.thread_id)  # noqa: SLF001
+        for task in list(request.tasks):
+            if task.done():
+                continue
+            if task is running and loop_frame is not None:
+                stack = ["running", *_live_stack(loop_frame, task)]
+            else:
+                stack = ["waiting", *_await_stack(task.get_coro())]
+            request.stacks[";".join(stack)] += 1
+        request.samples += 1
+
+    def stop(self: "SamplingProfiler") -> None:
+        """Stops the sampling thread."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def get_stats(self: "SamplingProfiler") -> dict[str, int | float]:
+        """Reports the profiler's settings and how many requests it captured."""
+        return {
+            "in_flight": len(self._active),
+            "profiled": self.profiled,
+            "threshold": self.threshold,
+            "interval": self.interval,
+            "max_profiles": self.store.max_profiles,
+        }
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles HTTP requests running past the threshold."""
+
+    def __init__(self: "ProfilingMiddleware", app: Callable, profiler: SamplingProfiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self: "ProfilingMiddleware", scope: MutableMapping, receive: Callable, send: Callable) -> None:
+        """Runs the request, then stores its profile if it was sampled."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = self.profiler.begin(scope["method"], scope["path"])
+        status = None
+
+        async def send_with_status(message: MutableMapping) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            profile = self.profiler.end(request, status)
+            if profile is not None:
+                # Writing the file and trimming the ring touch the disk, so
+                # they run in a worker thread instead of stalling the loop.
+                try:
+                    await asyncio.to_thread(self.profiler.store.save, profile)
+                except OSError as e:
+                    LOGGER.warning("Could not store profile for %s %s: %s", request.method, request.path, e)
+                else:
+                    LOGGER.info(
+                        "Slow request profiled | %s %s | %.0f ms | %d samples | profile=%s",
+                        request.method, request.path, profile["duration_ms"], profile["samples"], profile["id"],
+                    )
+
+
+profile_store = ProfileStore()
+profiler = SamplingProfiler(profile_store)
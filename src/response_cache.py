@@ -0,0 +1,323 @@
+"""@file response_cache.py
+@description This module implements an opt-in, exact-match cache of complete
+chat responses. Entries are keyed on a canonical hash of the model, the
+messages and the generation options, stored as the chunks of the NDJSON body
+the client received, and evicted least-recently-used once a byte budget is
+exceeded. A cache hit is replayed as the same event stream, without touching
+Ollama or the agent graph. With several workers the cache lives in the shared
+SQLite database, so a response cached by one worker is a hit in all of them.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import AsyncGenerator, AsyncIterator
+
+from src.config import RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_MAX_BYTES, SHARED_CACHE_PATH
+from src.shared_cache import connect
+
+
+def make_cache_key(**parts: object) -> str:
+    """Builds a canonical cache key from the parts of a request.
+
+    Dictionaries are serialized with sorted keys, so two requests that only
+    differ in key order share a key.
+
+    Args:
+    ----
+        **parts: The request fields that determine the response.
+
+    Returns:
+    -------
+        A hex SHA-256 digest of the canonical JSON encoding of `parts`.
+
+    """
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def is_deterministic(options: dict | None) -> bool:
+    """Checks whether generation options produce a repeatable response.
+
+    Ollama samples with a non-zero temperature by default, so a request is
+    only considered deterministic if it asks for temperature 0 or pins the
+    sampling seed.
+
+    Args:
+    ----
+        options: The Ollama generation options of the request.
+
+    Returns:
+    -------
+        `True` if replaying a cached response is equivalent to generating it.
+
+    """
+    if not options:
+        return False
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+def _is_complete(chunks: list[bytes]) -> bool:
+    # Only streams that ran to the end are worth replaying: Ollama finishes
+    # with `"done": true` and the agent stream with a `done` event. Chunks
+    # are passed through as received, so a line may span several of them.
+    body = b"".join(chunks).rstrip()
+    if not body:
+        return False
+    try:
+        last = json.loads(body.rsplit(b"\n", 1)[-1])
+    except json.JSONDecodeError:
+        return False
+    return isinstance(last, dict) and (last.get("done") is True or last.get("type") == "done")
+
+
+class ResponseCache:
+    """An LRU cache of response streams bounded by their total size in bytes."""
+
+    def __init__(self: "ResponseCache", max_bytes: int = RESPONSE_CACHE_MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, tuple[list[bytes], int]] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self: "ResponseCache", key: str) -> list[bytes] | None:
+        """Returns the cached chunks for a key, or `None` on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    async def lookup(self: "ResponseCache", key: str) -> list[bytes] | None:
+        """Like `get`, for use on the event loop; a memory lookup never blocks."""
+        return self.get(key)
+
+    def put(self: "ResponseCache", key: str, chunks: list[bytes]) -> bool:
+        """Stores a response, evicting the least recently used ones if needed.
+
+        Args:
+        ----
+            key: The cache key of the request.
+            chunks: The NDJSON body of the response, in order.
+
+        Returns:
+        -------
+            `False` if the response alone is larger than the byte budget and
+            was therefore not stored.
+
+        """
+        size = sum(len(chunk) for chunk in chunks)
+        if size > self.max_bytes:
+            return False
+
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+        self._entries[key] = (chunks, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+        return True
+
+    def clear(self: "ResponseCache") -> None:
+        """Removes every cached response."""
+        self._entries.clear()
+        self._size = 0
+
+    async def record(self: "ResponseCache", key: str, stream: AsyncIterator[bytes]) -> AsyncGenerator[bytes, None]:
+        """Relays a response stream and caches it once it completes.
+
+        Args:
+        ----
+            key: The cache key of the request.
+            stream: The live response stream.
+
+        Yields:
+        ------
+            Each chunk of `stream`, unchanged.
+
+        """
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        if _is_complete(chunks):
+            self.put(key, chunks)
+
+    def get_stats(self: "ResponseCache") -> dict[str, int | bool]:
+        """Reports cache size and hit/miss counters."""
+        return {
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "shared": False,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteResponseCache:
+    """A response cache shared by all workers through the shared SQLite database.
+
+    Like `ResponseCache`, it is bounded by the total size of its entries and
+    evicts the least recently used ones first. Lookups (single-row reads by
+    primary key) and storing a finished response run in a worker thread.
+    Hit, miss and eviction counters are per worker.
+    """
+
+    def __init__(
+            self: "SQLiteResponseCache",
+            path: str = SHARED_CACHE_PATH,
+            max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection = connect(path)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, used_at REAL NOT NULL)"
+            )
+
+    def get(self: "SQLiteResponseCache", key: str) -> list[bytes] | None:
+        """Returns the cached body for a key as one chunk, or `None` on a miss."""
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT body FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._connection.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [bytes(row[0])]
+
+    async def lookup(self: "SQLiteResponseCache", key: str) -> list[bytes] | None:
+        """Like `get`, run in a worker thread so the event loop never waits on SQLite.
+
+        The query may wait for the database lock (up to the busy timeout)
+        and for `put`, which holds the connection while it stores and
+        evicts entries.
+        """
+        return await asyncio.to_thread(self.get, key)
+
+    def put(self: "SQLiteResponseCache", key: str, chunks: list[bytes]) -> bool:
+        """Stores a response, evicting the least recently used ones if needed.
+
+        Args:
+        ----
+            key: The cache key of the request.
+            chunks: The NDJSON body of the response, in order.
+
+        Returns:
+        -------
+            `False` if the response alone is larger than the byte budget and
+            was therefore not stored.
+
+        """
+        body = b"".join(chunks)
+        if len(body) > self.max_bytes:
+            return False
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO response_cache (key, body, size, used_at) VALUES (?, ?, ?, ?)",
+                (key, body, len(body), time.time()),
+            )
+            # Drop every entry past the byte budget, counting from the most
+            # recently used.
+            evicted = self._connection.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY used_at DESC, key) AS total "
+                "FROM response_cache) WHERE total > ?)",
+                (self.max_bytes,),
+            ).rowcount
+        self.evictions += evicted
+        return True
+
+    def clear(self: "SQLiteResponseCache") -> None:
+        """Removes every cached response, for all workers."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM response_cache")
+
+    async def record(
+            self: "SQLiteResponseCache",
+            key: str,
+            stream: AsyncIterator[bytes],
+    ) -> AsyncGenerator[bytes, None]:
+        """Relays a response stream and caches it once it completes.
+
+        Args:
+        ----
+            key: The cache key of the request.
+            stream: The live response stream.
+
+        Yields:
+        ------
+            Each chunk of `stream`, unchanged.
+
+        """
+        chunks = []
+        async for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        if _is_complete(chunks):
+            await asyncio.to_thread(self.put, key, chunks)
+
+    def get_stats(self: "SQLiteResponseCache") -> dict[str, int | bool]:
+        """Reports cache size and this worker's hit/miss counters."""
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM response_cache"
+            ).fetchone()
+        return {
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "shared": True,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self: "SQLiteResponseCache") -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+
+def create_response_cache() -> ResponseCache | SQLiteResponseCache:
+    """Builds the shared cache when `SHARED_CACHE_PATH` is set, else an in-memory one."""
+    if SHARED_CACHE_PATH:
+        return SQLiteResponseCache(SHARED_CACHE_PATH)
+    return ResponseCache()
+
+
+async def replay(chunks: list[bytes]) -> AsyncGenerator[bytes, None]:
+    """Replays a cached NDJSON body as a response stream.
+
+    Args:
+    ----
+        chunks: The cached chunks of a previous response.
+
+    Yields:
+    ------
+        Each cached chunk, in its original order.
+
+    """
+    for chunk in chunks:
+        yield chunk
+
+
+response_cache = create_response_cache()
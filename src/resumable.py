@@ -0,0 +1,341 @@
+"""@file resumable.py
+@description This module makes chat streams resumable. Each response stream
+runs in its own task, independent of the HTTP connection that started it, and
+its NDJSON lines are numbered and kept in a bounded ring buffer. A client
+whose connection drops can reconnect with `Last-Event-ID` and continue from
+the next event while generation carries on, instead of asking Ollama to
+produce the whole answer again. A stream nobody comes back for is cancelled
+shortly after its client leaves, and finished streams are dropped once no
+client has read them for a grace period.
+"""
+import asyncio
+import contextlib
+import uuid
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator
+
+import orjson
+
+from src.config import STREAM_BUFFER_EVENTS, STREAM_CANCEL_AFTER, STREAM_GRACE_PERIOD
+from src.logger import LOGGER
+from src.metrics import STREAMS_CANCELLED
+
+
+class StreamNotFoundError(KeyError):
+    """Raised when a stream ID is unknown or its grace period has ended."""
+
+
+class StreamGapError(Exception):
+    """Raised when the events after `Last-Event-ID` have left the buffer."""
+
+
+def error_event(message: str) -> bytes:
+    """Encodes an error that ends a stream as an NDJSON line.
+
+    The line carries the message both as `error`, like the errors of
+    `/api/chat`, and as the `content` of an event of type `error`, like those
+    of the agent routes, so every client notices it.
+    """
+    return orjson.dumps({"type": "error", "content": message, "error": message}) + b"\n"
+
+
+def format_event(event_id: int | None, line: bytes, *, sse: bool) -> bytes:
+    """Frames one stream event for the wire.
+
+    Args:
+    ----
+        event_id: The event's position in the stream, starting at 1, or
+                  `None` for an event outside the stream, which has no ID.
+        line: The NDJSON line of the event, including its newline.
+        sse: Whether to frame the event as Server-Sent Events.
+
+    Returns:
+    -------
+        The line unchanged for NDJSON, where the event ID is the line number,
+        or an SSE message carrying the ID in its `id:` field.
+
+    """
+    if not sse:
+        return line
+    if event_id is None:
+        return b"data: %s\n\n" % line.rstrip(b"\n")
+    return b"id: %d\ndata: %s\n\n" % (event_id, line.rstrip(b"\n"))
+
+
+class ResumableStream:
+    """A response stream whose latest events are kept for replay."""
+
+    def __init__(self: "ResumableStream", stream_id: str, max_events: int = STREAM_BUFFER_EVENTS) -> None:
+        self.stream_id = stream_id
+        self.done = False
+        self.subscribers = 0
+        self.task: asyncio.Task | None = None
+        self._events: deque[bytes] = deque(maxlen=max(1, max_events))
+        self._next_id = 1
+        self._changed = asyncio.Condition()
+
+    @property
+    def first_event_id(self: "ResumableStream") -> int:
+        """The ID of the oldest event still in the buffer."""
+        return self._next_id - len(self._events)
+
+    @property
+    def last_event_id(self: "ResumableStream") -> int:
+        """The ID of the newest event, or 0 if nothing was produced yet."""
+        return self._next_id - 1
+
+    def can_resume_after(self: "ResumableStream", last_event_id: int) -> bool:
+        """Checks whether every event after `last_event_id` is still buffered."""
+        return last_event_id + 1 >= self.first_event_id
+
+    async def _publish(self: "ResumableStream", lines: list[bytes]) -> None:
+        async with self._changed:
+            self._events.extend(lines)
+            self._next_id += len(lines)
+            self._changed.notify_all()
+
+    async def run(self: "ResumableStream", source: AsyncIterator[bytes | str]) -> None:
+        """Drains the source into the buffer, one event per NDJSON line.
+
+        Ollama writes one NDJSON line per chunk, and such a chunk is stored
+        as received, without copying. Only chunks that split or join lines
+        are cut at their newlines; an incomplete line is held back until it
+        ends.
+
+        Args:
+        ----
+            source: The response stream produced by the route.
+
+        """
+        pending = b""
+        try:
+            async for chunk in source:
+                data = chunk.encode() if isinstance(chunk, str) else chunk
+                if not pending and len(data) > 1 and data.find(b"\n") == len(data) - 1:
+                    await self._publish([data])
+                    continue
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                if lines:
+                    await self._publish([line + b"\n" for line in lines if line])
+            if pending:
+                await self._publish([pending + b"\n"])
+        except Exception as e:
+            # Ends the stream with an error event, so readers do not take
+            # what they received for the whole answer.
+            LOGGER.error("Stream %s failed: %s", self.stream_id, e)
+            await self._publish([error_event(f"Stream failed: {e}")])
+        except asyncio.CancelledError:
+            await self._publish([error_event("Stream cancelled")])
+            raise
+        finally:
+            # Closing the source releases what it holds, such as its
+            # admission slot, even if it ended before being read.
+            if (close := getattr(source, "aclose", None)) is not None:
+                with contextlib.suppress(Exception):
+                    await close()
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def events(
+            self: "ResumableStream",
+            last_event_id: int = 0,
+    ) -> AsyncGenerator[tuple[int | None, bytes], None]:
+        """Yields the events after `last_event_id`, then follows the live stream.
+
+        Args:
+        ----
+            last_event_id: The last event the client received; 0 reads the
+                           stream from the start.
+
+        Yields:
+        ------
+            `(event_id, line)` pairs in order, until the stream is done. A
+            reader that falls so far behind that the buffer overwrote its
+            next event gets an error event without an ID and is stopped;
+            resuming from its last event then fails with a 410.
+
+        """
+        cursor = last_event_id + 1
+        while True:
+            async with self._changed:
+                while self._next_id <= cursor and not self.done:
+                    await self._changed.wait()
+                first_event_id = self.first_event_id
+                offset = cursor - first_event_id
+                batch = [self._events[index] for index in range(offset, len(self._events))] if offset >= 0 else []
+                finished = self.done
+            if offset < 0:
+                LOGGER.warning(
+                    "Stream reader fell behind | stream=%s | lost_events=%d-%d",
+                    self.stream_id, cursor, first_event_id - 1,
+                )
+                yield None, error_event(
+                    f"Events {cursor} to {first_event_id - 1} of stream {self.stream_id} "
+                    "were dropped before they could be sent"
+                )
+                return
+            for line in batch:
+                yield cursor, line
+                cursor += 1
+            if finished and not batch:
+                return
+
+
+class StreamManager:
+    """Starts resumable streams and keeps them for their grace period.
+
+    A running stream whose last reader disconnected is given `cancel_after`
+    seconds to be resumed; after that its task is cancelled, which closes
+    the upstream Ollama connection or stops the agent graph mid-run, so the
+    GPU does not keep generating output nobody will read.
+    """
+
+    def __init__(
+            self: "StreamManager",
+            max_events: int = STREAM_BUFFER_EVENTS,
+            grace_period: float = STREAM_GRACE_PERIOD,
+            cancel_after: float = STREAM_CANCEL_AFTER,
+    ) -> None:
+        self.max_events = max_events
+        self.grace_period = grace_period
+        self.cancel_after = cancel_after
+        self.cancelled = 0
+        self._streams: dict[str, ResumableStream] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+
+    def start(self: "StreamManager", source: AsyncIterator[bytes | str]) -> ResumableStream:
+        """Runs a response stream in the background and registers it.
+
+        Args:
+        ----
+            source: The response stream produced by the route.
+
+        Returns:
+        -------
+            The new stream, already generating.
+
+        """
+        stream = ResumableStream(uuid.uuid4().hex, self.max_events)
+        self._streams[stream.stream_id] = stream
+        stream.task = asyncio.create_task(stream.run(source))
+        stream.task.add_done_callback(lambda _: self._schedule(stream))
+        return stream
+
+    def get(self: "StreamManager", stream_id: str) -> ResumableStream:
+        """Returns a stream that is still running or within its grace period."""
+        stream = self._streams.get(stream_id)
+        if stream is None:
+            raise StreamNotFoundError(stream_id)
+        return stream
+
+    async def subscribe(
+            self: "StreamManager",
+            stream: ResumableStream,
+            last_event_id: int = 0,
+            *,
+            sse: bool = False,
+    ) -> AsyncGenerator[bytes, None]:
+        """Reads a stream for one client connection.
+
+        Disconnecting ends this reader; the stream keeps generating for
+        `cancel_after` seconds in case the client resumes it.
+
+        Args:
+        ----
+            stream: The stream to read.
+            last_event_id: The last event the client already received.
+            sse: Whether to frame events as Server-Sent Events.
+
+        Yields:
+        ------
+            The framed events after `last_event_id`.
+
+        Raises:
+        ------
+            StreamGapError: If some of those events have left the buffer.
+
+        """
+        if not stream.can_resume_after(last_event_id):
+            raise StreamGapError(stream.stream_id)
+
+        if (handle := self._timers.pop(stream.stream_id, None)) is not None:
+            handle.cancel()
+        stream.subscribers += 1
+        try:
+            async for event_id, line in stream.events(last_event_id):
+                yield format_event(event_id, line, sse=sse)
+        finally:
+            stream.subscribers -= 1
+            self._schedule(stream)
+
+    def _schedule(self: "StreamManager", stream: ResumableStream) -> None:
+        # Nobody is reading: expire a finished stream after the grace period,
+        # or cancel a running one if it is not resumed in time.
+        if stream.subscribers or stream.stream_id not in self._streams:
+            return
+        if (handle := self._timers.pop(stream.stream_id, None)) is not None:
+            handle.cancel()
+        delay, callback = (
+            (self.grace_period, self._expire) if stream.done else (self.cancel_after, self._cancel)
+        )
+        self._timers[stream.stream_id] = asyncio.get_running_loop().call_later(delay, callback, stream.stream_id)
+
+    def _cancel(self: "StreamManager", stream_id: str) -> None:
+        self._timers.pop(stream_id, None)
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.done or stream.subscribers or stream.task is None:
+            return
+        stream.task.cancel()
+        self.cancelled += 1
+        STREAMS_CANCELLED.inc()
+        LOGGER.info("Stream cancelled after client disconnect | stream=%s", stream_id)
+
+    def _expire(self: "StreamManager", stream_id: str) -> None:
+        self._timers.pop(stream_id, None)
+        stream = self._streams.get(stream_id)
+        if stream is not None and stream.done and not stream.subscribers:
+            del self._streams[stream_id]
+
+    async def drain(self: "StreamManager", timeout: float) -> int:
+        """Waits for running streams to finish, for shutdown.
+
+        Streams still running after `timeout` seconds are cancelled.
+
+        Args:
+        ----
+            timeout: Seconds to wait for the streams to finish.
+
+        Returns:
+        -------
+            The number of streams that had to be cancelled.
+
+        """
+        tasks = [stream.task for stream in self._streams.values() if stream.task is not None and not stream.done]
+        if not tasks:
+            return 0
+        LOGGER.info("Draining %d running streams | timeout=%ss", len(tasks), timeout)
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+            LOGGER.warning("Cancelled %d streams still running after the drain timeout", len(pending))
+        return len(pending)
+
+    def get_stats(self: "StreamManager") -> dict[str, int | float]:
+        """Reports how many streams are buffered, running, read and cancelled."""
+        streams = list(self._streams.values())
+        return {
+            "streams": len(streams),
+            "running": sum(1 for stream in streams if not stream.done),
+            "subscribers": sum(stream.subscribers for stream in streams),
+            "cancelled": self.cancelled,
+            "max_events": self.max_events,
+            "grace_period": self.grace_period,
+            "cancel_after": self.cancel_after,
+        }
+
+
+stream_manager = StreamManager()
@@ -1,20 +1,43 @@
 """@file routes.py
 @description This module defines the API routes for the backend server.
-It includes endpoints for health checks, listing available models, and handling
-both simple and agent-based chat requests. All routes are collected under a
-single FastAPI APIRouter.
+It includes endpoints for health checks, listing available models, handling
+both simple and agent-based chat requests, resuming dropped streams,
+server-side chat sessions, and admin operations. All routes are collected under a single FastAPI APIRouter.
 """
-import httpx
-from fastapi import APIRouter
-from starlette.responses import StreamingResponse
+from collections.abc import AsyncIterator
+from typing import Literal
 
-from src.config import ENABLE_AGENT_MODE, OLLAMA_TAGS_URL
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from starlette.responses import PlainTextResponse, StreamingResponse
+
+from src.admission import AdmissionRejectedError, admission_controller
+from src.agent.tool_cache import tool_result_cache
+from src.backends import backend_pool
+from src.config import ENABLE_AGENT_MODE, RESPONSE_CACHE_ENABLED, VALIDATE_MODEL_NAMES
+from src.http_client import get_pool_stats
 from src.logger import LOGGER
+from src.metrics import render_metrics
+from src.model_cache import etag_matches, model_list_cache
+from src.profiler import ProfileNotFoundError, profile_store, profiler, to_folded
+from src.response_cache import is_deterministic, make_cache_key, replay, response_cache
+from src.resumable import StreamNotFoundError, stream_manager
+from src.sessions import SessionNotFoundError, session_store
 from src.streaming import agent_stream_generator, ollama_stream_generator
-from src.types import AgentChatRequest, ChatRequest
+from src.types import (
+    AgentChatRequest,
+    ChatRequest,
+    ModelActionRequest,
+    SessionCreateRequest,
+    SessionMessageRequest,
+)
+from src.warmup import load_model, unload_model
 
 router = APIRouter()
 
+# Request fields that do not change the response, and so are left out of
+# response cache keys.
+_CACHE_KEY_IGNORED_FIELDS = frozenset({"keep_alive"})
+
 
 @router.get("/api/health")
 async def health_check() -> dict[str, str]:
@@ -36,33 +59,381 @@ async def health_check() -> dict[str, str]:
     }
 
 
-@router.get("/api/models")
-async def list_models() -> dict:
+@router.get("/metrics")
+async def metrics() -> Response:
+    """Exports service metrics in the Prometheus text format.
+
+    Returns
+    -------
+        Time to first token, latency and tokens/sec per model and route,
+        agent node and tool latencies, tool errors, agent iterations, and
+        in-flight and cancelled streams.
+
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+@router.get("/api/models", response_model=None)
+async def list_models(request: Request, response: Response) -> dict | Response:
     """Retrieves the list of available models from the Ollama API.
 
-    This endpoint fetches model tags from the local Ollama instance and returns
-    them as a list. It includes error handling for network issues or if the
-    Ollama server is not accessible.
+    The list is served from `model_list_cache`, which refreshes it in the
+    background once its TTL expires. The response carries an `ETag`, and a
+    request whose `If-None-Match` header matches it receives a 304. It
+    includes error handling for network issues or if the Ollama server is
+    not accessible.
 
-    Returns
+    Args:
+    ----
+        request: The incoming request, used to read `If-None-Match`.
+        response: The outgoing response, used to set the `ETag` header.
+
+    Returns:
     -------
-        A dictionary containing a list of model objects, or an error message
-        if the request fails.
+        A dictionary containing a list of model objects, an empty 304
+        response if the client's copy is current, or an error message if
+        the request fails.
 
     """
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(OLLAMA_TAGS_URL)
-            response.raise_for_status()
-            data = response.json()
-            return {"models": data.get("models", [])}
+        models = await model_list_cache.get_models()
     except Exception as e:
-        LOGGER.error(f"Failed to fetch models: {e}")
+        LOGGER.error("Failed to fetch models: %s", e)
         return {"models": [], "error": str(e)}
 
+    etag = model_list_cache.etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if etag is not None:
+        response.headers["ETag"] = etag
+    return {"models": models}
+
+
+async def ensure_model_available(model_name: str) -> None:
+    """Rejects a request for a model that Ollama does not report.
+
+    Args:
+    ----
+        model_name: The model requested by the client.
+
+    Raises:
+    ------
+        HTTPException: A 404 if the cached model list does not contain it.
+
+    """
+    if VALIDATE_MODEL_NAMES and not await model_list_cache.is_known_model(model_name):
+        LOGGER.warning("Rejected request for unknown model=%s", model_name)
+        raise HTTPException(
+            status_code=404,
+            detail=f"Model '{model_name}' not found. Please pull the model using 'ollama pull {model_name}'.",
+        )
+
+
+async def admit_request(model_name: str, priority: int) -> None:
+    """Waits for an upstream generation slot for the model.
+
+    Args:
+    ----
+        model_name: The model the request will run on.
+        priority: Queue priority taken from the `X-Request-Priority` header.
+
+    Raises:
+    ------
+        HTTPException: A 429 with a `Retry-After` header if the model's wait
+                       queue is full.
+
+    """
+    try:
+        await admission_controller.acquire(model_name, priority=priority)
+    except AdmissionRejectedError as e:
+        LOGGER.warning("Rejected request for model=%s | reason=%s", model_name, e.reason)
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)},
+        ) from e
+
+
+def response_cache_key(cache_mode: str | None, *, deterministic: bool, **parts: object) -> str | None:
+    """Decides whether a request may use the response cache.
+
+    Args:
+    ----
+        cache_mode: The `X-Response-Cache` header: `force` caches even
+                    non-deterministic requests, `bypass` skips the cache.
+        deterministic: Whether the request's generation options make the
+                       response repeatable.
+        **parts: The route and the request fields that determine the
+                 response, which is every field of the payload except
+                 `_CACHE_KEY_IGNORED_FIELDS`; `stream`, for one, changes
+                 the shape of the body.
+
+    Returns:
+    -------
+        The cache key, or `None` if the request must not be cached.
+
+    """
+    if not RESPONSE_CACHE_ENABLED or cache_mode == "bypass":
+        return None
+    if not deterministic and cache_mode != "force":
+        return None
+    return make_cache_key(**parts)
+
+
+def stream_response(
+        stream: AsyncIterator[bytes],
+        accept: str | None,
+        headers: dict[str, str] | None = None,
+) -> StreamingResponse:
+    """Starts a resumable stream and returns the response that reads it.
+
+    Args:
+    ----
+        stream: The response stream produced by the route.
+        accept: The request's `Accept` header. `text/event-stream` frames
+                the events as Server-Sent Events; anything else gets NDJSON.
+        headers: Extra response headers.
+
+    Returns:
+    -------
+        A `StreamingResponse` carrying the stream's ID in `X-Stream-ID`.
+
+    """
+    resumable = stream_manager.start(stream)
+    sse = "text/event-stream" in (accept or "")
+    return StreamingResponse(
+        stream_manager.subscribe(resumable, sse=sse),
+        media_type="text/event-stream" if sse else "application/json",
+        headers={**(headers or {}), "X-Stream-ID": resumable.stream_id},
+    )
+
+
+@router.get("/api/streams/{stream_id}")
+async def resume_stream(
+        stream_id: str,
+        last_event_id: int = Header(default=0, alias="Last-Event-ID"),
+        accept: str | None = Header(default=None),
+) -> StreamingResponse:
+    """Resumes a chat stream after a dropped connection.
+
+    Event IDs count the lines of a stream from 1: with SSE they are sent in
+    each event's `id:` field, with NDJSON the n-th line is event n. The
+    generation keeps running while the client is away, so resuming never
+    asks Ollama to start over.
+
+    Args:
+    ----
+        stream_id: The `X-Stream-ID` of the original response.
+        last_event_id: The last event the client received.
+        accept: The request's `Accept` header, selecting SSE or NDJSON.
+
+    Returns:
+    -------
+        A `StreamingResponse` with the events after `last_event_id`, followed
+        by the rest of the live stream.
+
+    Raises:
+    ------
+        HTTPException: A 404 if the stream is unknown or has expired, or a
+                       410 if the requested events have left the buffer.
+
+    """
+    try:
+        resumable = stream_manager.get(stream_id)
+    except StreamNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Stream '{stream_id}' not found.") from e
+    if not resumable.can_resume_after(last_event_id):
+        raise HTTPException(
+            status_code=410,
+            detail=f"Events after {last_event_id} are no longer buffered for stream '{stream_id}'.",
+        )
+
+    LOGGER.info("Stream resumed | stream=%s | last_event_id=%s", stream_id, last_event_id)
+    sse = "text/event-stream" in (accept or "")
+    return StreamingResponse(
+        stream_manager.subscribe(resumable, last_event_id, sse=sse),
+        media_type="text/event-stream" if sse else "application/json",
+        headers={"X-Stream-ID": stream_id},
+    )
+
+
+@router.get("/api/admin/streams")
+async def stream_stats() -> dict:
+    """Reports how many resumable streams are buffered and running.
+
+    Returns
+    -------
+        The stream counts plus the buffer size and grace period.
+
+    """
+    return stream_manager.get_stats()
+
+
+@router.get("/api/admin/response-cache")
+async def response_cache_stats() -> dict:
+    """Reports the response cache's size and hit/miss counters.
+
+    Returns
+    -------
+        A dictionary with entry count, bytes used, byte budget, hits, misses
+        and evictions.
+
+    """
+    return response_cache.get_stats()
+
+
+@router.get("/api/admin/tool-cache")
+async def tool_cache_stats() -> dict:
+    """Reports the pure tool result cache's size and hit/miss counters.
+
+    Returns
+    -------
+        A dictionary with entry count and limit, bytes used, byte budgets,
+        hits, misses and evictions.
+
+    """
+    return tool_result_cache.get_stats()
+
+
+@router.get("/api/admin/admission")
+async def admission_stats() -> dict:
+    """Reports per-model concurrency, queue depth and wait times.
+
+    Returns
+    -------
+        The admission controller's limits and per-model counters.
+
+    """
+    return admission_controller.get_stats()
+
+
+@router.post("/api/admin/models/load")
+async def preload_model(request: ModelActionRequest) -> dict[str, str]:
+    """Loads a model into Ollama's memory ahead of the first request.
+
+    Args:
+    ----
+        request: A `ModelActionRequest` naming the model.
+
+    Returns:
+    -------
+        The model name and its new status.
+
+    Raises:
+    ------
+        HTTPException: A 502 if Ollama could not load the model.
+
+    """
+    try:
+        await load_model(request.model)
+    except Exception as e:
+        LOGGER.error("Failed to load model %s: %s", request.model, e)
+        raise HTTPException(status_code=502, detail=f"Failed to load model: {e}") from e
+    return {"model": request.model, "status": "loaded"}
+
+
+@router.post("/api/admin/models/unload")
+async def evict_model(request: ModelActionRequest) -> dict[str, str]:
+    """Unloads a model from Ollama's memory immediately.
+
+    Args:
+    ----
+        request: A `ModelActionRequest` naming the model.
+
+    Returns:
+    -------
+        The model name and its new status.
+
+    Raises:
+    ------
+        HTTPException: A 502 if Ollama could not unload the model.
+
+    """
+    try:
+        await unload_model(request.model)
+    except Exception as e:
+        LOGGER.error("Failed to unload model %s: %s", request.model, e)
+        raise HTTPException(status_code=502, detail=f"Failed to unload model: {e}") from e
+    return {"model": request.model, "status": "unloaded"}
+
+
+@router.get("/api/admin/pool")
+async def upstream_pool_stats() -> dict:
+    """Reports connection pool statistics for the shared upstream client.
+
+    Returns
+    -------
+        A dictionary with the configured pool limits and the current number
+        of open, in-use and idle connections to Ollama.
+
+    """
+    return get_pool_stats()
+
+
+@router.get("/api/admin/backends")
+async def upstream_backend_stats() -> dict:
+    """Reports the state of each Ollama backend in the pool.
+
+    Returns
+    -------
+        The number of failovers so far and, per backend, whether it is
+        healthy, its outstanding and total requests, its errors, the models
+        it has loaded, and the time of its last health check.
+
+    """
+    return backend_pool.get_stats()
+
+
+@router.get("/api/admin/profiles")
+async def list_profiles() -> dict:
+    """Lists the stored profiles of slow requests.
+
+    Returns
+    -------
+        The profiler's settings and counters, and a summary of each stored
+        profile (newest first): ID, route, status, duration and sample count.
+
+    """
+    return {**profiler.get_stats(), "profiles": profile_store.list()}
+
+
+@router.get("/api/admin/profiles/{profile_id}", response_model=None)
+async def get_profile(profile_id: str, output: Literal["folded", "json"] = "folded") -> PlainTextResponse | dict:
+    """Serves one profile of a slow request.
+
+    Args:
+    ----
+        profile_id: The ID from `/api/admin/profiles`.
+        output: `folded` for folded stacks, which flamegraph.pl, speedscope
+                and inferno read directly, or `json` for the raw profile.
+
+    Returns:
+    -------
+        The profile's stacks with their sample counts.
+
+    Raises:
+    ------
+        HTTPException: A 404 if the profile is unknown or has been rotated out.
+
+    """
+    try:
+        profile = profile_store.get(profile_id)
+    except ProfileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found.") from e
+    if output == "json":
+        return profile
+    return PlainTextResponse(to_folded(profile))
+
 
 @router.post("/api/chat")
-async def chat_endpoint(request: ChatRequest) -> StreamingResponse:
+async def chat_endpoint(
+        request: ChatRequest,
+        priority: int = Header(default=0, alias="X-Request-Priority"),
+        cache_mode: Literal["force", "bypass"] | None = Header(default=None, alias="X-Response-Cache"),
+        accept: str | None = Header(default=None),
+        timing: bool = Header(default=False, alias="X-Timing"),  # noqa: FBT001
+) -> StreamingResponse:
     """Handles standard chat requests by streaming directly from Ollama.
 
     This endpoint is a fallback for models that do not support tool calling
@@ -72,10 +443,18 @@ async def chat_endpoint(request: ChatRequest) -> StreamingResponse:
     Args:
     ----
         request: A `ChatRequest` object containing the model and messages.
+        priority: Queue priority while waiting for a generation slot; higher
+                  values are served first.
+        cache_mode: Optional response cache override (`force` or `bypass`).
+        accept: The `Accept` header; `text/event-stream` selects SSE framing.
+        timing: The `X-Timing` header; when true, a `timing` event with the
+                request's span tree is sent at the end of the stream, and
+                the response cache is skipped.
 
     Returns:
     -------
-        A `StreamingResponse` that streams the Ollama API's output.
+        A resumable `StreamingResponse` that streams the Ollama API's output,
+        replayed from the response cache when an identical request was cached.
 
     """
     LOGGER.info(
@@ -83,15 +462,38 @@ async def chat_endpoint(request: ChatRequest) -> StreamingResponse:
         request.model,
         len(request.messages),
     )
-    ollama_payload = request.model_dump()
-    return StreamingResponse(
-        ollama_stream_generator(ollama_payload),
-        media_type="application/json"
+    await ensure_model_available(request.model)
+    ollama_payload = request.model_dump(exclude_none=True)
+
+    cache_key = response_cache_key(
+        "bypass" if timing else cache_mode,
+        deterministic=is_deterministic(request.options),
+        route="chat",
+        payload={key: value for key, value in ollama_payload.items() if key not in _CACHE_KEY_IGNORED_FIELDS},
     )
+    if cache_key is not None and (cached := await response_cache.lookup(cache_key)) is not None:
+        return stream_response(replay(cached), accept, headers={"X-Cache": "HIT"})
+
+    await admit_request(request.model, priority)
+    try:
+        stream = ollama_stream_generator(ollama_payload, timing=timing)
+        if cache_key is not None:
+            stream = response_cache.record(cache_key, stream)
+        stream = admission_controller.guard(request.model, stream)
+    except BaseException:
+        admission_controller.release(request.model)
+        raise
+    return stream_response(stream, accept)
 
 
 @router.post("/api/agent/chat")
-async def agent_chat_endpoint(request: AgentChatRequest) -> StreamingResponse:
+async def agent_chat_endpoint(
+        request: AgentChatRequest,
+        priority: int = Header(default=0, alias="X-Request-Priority"),
+        cache_mode: Literal["force", "bypass"] | None = Header(default=None, alias="X-Response-Cache"),
+        accept: str | None = Header(default=None),
+        timing: bool = Header(default=False, alias="X-Timing"),  # noqa: FBT001
+) -> StreamingResponse:
     """Handles chat requests using the agent, with support for tool calling.
 
     This endpoint activates the agent to process user messages. It supports
@@ -102,10 +504,20 @@ async def agent_chat_endpoint(request: AgentChatRequest) -> StreamingResponse:
     ----
         request: An `AgentChatRequest` object with model, messages, and
                  tool choice.
+        priority: Queue priority while waiting for a generation slot; higher
+                  values are served first.
+        cache_mode: Optional response cache override. The agent samples
+                    with a non-zero temperature, so its responses are only
+                    cached with `force`.
+        accept: The `Accept` header; `text/event-stream` selects SSE framing.
+        timing: The `X-Timing` header; when true, a `timing` event with the
+                request's span tree is sent at the end of the stream, and
+                the response cache is skipped.
 
     Returns:
     -------
-        A `StreamingResponse` that streams the agent's execution events.
+        A resumable `StreamingResponse` that streams the agent's execution
+        events.
 
     """
     LOGGER.info(
@@ -114,11 +526,169 @@ async def agent_chat_endpoint(request: AgentChatRequest) -> StreamingResponse:
         request.tool_choice,
         len(request.messages),
     )
-    return StreamingResponse(
-        agent_stream_generator(
+    await ensure_model_available(request.model)
+
+    cache_key = response_cache_key(
+        "bypass" if timing else cache_mode,
+        deterministic=False,
+        route="agent",
+        payload=request.model_dump(exclude_none=True),
+    )
+    if cache_key is not None and (cached := await response_cache.lookup(cache_key)) is not None:
+        return stream_response(replay(cached), accept, headers={"X-Cache": "HIT"})
+
+    await admit_request(request.model, priority)
+    try:
+        stream = agent_stream_generator(
             messages=request.messages,
             model_name=request.model,
             tool_choice=request.tool_choice,
-        ),
-        media_type="application/json"
+            timing=timing,
+        )
+        if cache_key is not None:
+            stream = response_cache.record(cache_key, stream)
+        stream = admission_controller.guard(request.model, stream)
+    except BaseException:
+        admission_controller.release(request.model)
+        raise
+    return stream_response(stream, accept)
+
+
+@router.post("/api/sessions")
+async def create_session(request: SessionCreateRequest) -> dict[str, str]:
+    """Creates a server-side chat session.
+
+    Args:
+    ----
+        request: A `SessionCreateRequest` naming the model for the session.
+
+    Returns:
+    -------
+        The new session's ID and model.
+
+    """
+    await ensure_model_available(request.model)
+    session = await session_store.create(request.model)
+    LOGGER.info("Session created | session=%s | model=%s", session.session_id, session.model)
+    return {"session_id": session.session_id, "model": session.model}
+
+
+@router.get("/api/sessions/{session_id}")
+async def get_session(session_id: str) -> dict:
+    """Returns a session's model and conversation history.
+
+    Args:
+    ----
+        session_id: The ID returned by `POST /api/sessions`.
+
+    Returns:
+    -------
+        The session ID, model and messages.
+
+    Raises:
+    ------
+        HTTPException: A 404 if the session does not exist.
+
+    """
+    try:
+        session = await session_store.get(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.") from e
+    return {"session_id": session.session_id, "model": session.model, "messages": session.messages}
+
+
+@router.delete("/api/sessions/{session_id}")
+async def delete_session(session_id: str) -> dict[str, str]:
+    """Deletes a session and its history.
+
+    Args:
+    ----
+        session_id: The ID returned by `POST /api/sessions`.
+
+    Returns:
+    -------
+        The deleted session's ID.
+
+    Raises:
+    ------
+        HTTPException: A 404 if the session does not exist.
+
+    """
+    try:
+        await session_store.delete(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.") from e
+    return {"session_id": session_id, "status": "deleted"}
+
+
+@router.post("/api/sessions/{session_id}/messages")
+async def session_message_endpoint(
+        session_id: str,
+        request: SessionMessageRequest,
+        priority: int = Header(default=0, alias="X-Request-Priority"),
+        accept: str | None = Header(default=None),
+        timing: bool = Header(default=False, alias="X-Timing"),  # noqa: FBT001
+) -> StreamingResponse:
+    """Streams the agent's reply to a new user message in a session.
+
+    Only the new message travels over the network; the history is read from
+    the session store. The message and the final reply are stored together
+    once the reply has been streamed, so a turn that is rejected or fails
+    leaves the history unchanged. The event stream is the same as for
+    `/api/agent/chat`.
+
+    Args:
+    ----
+        session_id: The ID returned by `POST /api/sessions`.
+        request: A `SessionMessageRequest` with the message and tool choice.
+        priority: Queue priority while waiting for a generation slot; higher
+                  values are served first.
+        accept: The `Accept` header; `text/event-stream` selects SSE framing.
+        timing: The `X-Timing` header; when true, a `timing` event with the
+                request's span tree is sent at the end of the stream.
+
+    Returns:
+    -------
+        A resumable `StreamingResponse` that streams the agent's execution
+        events.
+
+    Raises:
+    ------
+        HTTPException: A 404 if the session does not exist, or a 429 if the
+                       model's wait queue is full.
+
+    """
+    try:
+        session = await session_store.get(session_id)
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found.") from e
+
+    LOGGER.info(
+        "/api/sessions message received | session=%s | model=%s | messages=%s",
+        session_id,
+        session.model,
+        len(session.messages) + 1,
     )
+    await admit_request(session.model, priority)
+
+    async def store_reply(content: str) -> None:
+        # The user's message is only stored together with the reply, so a
+        # rejected or failed turn leaves the history as it was and a retry
+        # does not add the message twice.
+        await session_store.append(session_id, "user", request.content)
+        await session_store.append(session_id, "assistant", content)
+
+    try:
+        stream = agent_stream_generator(
+            messages=[*session.messages, {"role": "user", "content": request.content}],
+            model_name=session.model,
+            tool_choice=request.tool_choice,
+            on_final_message=store_reply,
+            route="session",
+            timing=timing,
+        )
+        stream = admission_controller.guard(session.model, stream)
+    except BaseException:
+        admission_controller.release(session.model)
+        raise
+    return stream_response(stream, accept)
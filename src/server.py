@@ -2,22 +2,78 @@
 @description This is the main entry point for the backend server.
 It is responsible for:
 - Initializing the FastAPI application.
-- Configuring CORS middleware.
+- Managing the shared upstream HTTP client, Ollama backend health checks
+  and model warm-up through the app lifespan, and draining running streams
+  on shutdown.
+- Configuring CORS and request-ID middleware and, when enabled, the
+  slow-request profiler.
 - Including the API routes defined in `src/routes.py`.
 - Running the Uvicorn server for development.
 """
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.logger import initialize_logger
+from src.backends import backend_pool
+from src.config import PREWARM_AGENT_STACK, PROFILING_ENABLED, SHUTDOWN_DRAIN_TIMEOUT, WARMUP_ON_STARTUP
+from src.http_client import close_http_client, get_http_client
+from src.logger import LOGGER, RequestIdMiddleware, initialize_logger, shutdown_logger
+from src.profiler import ProfilingMiddleware, profiler
+from src.resumable import stream_manager
 from src.routes import router
+from src.streaming import import_agent_stack
+from src.warmup import warm_up_models
 
 # --- Init Logger ---
 initialize_logger()
 
+
+async def _prewarm_agent_stack() -> None:
+    # The import runs in a thread; an agent request arriving meanwhile waits
+    # for it on Python's import lock instead of importing a second time.
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(import_agent_stack)
+    except Exception as e:
+        LOGGER.warning("Agent stack prewarm failed: %s", e)
+    else:
+        LOGGER.info("Agent stack imported | %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Creates shared resources on startup and releases them on shutdown.
+
+    Model warm-up and the import of the agent stack run in the background
+    so the server accepts traffic while they are in progress. On shutdown,
+    uvicorn has already waited for open connections; streams still
+    generating for a client that will resume them get up to
+    `SHUTDOWN_DRAIN_TIMEOUT` seconds to finish.
+    """
+    get_http_client()
+    backend_pool.start()
+    prewarm_task = asyncio.create_task(_prewarm_agent_stack()) if PREWARM_AGENT_STACK else None
+    warmup_task = asyncio.create_task(warm_up_models()) if WARMUP_ON_STARTUP else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if prewarm_task is not None:
+        # A thread cannot be cancelled; let a running import finish.
+        await prewarm_task
+    await stream_manager.drain(SHUTDOWN_DRAIN_TIMEOUT)
+    profiler.stop()
+    await backend_pool.stop()
+    await close_http_client()
+    shutdown_logger()
+
+
 # --- FastAPI Setup ---
-app = FastAPI(title="Ollama Chatbot Backend with Agents", version="2.0.0")
+app = FastAPI(title="Ollama Chatbot Backend with Agents", version="2.0.0", lifespan=lifespan)
 
 # Setup CORS
 app.add_middleware(
@@ -28,6 +84,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Sample the stacks of slow requests
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Tag log records with the request they belong to
+app.add_middleware(RequestIdMiddleware)
+
 # Include API routes
 app.include_router(router)
 
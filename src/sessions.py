@@ -0,0 +1,161 @@
+"""@file sessions.py
+@description This module keeps conversation history on the server so that
+clients only send the newest message on each turn. Two backends are
+provided: an in-memory LRU store (the default) and an optional SQLite store
+that survives restarts. Both expose the same async interface.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from src.config import SESSION_BACKEND, SESSION_MAX_SESSIONS, SESSION_SQLITE_PATH
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a session ID is unknown (or has been evicted)."""
+
+
+@dataclass
+class Session:
+    session_id: str
+    model: str
+    created_at: float = field(default_factory=time.time)
+    messages: list[dict] = field(default_factory=list)
+
+
+class MemorySessionStore:
+    """Keeps sessions in memory, evicting the least recently used ones."""
+
+    def __init__(self: "MemorySessionStore", max_sessions: int = SESSION_MAX_SESSIONS) -> None:
+        self._max_sessions = max(1, max_sessions)
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+
+    def _touch(self: "MemorySessionStore", session_id: str) -> Session:
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        self._sessions.move_to_end(session_id)
+        return session
+
+    async def create(self: "MemorySessionStore", model: str) -> Session:
+        """Creates an empty session for a model."""
+        session = Session(session_id=uuid.uuid4().hex, model=model)
+        self._sessions[session.session_id] = session
+        while len(self._sessions) > self._max_sessions:
+            self._sessions.popitem(last=False)
+        return session
+
+    async def get(self: "MemorySessionStore", session_id: str) -> Session:
+        """Returns a session with its full history."""
+        return self._touch(session_id)
+
+    async def append(self: "MemorySessionStore", session_id: str, role: str, content: str) -> None:
+        """Appends a message to a session's history."""
+        self._touch(session_id).messages.append({"role": role, "content": content})
+
+    async def delete(self: "MemorySessionStore", session_id: str) -> None:
+        """Deletes a session."""
+        if self._sessions.pop(session_id, None) is None:
+            raise SessionNotFoundError(session_id)
+
+
+class SQLiteSessionStore:
+    """Persists sessions in a SQLite database.
+
+    Queries run in a worker thread so they never block the event loop.
+    """
+
+    def __init__(self: "SQLiteSessionStore", path: str | Path = SESSION_SQLITE_PATH) -> None:
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, model TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS session_messages ("
+                "session_id TEXT NOT NULL REFERENCES sessions(id) ON DELETE CASCADE, "
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT NOT NULL, content TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_session_messages ON session_messages(session_id, seq)"
+            )
+
+    def _create(self: "SQLiteSessionStore", model: str) -> Session:
+        session = Session(session_id=uuid.uuid4().hex, model=model)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO sessions (id, model, created_at) VALUES (?, ?, ?)",
+                (session.session_id, session.model, session.created_at),
+            )
+        return session
+
+    def _get(self: "SQLiteSessionStore", session_id: str) -> Session:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT model, created_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                raise SessionNotFoundError(session_id)
+            messages = self._connection.execute(
+                "SELECT role, content FROM session_messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return Session(
+            session_id=session_id,
+            model=row[0],
+            created_at=row[1],
+            messages=[{"role": role, "content": content} for role, content in messages],
+        )
+
+    def _append(self: "SQLiteSessionStore", session_id: str, role: str, content: str) -> None:
+        with self._lock, self._connection:
+            if self._connection.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is None:
+                raise SessionNotFoundError(session_id)
+            self._connection.execute(
+                "INSERT INTO session_messages (session_id, role, content) VALUES (?, ?, ?)",
+                (session_id, role, content),
+            )
+
+    def _delete(self: "SQLiteSessionStore", session_id: str) -> None:
+        with self._lock, self._connection:
+            deleted = self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount
+            self._connection.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+        if not deleted:
+            raise SessionNotFoundError(session_id)
+
+    async def create(self: "SQLiteSessionStore", model: str) -> Session:
+        """Creates an empty session for a model."""
+        return await asyncio.to_thread(self._create, model)
+
+    async def get(self: "SQLiteSessionStore", session_id: str) -> Session:
+        """Returns a session with its full history."""
+        return await asyncio.to_thread(self._get, session_id)
+
+    async def append(self: "SQLiteSessionStore", session_id: str, role: str, content: str) -> None:
+        """Appends a message to a session's history."""
+        await asyncio.to_thread(self._append, session_id, role, content)
+
+    async def delete(self: "SQLiteSessionStore", session_id: str) -> None:
+        """Deletes a session."""
+        await asyncio.to_thread(self._delete, session_id)
+
+    def close(self: "SQLiteSessionStore") -> None:
+        """Closes the database connection."""
+        self._connection.close()
+
+
+def create_session_store() -> MemorySessionStore | SQLiteSessionStore:
+    """Builds the session store selected by `SESSION_BACKEND`."""
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionStore(SESSION_SQLITE_PATH)
+    return MemorySessionStore(SESSION_MAX_SESSIONS)
+
+
+session_store = create_session_store()
@@ -0,0 +1,74 @@
+"""@file shared_cache.py
+@description This module holds the cache state that worker processes share
+when the server runs with several workers. It lives in a single SQLite
+database in WAL mode (`SHARED_CACHE_PATH`), so readers in one worker never
+wait for a writer in another and a value fetched by one worker is reused by
+the rest. With no path configured, every cache stays in process memory.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.config import SHARED_CACHE_PATH
+
+
+def connect(path: str | Path) -> sqlite3.Connection:
+    """Opens a connection to a database shared between processes.
+
+    WAL mode lets readers run alongside a writer, `synchronous=NORMAL` skips
+    the per-commit fsync (a cache can afford to lose its last writes), and
+    the busy timeout makes a writer wait briefly for another worker's write
+    instead of failing.
+
+    Args:
+    ----
+        path: The database file.
+
+    Returns:
+    -------
+        A connection usable from any thread; callers serialize access.
+
+    """
+    connection = sqlite3.connect(str(path), check_same_thread=False, timeout=5.0)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SharedValueStore:
+    """Named values shared by every worker, with the time they were written."""
+
+    def __init__(self: "SharedValueStore", path: str | Path = SHARED_CACHE_PATH) -> None:
+        self._connection = connect(path)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS shared_values ("
+                "name TEXT PRIMARY KEY, value BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def get(self: "SharedValueStore", name: str) -> tuple[bytes, float] | None:
+        """Returns a value and its wall-clock write time, or `None` if unset."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, updated_at FROM shared_values WHERE name = ?", (name,)
+            ).fetchone()
+        return None if row is None else (bytes(row[0]), row[1])
+
+    def set(self: "SharedValueStore", name: str, value: bytes) -> None:
+        """Stores a value, replacing the previous one."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO shared_values (name, value, updated_at) VALUES (?, ?, ?)",
+                (name, value, time.time()),
+            )
+
+    def delete(self: "SharedValueStore", name: str) -> None:
+        """Removes a value."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM shared_values WHERE name = ?", (name,))
+
+    def close(self: "SharedValueStore") -> None:
+        """Closes the database connection."""
+        self._connection.close()
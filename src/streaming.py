@@ -3,67 +3,199 @@
 It contains two main generator functions: one for streaming responses directly
 from the Ollama API (for simple chat) and another for streaming the complex,
 multi-step output of the LangGraph agent.
+
+The agent stack (LangChain, LangGraph and the Jinja prompt templates) makes
+up most of the backend's import time and `/api/chat` never uses it, so it is
+imported on the first agent request, or in the background after startup by
+`import_agent_stack`, rather than when this module is loaded.
 """
-import json
-from collections.abc import AsyncGenerator
+import importlib
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from typing import TYPE_CHECKING
 
 import httpx
-from langchain_core.messages import HumanMessage
+import orjson
 
-from src.agent.graph import create_agent_graph, create_simple_llm
+from src.backends import MODEL_EXTENSION
 from src.config import ENABLE_AGENT_MODE, OLLAMA_API_BASE
+from src.http_client import get_http_client
 from src.logger import LOGGER
+from src.metrics import (
+    AGENT_ITERATIONS,
+    REQUEST_LATENCY,
+    STREAMS_IN_FLIGHT,
+    TIME_TO_FIRST_TOKEN,
+    observe_generation_speed,
+)
+from src.timing import Span, Timeline, record_span, span
+from src.warmup import get_keep_alive
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_ollama import ChatOllama
+    from langgraph.graph import StateGraph
+
+# The ID of the agent message being streamed before its first token, since a
+# chunk's own ID may be None.
+_NO_MESSAGE = object()
+
+
+def import_agent_stack() -> None:
+    """Imports the agent modules and their dependencies, if not done already."""
+    importlib.import_module("src.agent.context")
+
+
+def get_agent_graph(model_name: str, **llm_options: object) -> "StateGraph":
+    """Returns the model's compiled agent graph from the registry."""
+    from src.agent.registry import get_agent_graph as get_graph
+
+    return get_graph(model_name, **llm_options)
+
+
+def get_simple_llm(model_name: str, **llm_options: object) -> "ChatOllama":
+    """Returns the model's `ChatOllama` client from the registry."""
+    from src.agent.registry import get_simple_llm as get_llm
+
+    return get_llm(model_name, **llm_options)
 
 
-async def ollama_stream_generator(request_data: dict) -> AsyncGenerator[str, None]:
+def build_history(messages: list[dict], model_name: str) -> list["BaseMessage"]:
+    """Converts chat messages to LangChain messages within the model's context budget."""
+    from src.agent.context import context_manager
+
+    return context_manager.build(messages, model_name)
+
+
+def refresh_history_summary(messages: list[dict], model_name: str, reply: str) -> None:
+    """Summarizes, in the background, the turns the next request will not fit."""
+    from src.agent.context import context_manager
+
+    context_manager.schedule_refresh([*messages, {"role": "assistant", "content": reply}], model_name)
+
+
+def encode_event(payload: dict) -> bytes:
+    """Serializes a stream event as one NDJSON line.
+
+    Args:
+    ----
+        payload: The event to send to the client.
+
+    Returns:
+    -------
+        The compact JSON encoding of `payload` followed by a newline.
+
+    """
+    return orjson.dumps(payload, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _final_line(tail: bytes) -> dict:
+    # Ollama's last NDJSON line carries the generation statistics; only the
+    # tail of the body is parsed, never the token lines.
+    try:
+        last = orjson.loads(tail.rstrip().rsplit(b"\n", 1)[-1])
+    except orjson.JSONDecodeError:
+        return {}
+    return last if isinstance(last, dict) else {}
+
+
+def _line_break(forwarded: bytes) -> bytes:
+    # A newline if the bytes forwarded so far end inside an NDJSON line.
+    return b"\n" if forwarded and not forwarded.endswith(b"\n") else b""
+
+
+def _timed_encoder(root: Span) -> Callable[[dict], bytes]:
+    # Adds the time spent serializing events to the root span of a timeline.
+    def encode(payload: dict) -> bytes:
+        started = time.perf_counter()
+        line = encode_event(payload)
+        root.add_time("serialize_ms", time.perf_counter() - started)
+        return line
+
+    return encode
+
+
+async def ollama_stream_generator(request_data: dict, *, timing: bool = False) -> AsyncGenerator[bytes, None]:
     """Streams responses directly from the Ollama API.
 
     This generator function is used for backward compatibility, connecting to
-    Ollama's standard chat endpoint and streaming the response line by line.
+    Ollama's standard chat endpoint and passing its NDJSON body through as
+    raw bytes, without decoding or re-encoding each line. The request is sent
+    through the shared, pooled upstream client, with the model's `keep_alive`
+    policy unless the payload already sets one.
 
     Args:
     ----
         request_data: The payload to be sent to the Ollama API, including
                       the model name and messages.
+        timing: Whether to append a `timing` event with the request's span
+                tree (upstream connect, then streaming with Ollama's prefill
+                and generate split) after Ollama's final line.
 
     Yields:
     ------
-        A string for each line of the response from the Ollama API.
+        Each chunk of the response body exactly as received from the Ollama
+        API, then a JSON error line if the request fails, starting on a new
+        line even if the upstream failed mid-line.
 
     """
-    LOGGER.info("Streaming request -> model=%s", request_data.get("model"))
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+    model_name = request_data.get("model", "")
+    LOGGER.info("Streaming request -> model=%s", model_name)
+    request_data.setdefault("keep_alive", get_keep_alive(model_name))
+    started = time.perf_counter()
+    timeline = Timeline("chat", model=model_name) if timing else None
+    if timeline is not None:
+        timeline.activate()
+    # The final line may span the last two chunks
+    previous = last = b""
+    with STREAMS_IN_FLIGHT.labels("chat").track_inprogress():
+        try:
+            client = get_http_client()
             async with client.stream(
                     "POST",
                     OLLAMA_API_BASE,
-                    json=request_data
+                    json=request_data,
+                    extensions={MODEL_EXTENSION: model_name},
             ) as response:
                 response.raise_for_status()
+                connected = time.perf_counter()
+                record_span("upstream_connect", started, connected)
 
-                async for chunk in response.aiter_lines():
-                    if chunk:
-                        try:
-                            yield f"{chunk}\n"
-                        except json.JSONDecodeError:
-                            LOGGER.warning(f"Failed to decode JSON chunk: {chunk}")
-                            continue
-    except httpx.ConnectError:
-        error_msg = f"Error: Could not connect to Ollama at {OLLAMA_API_BASE}"
-        yield json.dumps({"error": error_msg}) + "\n"
-    except httpx.HTTPStatusError as e:
-        error_msg = f"Error: HTTP {e.response.status_code}"
-        yield json.dumps({"error": error_msg}) + "\n"
-    except Exception as e:
-        error_msg = f"An unexpected error occurred: {e}"
-        yield json.dumps({"error": error_msg}) + "\n"
+                first_chunk = True
+                async for chunk in response.aiter_bytes():
+                    if first_chunk:
+                        TIME_TO_FIRST_TOKEN.labels("chat", model_name).observe(time.perf_counter() - started)
+                        first_chunk = False
+                    previous, last = last, chunk
+                    yield chunk
+
+            final_stats = _final_line(previous + last)
+            observe_generation_speed("chat", model_name, final_stats)
+            REQUEST_LATENCY.labels("chat", model_name).observe(time.perf_counter() - started)
+            if timeline is not None:
+                record_span("stream", connected).set_llm_stats(final_stats)
+                yield _line_break(last) + encode_event({"type": "timing", "spans": timeline.finish()})
+        except httpx.ConnectError:
+            error_msg = f"Error: Could not connect to Ollama at {OLLAMA_API_BASE}"
+        except httpx.HTTPStatusError as e:
+            error_msg = f"Error: HTTP {e.response.status_code}"
+        except Exception as e:
+            error_msg = f"An unexpected error occurred: {e}"
+        else:
+            return
+        # The upstream may fail mid-line; the error goes on a line of its own.
+        yield _line_break(last) + encode_event({"error": error_msg})
 
 
-async def agent_stream_generator(  # noqa: C901, PLR0912
+async def agent_stream_generator(  # noqa: C901, PLR0912, PLR0913, PLR0915
         messages: list[dict],
         model_name: str,
         tool_choice: str,
-) -> AsyncGenerator[str, None]:
+        *,
+        on_final_message: Callable[[str], Awaitable[None]] | None = None,
+        route: str = "agent",
+        timing: bool = False,
+) -> AsyncGenerator[bytes, None]:
     """Streams responses from the agent, including tool calls and reasoning steps.
 
     This function orchestrates the agent's workflow, streaming each step of
@@ -75,29 +207,50 @@ async def agent_stream_generator(  # noqa: C901, PLR0912
         messages: A list of messages in the current chat session.
         model_name: The name of the language model to use.
         tool_choice: The user's preference for using tools ('auto', 'none', etc.).
+        on_final_message: An optional coroutine called with the content of the
+                          final message once it has been streamed (e.g., to
+                          store it in a server-side session).
+        route: The route label used for metrics.
+        timing: Whether to send a `timing` event with the request's span
+                tree (context building, each graph node, LLM call and tool
+                call, and time spent serializing events) before `done`.
 
     Yields:
     ------
-        A JSON string for each event in the agent's execution, such as
-        status updates, tool calls, tool results, and the final message.
+        An NDJSON line for each event in the agent's execution, such as
+        status updates, tool calls, tool results, incremental
+        `message_delta` tokens, and the final message. The deltas of each
+        LLM call follow a `message_start` event; when the agent calls the
+        LLM again after a tool call, the text streamed so far belonged to an
+        intermediate turn and the final message holds only the last one.
 
     """
+    started = time.perf_counter()
+    first_token_at: float | None = None
+    in_flight = STREAMS_IN_FLIGHT.labels(route)
+    in_flight.inc()
+    timeline = Timeline(route, model=model_name) if timing else None
+    if timeline is not None:
+        timeline.activate()
+    encode = encode_event if timeline is None else _timed_encoder(timeline.root)
     try:
-        # Convert messages to LangChain format
-        lc_messages = [HumanMessage(content=msg["content"]) for msg in messages if msg["role"] == "user"]
+        # Convert messages to LangChain format, keeping the history within
+        # the model's token budget
+        with span("context", messages=len(messages)):
+            lc_messages = build_history(messages, model_name)
 
         # Decide whether to use agent or simple mode
         use_agent = tool_choice != "none" and ENABLE_AGENT_MODE
 
         if use_agent:
             # Stream with agent and tools
-            yield json.dumps({
+            yield encode({
                 "type": "status",
                 "content": "Agent mode activated"
-            }) + "\n"
+            })
 
-            # Create agent graph
-            agent = create_agent_graph(model_name)
+            # Reuse the compiled agent graph for this model
+            agent = get_agent_graph(model_name, keep_alive=get_keep_alive(model_name))
 
             # Initial state
             initial_state = {
@@ -107,70 +260,127 @@ async def agent_stream_generator(  # noqa: C901, PLR0912
                 "iteration_count": 0,
             }
 
-            # Stream agent execution
-            async for event in agent.astream(initial_state):
-                for node_name, node_output in event.items():
+            # Stream agent execution. "messages" mode forwards LLM tokens as
+            # they are generated; "updates" mode reports each finished node.
+            # The final answer is taken from the last message produced by the
+            # "agent" node, so the graph runs once.
+            final_response = None
+            iterations = 0
+            # The agent node calls the LLM once per turn, and every chunk of a
+            # call shares the call's message ID. A new ID starts a new message,
+            # so the text of a turn that ended in tool calls is not joined to
+            # the final answer.
+            message_id: object = _NO_MESSAGE
+            async for stream_mode, payload in agent.astream(initial_state, stream_mode=["messages", "updates"]):
+                if stream_mode == "messages":
+                    chunk, metadata = payload
+                    content = getattr(chunk, "content", "")
+                    if metadata.get("langgraph_node") == "agent" and content and isinstance(content, str):
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        if (chunk_id := getattr(chunk, "id", None)) != message_id:
+                            message_id = chunk_id
+                            yield encode({"type": "message_start"})
+                        yield encode({
+                            "type": "message_delta",
+                            "content": content,
+                        })
+                    continue
+
+                for node_name, node_output in payload.items():
 
                     # Stream tool calls
                     if node_name == "agent":
+                        iterations += 1
                         messages_output = node_output.get("messages", [])
                         if messages_output:
                             last_msg = messages_output[-1]
+                            final_response = last_msg
+                            observe_generation_speed(route, model_name, getattr(last_msg, "response_metadata", {}))
 
                             # Check for tool calls
                             if hasattr(last_msg, "tool_calls") and last_msg.tool_calls:
                                 for tool_call in last_msg.tool_calls:
-                                    yield json.dumps({
+                                    yield encode({
                                         "type": "tool_call",
                                         "tool": tool_call["name"],
                                         "args": tool_call["args"],
-                                    }) + "\n"
+                                    })
 
-                    # Stream tool results
+                    # Stream tool results (one per tool call of this turn)
                     elif node_name == "tools":
                         tool_results = node_output.get("tool_results", [])
-                        if tool_results:
-                            latest_result = tool_results[-1]
-                            yield json.dumps({
+                        turn_size = len(node_output.get("messages", [])) or 1
+                        for latest_result in tool_results[-turn_size:]:
+                            yield encode({
                                 "type": "tool_result",
                                 "tool": latest_result["tool"],
                                 "result": latest_result["result"][:500],  # Truncate long results
-                            }) + "\n"
+                            })
 
-            # Get final state
-            final_state = agent.invoke(initial_state)
-            final_messages = final_state.get("messages", [])
+            AGENT_ITERATIONS.labels(model_name).observe(iterations)
 
-            if final_messages:
-                final_response = final_messages[-1]
-                if hasattr(final_response, "content"):
-                    # Stream final response
-                    yield json.dumps({
-                        "type": "message",
-                        "content": final_response.content,
-                    }) + "\n"
+            if final_response is not None and hasattr(final_response, "content"):
+                # Stream final response
+                yield encode({
+                    "type": "message",
+                    "content": final_response.content,
+                })
+                if on_final_message is not None:
+                    await on_final_message(final_response.content)
+                refresh_history_summary(messages, model_name, str(final_response.content))
 
         else:
             # Simple mode without tools
-            yield json.dumps({
+            yield encode({
                 "type": "status",
                 "content": "Simple chat mode"
-            }) + "\n"
+            })
+
+            llm = get_simple_llm(model_name, keep_alive=get_keep_alive(model_name))
+            content_parts = []
+            last_chunk = None
+            llm_started = time.perf_counter()
+            async for chunk in llm.astream(lc_messages):
+                last_chunk = chunk
+                if chunk.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                        yield encode({"type": "message_start"})
+                    content_parts.append(chunk.content)
+                    yield encode({
+                        "type": "message_delta",
+                        "content": chunk.content,
+                    })
 
-            llm = create_simple_llm(model_name)
-            response = llm.invoke(lc_messages)
+            final_stats = getattr(last_chunk, "response_metadata", {})
+            observe_generation_speed(route, model_name, final_stats)
+            record_span("llm", llm_started).set_llm_stats(final_stats)
 
-            yield json.dumps({
+            final_content = "".join(content_parts)
+            yield encode({
                 "type": "message",
-                "content": response.content,
-            }) + "\n"
+                "content": final_content,
+            })
+            if on_final_message is not None:
+                await on_final_message(final_content)
+            refresh_history_summary(messages, model_name, final_content)
+
+        finished = time.perf_counter()
+        TIME_TO_FIRST_TOKEN.labels(route, model_name).observe((first_token_at or finished) - started)
+        REQUEST_LATENCY.labels(route, model_name).observe(finished - started)
+
+        if timeline is not None:
+            yield encode_event({"type": "timing", "spans": timeline.finish()})
 
         # Done
-        yield json.dumps({"type": "done", "complete": True}) + "\n"
+        yield encode({"type": "done", "complete": True})
 
     except Exception as e:
-        LOGGER.error(f"Agent error: {e}")
-        yield json.dumps({
+        LOGGER.error("Agent error: %s", e)
+        yield encode_event({
             "type": "error",
             "content": f"Agent error: {e!s}"
-        }) + "\n"
+        })
+    finally:
+        in_flight.dec()
@@ -0,0 +1,167 @@
+"""@file timing.py
+@description This module records an opt-in timing timeline for a single
+request. While a `Timeline` is active, `span()` blocks anywhere in the
+request's call tree (graph nodes, LLM calls, tool calls, the upstream
+connection) add nested spans to it, following the request across the tasks
+it spawns. When no timeline is active, `span()` costs one context variable
+lookup, so the instrumentation can stay in place for every request.
+"""
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+# Ollama reports its durations in nanoseconds.
+_NS_PER_MS = 1_000_000
+
+
+@dataclass
+class Span:
+    name: str
+    start: float
+    end: float | None = None
+    attrs: dict = field(default_factory=dict)
+    children: list["Span"] = field(default_factory=list)
+
+    def set(self: "Span", **attrs: object) -> None:
+        """Attaches attributes to the span."""
+        self.attrs.update(attrs)
+
+    def add_time(self: "Span", key: str, seconds: float) -> None:
+        """Accumulates a duration, in milliseconds, under an attribute."""
+        self.attrs[key] = self.attrs.get(key, 0.0) + seconds * 1000
+
+    def set_llm_stats(self: "Span", stats: Mapping) -> None:
+        """Records Ollama's load, prefill and generation split for an LLM call.
+
+        Args:
+        ----
+            stats: Ollama's final-chunk statistics, such as a LangChain
+                   message's `response_metadata`.
+
+        """
+        for key, name in (
+                ("load_duration", "load_ms"),
+                ("prompt_eval_duration", "prefill_ms"),
+                ("eval_duration", "generate_ms"),
+        ):
+            if stats.get(key):
+                self.attrs[name] = round(stats[key] / _NS_PER_MS, 2)
+        for key in ("prompt_eval_count", "eval_count"):
+            if stats.get(key) is not None:
+                self.attrs[key] = stats[key]
+
+    def to_dict(self: "Span", origin: float) -> dict:
+        """Serializes the span tree with times in ms relative to `origin`."""
+        end = self.end if self.end is not None else time.perf_counter()
+        node = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round((end - self.start) * 1000, 2),
+        }
+        if self.attrs:
+            node["attrs"] = {
+                key: round(value, 2) if isinstance(value, float) else value for key, value in self.attrs.items()
+            }
+        if self.children:
+            node["children"] = [child.to_dict(origin) for child in self.children]
+        return node
+
+
+class _NullSpan:
+    # Stands in for a span when no timeline is active.
+
+    def set(self: "_NullSpan", **attrs: object) -> None:
+        pass
+
+    def add_time(self: "_NullSpan", key: str, seconds: float) -> None:
+        pass
+
+    def set_llm_stats(self: "_NullSpan", stats: Mapping) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs: object) -> Iterator[Span | _NullSpan]:
+    """Times a block as a child of the current span, if a timeline is active.
+
+    Args:
+    ----
+        name: The span name, e.g. `node:agent` or `tool:calculator`.
+        **attrs: Attributes to attach to the span.
+
+    Yields:
+    ------
+        The new span, or a no-op stand-in when timing is off.
+
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield _NULL_SPAN
+        return
+
+    child = Span(name=name, start=time.perf_counter(), attrs=attrs)
+    parent.children.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def record_span(name: str, start: float, end: float | None = None, **attrs: object) -> Span | _NullSpan:
+    """Adds an already-timed block as a child of the current span.
+
+    Useful where a block cannot be wrapped in `span()`, such as the part of
+    an `async with` spent entering the context.
+
+    Args:
+    ----
+        name: The span name.
+        start: The `time.perf_counter()` value at which the block started.
+        end: When it ended; defaults to now.
+        **attrs: Attributes to attach to the span.
+
+    Returns:
+    -------
+        The new span, or a no-op stand-in when timing is off.
+
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NULL_SPAN
+    child = Span(name=name, start=start, end=end if end is not None else time.perf_counter(), attrs=attrs)
+    parent.children.append(child)
+    return child
+
+
+class Timeline:
+    """The span tree of one request."""
+
+    def __init__(self: "Timeline", name: str, **attrs: object) -> None:
+        self.root = Span(name=name, start=time.perf_counter(), attrs=attrs)
+        self._token = None
+
+    def activate(self: "Timeline") -> None:
+        """Makes this timeline the parent of spans opened in this context."""
+        self._token = _current_span.set(self.root)
+
+    def finish(self: "Timeline") -> dict:
+        """Closes the root span and returns the whole tree.
+
+        Returns
+        -------
+            The span tree, with start offsets and durations in milliseconds.
+
+        """
+        self.root.end = time.perf_counter()
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        return self.root.to_dict(self.root.start)
@@ -18,6 +18,10 @@ class ChatRequest(BaseModel):
     model: str = Field(DEFAULT_MODEL, description="The name of the model to use (e.g., 'llama3', 'mistral').")
     messages: list[Message] = Field(..., description="The full conversation history.")
     stream: bool = Field(default=True, description="Whether to stream the response back.")
+    options: dict | None = Field(
+        default=None,
+        description="Ollama generation options (e.g., 'temperature', 'seed').",
+    )
 
 
 class AgentChatRequest(BaseModel):
@@ -27,3 +31,22 @@ class AgentChatRequest(BaseModel):
     model: str = Field(default=DEFAULT_MODEL)
     tool_choice: Literal["auto", "required", "none"] = Field(default="auto")
     stream: bool = Field(default=True)
+
+
+class ModelActionRequest(BaseModel):
+    """Request model for the admin model load/unload endpoints."""
+
+    model: str = Field(..., description="The name of the Ollama model to load or unload.")
+
+
+class SessionCreateRequest(BaseModel):
+    """Request model for creating a server-side chat session."""
+
+    model: str = Field(default=DEFAULT_MODEL, description="The model used for the session's replies.")
+
+
+class SessionMessageRequest(BaseModel):
+    """Request model for sending a new message to an existing session."""
+
+    content: str = Field(..., description="The text of the new user message.")
+    tool_choice: Literal["auto", "required", "none"] = Field(default="auto")
@@ -0,0 +1,116 @@
+"""@file warmup.py
+@description This module manages how long models stay loaded in Ollama.
+It resolves the `keep_alive` policy sent with every upstream call, preloads
+models at startup so the first request does not pay the model load time,
+and loads or unloads models on demand for the admin endpoints. A load goes
+to the backend the pool would route the model's requests to; an unload goes
+to every backend.
+"""
+import asyncio
+
+from src.backends import MODEL_EXTENSION, PIN_EXTENSION, backend_pool
+from src.config import (
+    MODEL_KEEP_ALIVE,
+    MODEL_KEEP_ALIVE_OVERRIDES,
+    OLLAMA_API_BASE,
+    WARMUP_MODELS,
+)
+from src.http_client import get_http_client
+from src.logger import LOGGER
+
+
+def _parse_keep_alive(value: str) -> str | int:
+    # Ollama reads bare numbers as seconds but rejects numeric strings.
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def get_keep_alive(model_name: str) -> str | int:
+    """Returns the `keep_alive` value to send to Ollama for a model.
+
+    Args:
+    ----
+        model_name: The name of the Ollama model.
+
+    Returns:
+    -------
+        The per-model override from `MODEL_KEEP_ALIVE_OVERRIDES` if one is
+        set, otherwise `MODEL_KEEP_ALIVE`.
+
+    """
+    return _parse_keep_alive(MODEL_KEEP_ALIVE_OVERRIDES.get(model_name, MODEL_KEEP_ALIVE))
+
+
+async def _send_keep_alive(model_name: str, keep_alive: str | int, backend_url: str | None = None) -> None:
+    # A chat request with no messages only loads (or unloads) the model.
+    response = await get_http_client().post(
+        OLLAMA_API_BASE,
+        json={"model": model_name, "messages": [], "keep_alive": keep_alive},
+        extensions={MODEL_EXTENSION: model_name, **({PIN_EXTENSION: backend_url} if backend_url else {})},
+    )
+    response.raise_for_status()
+    if keep_alive == 0 and backend_url:
+        backend_pool.record_unloaded(backend_pool.get(backend_url), model_name)
+
+
+async def load_model(model_name: str) -> None:
+    """Loads a model into Ollama's memory using its `keep_alive` policy.
+
+    Args:
+    ----
+        model_name: The name of the Ollama model to preload.
+
+    """
+    await _send_keep_alive(model_name, get_keep_alive(model_name))
+    LOGGER.info("Model loaded | model=%s", model_name)
+
+
+async def unload_model(model_name: str) -> None:
+    """Asks every Ollama backend to unload a model immediately.
+
+    Args:
+    ----
+        model_name: The name of the Ollama model to unload.
+
+    Raises:
+    ------
+        Exception: The first error, if any backend could not unload it.
+
+    """
+    results = await asyncio.gather(
+        *(_send_keep_alive(model_name, 0, backend.url) for backend in backend_pool.backends),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    LOGGER.info("Model unloaded | model=%s", model_name)
+
+
+async def warm_up_models(models: list[str] | None = None) -> dict[str, str]:
+    """Preloads models one after another.
+
+    Models are loaded sequentially so that warm-up does not compete with
+    itself for GPU memory. A failure is logged and does not stop the
+    remaining models from loading.
+
+    Args:
+    ----
+        models: The models to preload. Defaults to `WARMUP_MODELS`.
+
+    Returns:
+    -------
+        A mapping of model name to `"loaded"` or an error message.
+
+    """
+    results: dict[str, str] = {}
+    for model_name in models if models is not None else WARMUP_MODELS:
+        try:
+            await load_model(model_name)
+            results[model_name] = "loaded"
+        except Exception as e:  # noqa: PERF203
+            LOGGER.warning("Warm-up failed | model=%s | error=%s", model_name, e)
+            results[model_name] = f"error: {e}"
+    return results
@@ -0,0 +1,128 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+
+from src import admission
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_per_model() -> None:
+    controller = admission.AdmissionController(max_concurrent=2, max_queue=10)
+    active = 0
+    peak = 0
+
+    async def generate(model_name: str) -> None:
+        nonlocal active, peak
+        await controller.acquire(model_name)
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        controller.release(model_name, held_for=0.01)
+
+    await asyncio.gather(*(generate("model-a") for _ in range(6)))
+
+    assert peak == 2
+    stats = controller.get_stats()["models"]["model-a"]
+    assert stats == stats | {"active": 0, "queued": 0, "admitted": 6, "rejected": 0}
+
+
+@pytest.mark.asyncio
+async def test_models_do_not_share_slots() -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=0)
+    await controller.acquire("model-a")
+    await controller.acquire("model-b")
+
+    assert controller.get_stats()["models"]["model-b"]["active"] == 1
+
+
+@pytest.mark.asyncio
+async def test_queued_requests_are_served_by_priority() -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=10)
+    await controller.acquire("m")
+    served: list[str] = []
+
+    async def wait(name: str, priority: int) -> None:
+        await controller.acquire("m", priority=priority)
+        served.append(name)
+        controller.release("m")
+
+    tasks = [
+        asyncio.create_task(wait("low", 0)),
+        asyncio.create_task(wait("high", 5)),
+        asyncio.create_task(wait("medium", 1)),
+    ]
+    await asyncio.sleep(0)
+    assert controller.get_stats()["models"]["m"]["queued"] == 3
+
+    controller.release("m")
+    await asyncio.gather(*tasks)
+
+    assert served == ["high", "medium", "low"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_queue_timeout_are_rejected() -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=1, max_wait=0.01)
+    await controller.acquire("m")
+
+    waiting = asyncio.create_task(controller.acquire("m"))
+    await asyncio.sleep(0)
+    with pytest.raises(admission.AdmissionRejectedError) as full:
+        await controller.acquire("m")
+    assert full.value.reason == "queue full"
+    assert full.value.retry_after >= 1
+
+    with pytest.raises(admission.AdmissionRejectedError) as timed_out:
+        await waiting
+    assert timed_out.value.reason == "queue timeout"
+
+    stats = controller.get_stats()["models"]["m"]
+    assert stats["rejected"] == 2
+    assert stats["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue() -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=5)
+    await controller.acquire("m")
+
+    waiting = asyncio.create_task(controller.acquire("m"))
+    await asyncio.sleep(0)
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+
+    controller.release("m")
+    assert controller.get_stats()["models"]["m"]["active"] == 0
+    assert controller.get_stats()["models"]["m"]["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_guard_releases_slot_when_stream_ends() -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=0)
+
+    async def stream() -> AsyncIterator[str]:
+        yield "a"
+        yield "b"
+
+    await controller.acquire("m")
+    assert [item async for item in controller.guard("m", stream())] == ["a", "b"]
+    assert controller.get_stats()["models"]["m"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_guard_releases_slot_of_a_stream_that_is_never_read() -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=0)
+
+    async def stream() -> AsyncIterator[str]:
+        yield "a"
+
+    await controller.acquire("m")
+    guarded = controller.guard("m", stream())
+    await guarded.aclose()
+    await guarded.aclose()
+
+    assert controller.get_stats()["models"]["m"]["active"] == 0
+    await controller.acquire("m")
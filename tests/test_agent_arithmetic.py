@@ -0,0 +1,81 @@
+import math
+import time
+
+import pytest
+
+from src.agent import arithmetic
+from src.agent.arithmetic import ExpressionError, compile_expression, evaluate
+from src.agent.tools import calculator
+
+
+@pytest.mark.parametrize(("expression", "expected"), [
+    ("2+2", 4),
+    ("(75-32)*5/9", (75 - 32) * 5 / 9),
+    ("-(-7)//2 + 7 % 3", 4),
+    ("2^10", 1024),
+    ("sqrt(16) + log(e) + log(8, 2) + log10(1000)", 11.0),
+    ("round(pi, 2) * max(1, 2, 3)", 9.42),
+    ("2 ** -2", 0.25),
+    ("cbrt(-27) + cbrt(2) ** 3", -1.0),
+    ("round(123456, -3) + round(2.5)", 123002),
+])
+def test_evaluates_arithmetic_and_math_functions(expression: str, expected: float) -> None:
+    assert evaluate(expression) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("expression", [
+    "9**9**9**9",
+    "10**100000",
+    "(2**4000) * (2**4000)",
+    "10.0**400",
+    "exp(1000)",
+    "round(1, -10**7)",
+    "round(1, -10**1000)",
+    "round(2.5, 10**9)",
+    "+".join(["1"] * 150),
+    "1" * 2000,
+])
+def test_pathological_expressions_are_rejected_quickly(expression: str) -> None:
+    started = time.perf_counter()
+    with pytest.raises(ExpressionError):
+        evaluate(expression)
+    assert time.perf_counter() - started < 0.05
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('true')",
+    "().__class__",
+    "x + 1",
+    "(lambda: 1)()",
+    "'a' * 3",
+    "sqrt(x=4)",
+    "1 if 1 else 2",
+    "2 + 2 apples",
+    "round(1, 0.5)",
+])
+def test_anything_but_arithmetic_is_rejected(expression: str) -> None:
+    with pytest.raises(ExpressionError):
+        evaluate(expression)
+
+
+def test_compiled_expressions_are_cached() -> None:
+    compile_expression.cache_clear()
+    evaluate("sqrt(2) * 3")
+    evaluate("sqrt(2) * 3")
+
+    assert compile_expression.cache_info().hits == 1
+
+
+def test_limits_are_enforced_on_results(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(arithmetic, "MAX_INT_BITS", 64)
+
+    assert evaluate("2**63") == 2**63
+    with pytest.raises(ExpressionError, match="too large"):
+        evaluate("2**63 * 4")
+
+
+def test_calculator_reports_errors() -> None:
+    assert calculator.func("1/0") == "Error: Division by zero"
+    assert calculator.func("sqrt(-1)") == "Error: Math domain error"
+    assert calculator.func("9**9**9**9").startswith("Error: Exponent is too large")
+    assert calculator.func("cos(0)") == f"Result: {math.cos(0)}"
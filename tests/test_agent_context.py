@@ -0,0 +1,131 @@
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+
+from src import streaming
+from src.admission import AdmissionController
+from src.agent import context
+
+
+def _turn(index: int, size: int = 40) -> list[dict]:
+    return [
+        {"role": "user", "content": f"q{index} " + "x" * size},
+        {"role": "assistant", "content": f"a{index} " + "y" * size},
+    ]
+
+
+class RecordingSummarizer:
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, list[str]]] = []
+
+    async def __call__(self, previous: str, messages: list[dict], model_name: str) -> str:
+        self.calls.append((previous, [message["content"][:3].strip() for message in messages]))
+        return f"{previous}+{len(messages)}"
+
+
+def test_estimate_tokens_rounds_up() -> None:
+    assert context.estimate_tokens("") == 0
+    assert context.estimate_tokens("abcde") == 2
+    assert context.estimate_message_tokens({"role": "user", "content": "abcd"}) == 1 + context.MESSAGE_OVERHEAD_TOKENS
+
+
+def test_short_history_keeps_assistant_replies(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGETS", {})
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGET", 1000)
+    summarizer = RecordingSummarizer()
+    manager = context.ContextManager(summarizer=summarizer, summary_tokens=10)
+
+    messages = [*_turn(1), {"role": "system", "content": "ignored"}, {"role": "user", "content": "next"}]
+    result = manager.build(messages, "m")
+
+    assert [type(message) for message in result] == [HumanMessage, AIMessage, HumanMessage]
+    assert summarizer.calls == []
+
+
+@pytest.mark.asyncio
+async def test_long_history_is_folded_into_summary_incrementally(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Each turn costs 2 * (11 + 4) = 30 tokens; 50 - 10 leaves room for one turn.
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGETS", {"m": 50})
+    monkeypatch.setattr(context, "admission_controller", AdmissionController())
+    summarizer = RecordingSummarizer()
+    manager = context.ContextManager(summarizer=summarizer, summary_tokens=10)
+
+    # Until a summary is written, the turns that do not fit are dropped.
+    history = _turn(1) + _turn(2) + _turn(3)
+    assert [message.content[:2] for message in manager.build(history, "m")] == ["q3", "a3"]
+    assert summarizer.calls == []
+
+    await manager.refresh(history, "m")
+    first = manager.build(history, "m")
+    assert first[0].content == "Summary of our earlier conversation:\n+4"
+    assert [message.content[:2] for message in first[1:]] == ["q3", "a3"]
+    assert summarizer.calls == [("", ["q1", "a1", "q2", "a2"])]
+
+    # Only the turn that just left the window is summarized by the next refresh.
+    await manager.refresh(history + _turn(4), "m")
+    assert summarizer.calls[-1] == ("+4", ["q3", "a3"])
+    assert manager.build(history + _turn(4), "m")[0].content.endswith("+4+2")
+
+    # A history that is already summarized is not summarized again.
+    await manager.refresh(history + _turn(4), "m")
+    assert len(summarizer.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_latest_turn_is_kept_even_if_over_budget(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGETS", {"m": 5})
+    manager = context.ContextManager(summarizer=RecordingSummarizer(), summary_tokens=1)
+
+    older, recent = manager.split(_turn(1) + _turn(2, size=400), budget=5)
+
+    assert [message["content"][:2] for message in recent] == ["q2", "a2"]
+    assert len(older) == 2
+
+
+@pytest.mark.asyncio
+async def test_summary_failure_drops_older_turns(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGETS", {"m": 50})
+    controller = AdmissionController()
+    monkeypatch.setattr(context, "admission_controller", controller)
+
+    async def failing(previous: str, messages: list[dict], model_name: str) -> str:
+        msg = "ollama offline"
+        raise RuntimeError(msg)
+
+    manager = context.ContextManager(summarizer=failing, summary_tokens=10)
+    await manager.refresh(_turn(1) + _turn(2), "m")
+    result = manager.build(_turn(1) + _turn(2), "m")
+
+    assert [message.content[:2] for message in result] == ["q2", "a2"]
+    assert controller.get_stats()["models"]["m"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_history_is_summarized_only_after_the_reply(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(context, "CONTEXT_TOKEN_BUDGETS", {"m": 50})
+    controller = AdmissionController(max_concurrent=1)
+    monkeypatch.setattr(context, "admission_controller", controller)
+    summarizer = RecordingSummarizer()
+    monkeypatch.setattr(context, "context_manager", context.ContextManager(summarizer=summarizer, summary_tokens=10))
+    calls_at_first_token: list[int] = []
+
+    class DummyLLM:
+        async def astream(self, messages: list[Any]) -> AsyncIterator[Any]:
+            calls_at_first_token.append(len(summarizer.calls))
+            yield AIMessageChunk(content="a3 done")
+
+    monkeypatch.setattr(streaming, "get_simple_llm", lambda model_name, **options: DummyLLM())
+
+    # The reply holds the model's slot, so the summary waits for it.
+    await controller.acquire("m")
+    history = [*_turn(1), *_turn(2), {"role": "user", "content": "q3"}]
+    events = [line async for line in streaming.agent_stream_generator(history, "m", "none")]
+    assert events[-1].startswith(b'{"type":"done"')
+    controller.release("m")
+    await asyncio.sleep(0.01)
+
+    assert calls_at_first_token == [0]
+    assert summarizer.calls == [("", ["q1", "a1", "q2", "a2"])]
@@ -20,12 +20,13 @@ def test_create_agent_graph_without_tools_uses_simple_graph(monkeypatch: pytest.
     assert result is sentinel
 
 
-def test_create_simple_graph_invokes_llm_once() -> None:
+@pytest.mark.asyncio
+async def test_create_simple_graph_invokes_llm_once() -> None:
     class RecordingLLM:
         def __init__(self) -> None:
             self.calls = 0
 
-        def invoke(self, messages) -> AIMessage:
+        async def ainvoke(self, messages) -> AIMessage:
             self.calls += 1
             return AIMessage(content="Simple response")
 
@@ -38,14 +39,15 @@ def test_create_simple_graph_invokes_llm_once() -> None:
         "iteration_count": 0,
     }
 
-    result = workflow.invoke(state)
+    result = await workflow.ainvoke(state)
 
     assert llm.calls == 1
     assert result["messages"][-1].content == "Simple response"
     assert result["iteration_count"] == 1
 
 
-def test_create_agent_graph_with_tools_executes_tool(monkeypatch: pytest.MonkeyPatch) -> None:
+@pytest.mark.asyncio
+async def test_create_agent_graph_with_tools_executes_tool(monkeypatch: pytest.MonkeyPatch) -> None:
     class ToolAwareLLM:
         def __init__(self, *args, **kwargs) -> None:
             self.calls = 0
@@ -55,7 +57,7 @@ def test_create_agent_graph_with_tools_executes_tool(monkeypatch: pytest.MonkeyP
             self.bound_tools = tools
             return self
 
-        def invoke(self, messages) -> AIMessage:
+        async def ainvoke(self, messages) -> AIMessage:
             self.calls += 1
             if self.calls == 1:
                 tool_name = self.bound_tools[0].name
@@ -80,7 +82,7 @@ def test_create_agent_graph_with_tools_executes_tool(monkeypatch: pytest.MonkeyP
         "iteration_count": 0,
     }
 
-    result = workflow.invoke(state)
+    result = await workflow.ainvoke(state)
 
     assert result["messages"][-1].content == "Final answer"
     assert result["tool_results"][-1]["tool"] == calculator.name
@@ -0,0 +1,64 @@
+import pytest
+
+from src.agent import graph as agent_graph
+from src.agent import registry
+
+
+def test_registry_reuses_instances_per_model_and_options() -> None:
+    builds: list[tuple[str, dict]] = []
+
+    def factory(model_name: str, **options: object) -> object:
+        builds.append((model_name, options))
+        return object()
+
+    cache = registry.ModelRegistry(factory, max_size=4)
+
+    first = cache.get("model-a", temperature=0.7)
+    assert cache.get("model-a", temperature=0.7) is first
+    assert cache.get("model-a", temperature=0.0) is not first
+    assert cache.get("model-b", temperature=0.7) is not first
+    assert len(builds) == 3
+
+
+def test_registry_evicts_least_recently_used_entry() -> None:
+    cache = registry.ModelRegistry(lambda model_name, **_: object(), max_size=2)
+
+    a = cache.get("a")
+    cache.get("b")
+    cache.get("a")  # "a" becomes most recently used
+    cache.get("c")  # evicts "b"
+
+    assert len(cache) == 2
+    assert cache.get("a") is a
+    assert cache.invalidate("b") == 0
+
+
+def test_registry_invalidation_by_model_and_globally() -> None:
+    cache = registry.ModelRegistry(lambda model_name, **_: object(), max_size=8)
+    a = cache.get("a", temperature=0.1)
+    cache.get("a", temperature=0.2)
+    cache.get("b")
+
+    assert cache.invalidate("a") == 2
+    assert cache.get("a", temperature=0.1) is not a
+    assert cache.invalidate() == 2
+    assert len(cache) == 0
+
+
+def test_get_agent_graph_builds_once_per_model(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[str] = []
+
+    def fake_create_agent_graph(model_name: str, **options: object) -> object:
+        calls.append(model_name)
+        return object()
+
+    monkeypatch.setattr(agent_graph, "create_agent_graph", fake_create_agent_graph)
+    registry.invalidate_model()
+
+    graph = registry.get_agent_graph("mock-model")
+    assert registry.get_agent_graph("mock-model") is graph
+    assert calls == ["mock-model"]
+
+    assert registry.invalidate_model("mock-model") == 1
+    assert registry.get_agent_graph("mock-model") is not graph
+    registry.invalidate_model()
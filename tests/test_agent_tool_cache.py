@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from langchain_core.tools import StructuredTool
+
+from src.agent import tool_executor
+from src.agent.tool_cache import ToolResultCache, is_pure, make_tool_key
+from src.agent.tools import encode_decode_text, get_tools
+
+
+def _counting_tool(runs: list[str], **metadata: object) -> StructuredTool:
+    def shout(text: str, times: int = 1) -> str:
+        runs.append(text)
+        return text.upper() * times
+
+    return StructuredTool.from_function(func=shout, name="shout", description="shout", metadata=metadata)
+
+
+def test_only_tools_without_side_inputs_are_pure() -> None:
+    pure = {tool.name for tool in get_tools() if is_pure(tool)}
+
+    assert pure == {"calculator", "unit_converter", "days_between_dates", "text_analyzer", "encode_decode_text"}
+
+
+def test_keys_use_the_arguments_the_tool_receives() -> None:
+    default = make_tool_key(encode_decode_text, {"text": "hi"})
+    explicit = make_tool_key(encode_decode_text, {"operation": "base64_encode", "text": "hi"})
+
+    assert default == explicit
+    assert make_tool_key(encode_decode_text, {"text": "hi", "operation": "url_encode"}) != default
+    assert make_tool_key(encode_decode_text, {"operation": "url_encode"}) is None
+
+
+@pytest.mark.asyncio
+async def test_pure_tool_results_are_reused(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = ToolResultCache()
+    monkeypatch.setattr(tool_executor, "tool_result_cache", cache)
+    runs: list[str] = []
+    tools = {"shout": _counting_tool(runs, pure=True)}
+
+    first = await tool_executor.execute_tool_calls([{"id": "1", "name": "shout", "args": {"text": "hi"}}], tools)
+    second = await tool_executor.execute_tool_calls(
+        [{"id": "2", "name": "shout", "args": {"times": "1", "text": "hi"}}], tools
+    )
+
+    assert runs == ["hi"]
+    assert first[0].content == second[0].content == "HI"
+    assert second[0].tool_call_id == "2"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_impure_and_failed_calls_are_not_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    cache = ToolResultCache()
+    monkeypatch.setattr(tool_executor, "tool_result_cache", cache)
+    runs: list[str] = []
+    call = {"id": "1", "name": "shout", "args": {"text": "hi"}}
+
+    for _ in range(2):
+        await tool_executor.execute_tool_calls([call], {"shout": _counting_tool(runs)})
+    assert runs == ["hi", "hi"]
+
+    async def hang(text: str) -> str:
+        await asyncio.sleep(1)
+        return text
+
+    slow = StructuredTool.from_function(
+        coroutine=hang, name="shout", description="shout", metadata={"pure": True, "timeout": 0.01}
+    )
+    await tool_executor.execute_tool_calls([call], {"shout": slow})
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_cache_evicts_by_size_and_skips_oversized_entries() -> None:
+    cache = ToolResultCache(max_entries=3, max_bytes=100, max_entry_bytes=60)
+
+    assert not cache.put("big", "x" * 60)
+    assert cache.put("a", "x" * 40)
+    assert cache.put("b", "x" * 40)
+    assert cache.get("a") is not None
+    assert cache.put("c", "x" * 40)
+
+    # "b" was the least recently used once "a" had been read.
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get_stats()["bytes"] <= 100
+    assert cache.evictions == 1
+
+    for key in ("d", "e", "f", "g"):
+        cache.put(key, "")
+    assert cache.get_stats()["entries"] == 3
@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.tools import StructuredTool
+
+from src.agent import tool_executor
+from src.agent.tools import calculator
+
+
+def _make_async_tool(name: str, delay: float, **metadata: object) -> StructuredTool:
+    async def run(value: str) -> str:
+        await asyncio.sleep(delay)
+        return f"{name}:{value}"
+
+    return StructuredTool.from_function(coroutine=run, name=name, description=name, metadata=metadata)
+
+
+def _make_sync_tool(name: str, delay: float) -> StructuredTool:
+    def run(value: str) -> str:
+        time.sleep(delay)
+        return f"{name}:{value}"
+
+    return StructuredTool.from_function(func=run, name=name, description=name)
+
+
+def _call(name: str, value: str, call_id: str) -> dict:
+    return {"id": call_id, "name": name, "args": {"value": value}}
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_run_concurrently_and_keep_order() -> None:
+    tools = {
+        "slow_async": _make_async_tool("slow_async", 0.2),
+        "fast_async": _make_async_tool("fast_async", 0.01),
+        "slow_sync": _make_sync_tool("slow_sync", 0.2),
+        "other_sync": _make_sync_tool("other_sync", 0.2),
+    }
+    calls = [
+        _call("slow_async", "a", "1"),
+        _call("slow_sync", "b", "2"),
+        _call("fast_async", "c", "3"),
+        _call("other_sync", "d", "4"),
+    ]
+
+    started = time.perf_counter()
+    messages = await tool_executor.execute_tool_calls(calls, tools)
+    elapsed = time.perf_counter() - started
+
+    assert [msg.content for msg in messages] == ["slow_async:a", "slow_sync:b", "fast_async:c", "other_sync:d"]
+    assert [msg.tool_call_id for msg in messages] == ["1", "2", "3", "4"]
+    assert elapsed < 0.4  # the slowest tool, not the sum of all of them
+
+
+@pytest.mark.asyncio
+async def test_each_tool_call_has_its_own_timeout() -> None:
+    tools = {
+        "hangs": _make_async_tool("hangs", 5, timeout=0.05),
+        "quick": _make_async_tool("quick", 0),
+    }
+    messages = await tool_executor.execute_tool_calls(
+        [_call("hangs", "x", "1"), _call("quick", "y", "2")],
+        tools,
+    )
+
+    assert messages[0].content == "Error: Tool 'hangs' timed out after 0.05s"
+    assert messages[1].content == "quick:y"
+
+
+@pytest.mark.asyncio
+async def test_unknown_tools_and_tool_errors_are_reported() -> None:
+    messages = await tool_executor.execute_tool_calls(
+        [
+            {"id": "1", "name": "missing", "args": {}},
+            {"id": "2", "name": "calculator", "args": {}},
+            {"id": "3", "name": "calculator", "args": {"expression": "1+1"}},
+        ],
+        {"calculator": calculator},
+    )
+
+    assert messages[0].content == "Error: Tool 'missing' is not available"
+    assert messages[1].content.startswith("Error:")
+    assert messages[2].content == "Result: 2"
+    assert messages[2].name == "calculator"
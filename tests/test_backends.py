@@ -0,0 +1,158 @@
+import asyncio
+
+import httpx
+import pytest
+
+from src import model_cache, warmup
+from src.backends import MODEL_EXTENSION, BackendPool, PoolTransport
+from src.config import OLLAMA_API_BASE, OLLAMA_TAGS_URL
+
+A = "http://ollama-a:11434"
+B = "http://ollama-b:11434"
+
+
+def make_client(pool: BackendPool, handler: object) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=PoolTransport(pool, httpx.MockTransport(handler)))
+
+
+def test_candidates_prefer_loaded_model_then_fewest_outstanding() -> None:
+    pool = BackendPool([A, B], cold_model_penalty=4)
+    pool.get(B).loaded_models = {"qwen3:8b"}
+
+    assert pool.candidates("qwen3:8b")[0].url == B
+
+    # Once the warm backend is busy enough, loading the model elsewhere wins.
+    pool.get(B).outstanding = 5
+    assert pool.candidates("qwen3:8b")[0].url == A
+
+    # Backends known not to have the model are skipped.
+    pool.get(A).available_models = {"llama3:latest"}
+    assert [backend.url for backend in pool.candidates("qwen3:8b")] == [B]
+
+
+@pytest.mark.asyncio
+async def test_requests_fail_over_before_the_first_byte() -> None:
+    pool = BackendPool([A, B], unhealthy_threshold=1)
+    pool.get(B).outstanding = 1  # Make A the first choice.
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host == "ollama-a":
+            raise httpx.ConnectError("refused", request=request)
+        return httpx.Response(200, text=request.url.path)
+
+    async with make_client(pool, handler) as client:
+        response = await client.post(OLLAMA_API_BASE, json={"model": "qwen3:8b", "messages": []})
+
+    assert response.text == "/api/chat"
+    assert pool.failovers == 1
+    assert not pool.get(A).healthy
+    assert "qwen3:8b" in pool.get(B).loaded_models
+    # The body was read and closed, so nothing is left outstanding.
+    assert pool.get(B).outstanding == 1
+
+
+@pytest.mark.asyncio
+async def test_model_extension_routes_without_parsing_the_body() -> None:
+    pool = BackendPool([A, B])
+    pool.get(B).loaded_models = {"qwen3:8b"}
+
+    async with make_client(pool, lambda request: httpx.Response(200, text=request.url.host)) as client:
+        response = await client.post(
+            OLLAMA_API_BASE,
+            content=b"{not json",
+            headers={"content-type": "application/json"},
+            extensions={MODEL_EXTENSION: "qwen3:8b"},
+        )
+
+    assert response.text == "ollama-b"
+
+
+@pytest.mark.asyncio
+async def test_only_successful_generation_marks_a_model_loaded(monkeypatch: pytest.MonkeyPatch) -> None:
+    pool = BackendPool([A])
+    status = 404
+
+    async with make_client(pool, lambda _: httpx.Response(status)) as client:
+        await client.post(OLLAMA_API_BASE, json={"model": "missing:1b", "messages": []})
+        assert pool.get(A).loaded_models == set()
+
+        status = 200
+        await client.post(OLLAMA_API_BASE, json={"model": "qwen3:8b", "messages": []})
+        assert pool.get(A).loaded_models == {"qwen3:8b"}
+
+        monkeypatch.setattr(warmup, "backend_pool", pool)
+        monkeypatch.setattr(warmup, "get_http_client", lambda: client)
+        await warmup.unload_model("qwen3:8b")
+        assert pool.get(A).loaded_models == set()
+
+
+@pytest.mark.asyncio
+async def test_server_errors_fail_over_and_the_last_answer_is_returned() -> None:
+    pool = BackendPool([A, B])
+
+    async with make_client(pool, lambda _: httpx.Response(503)) as client:
+        response = await client.get(OLLAMA_TAGS_URL)
+
+    assert response.status_code == 503
+    assert pool.failovers == 1
+    assert sum(backend.requests for backend in pool.backends) == 2
+    assert all(backend.outstanding == 0 for backend in pool.backends)
+
+
+@pytest.mark.asyncio
+async def test_health_checks_eject_and_readmit_backends() -> None:
+    pool = BackendPool([A], unhealthy_threshold=2)
+    up = False
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/api/ps"
+        if not up:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"models": [{"name": "qwen3:8b"}]})
+
+    pool._health_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    await pool.check_all()
+    assert pool.get(A).healthy
+    await pool.check_all()
+    assert not pool.get(A).healthy
+
+    up = True
+    await pool.check_all()
+    assert pool.get(A).healthy
+    assert pool.get(A).loaded_models == {"qwen3:8b"}
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_health_loop_survives_unexpected_payloads() -> None:
+    pool = BackendPool([A], unhealthy_threshold=1, health_interval=0.01)
+    pool.get(A).healthy = False
+    responses = iter([["not", "an", "object"]])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=next(responses, {"models": []}))
+
+    pool._health_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    pool.start()
+    await asyncio.sleep(0.05)
+
+    assert pool.get(A).healthy
+    await pool.stop()
+
+
+@pytest.mark.asyncio
+async def test_model_list_is_merged_across_backends(monkeypatch: pytest.MonkeyPatch) -> None:
+    pool = BackendPool([A, B])
+    tags = {
+        "ollama-a": [{"name": "qwen3:8b"}, {"name": "llama3:latest"}],
+        "ollama-b": [{"name": "qwen3:8b"}, {"name": "mistral:latest"}],
+    }
+    client = make_client(pool, lambda request: httpx.Response(200, json={"models": tags[request.url.host]}))
+    monkeypatch.setattr(model_cache, "backend_pool", pool)
+    monkeypatch.setattr(model_cache, "get_http_client", lambda: client)
+
+    models = await model_cache.fetch_models()
+
+    assert [model["name"] for model in models] == ["qwen3:8b", "llama3:latest", "mistral:latest"]
+    assert [backend.url for backend in pool.candidates("mistral")] == [B]
+    await client.aclose()
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from benchmarks import cold_start, fake_ollama, load_test
+
+
+def fake_client(**config: object) -> AsyncClient:
+    app = fake_ollama.create_app(fake_ollama.FakeOllamaConfig(**config))
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://fake-ollama")
+
+
+def test_percentile_interpolates() -> None:
+    values = [float(value) for value in range(1, 101)]
+    assert load_test.percentile(values, 50) == pytest.approx(50.5)
+    assert load_test.percentile(values, 99) == pytest.approx(99.01)
+    assert load_test.percentile([], 95) is None
+
+
+@pytest.mark.asyncio
+async def test_fake_ollama_streams_tokens_and_tool_calls() -> None:
+    async with fake_client(ttft=0, tokens_per_second=0, response_tokens=3) as client:
+        tags = (await client.get("/api/tags")).json()
+        chat = await client.post("/api/chat", json={"model": "fake-model", "messages": [{"role": "user", "content": "hi"}]})
+        tools = [{"type": "function", "function": {"name": "calculator"}}]
+        tool_turn = await client.post(
+            "/api/chat",
+            json={"model": "fake-model", "messages": [{"role": "user", "content": "6*7?"}], "tools": tools},
+        )
+        loaded = await client.post("/api/chat", json={"model": "fake-model", "messages": []})
+
+    assert tags["models"][0]["name"] == "fake-model"
+    lines = [json.loads(line) for line in chat.text.splitlines()]
+    assert [line["message"]["content"] for line in lines[:-1]] == ["token0 ", "token1 ", "token2 "]
+    assert lines[-1]["done"] is True
+    assert lines[-1]["eval_count"] == 3
+    tool_call = json.loads(tool_turn.text.splitlines()[0])["message"]["tool_calls"][0]
+    assert tool_call["function"] == {"name": "calculator", "arguments": {"expression": "6*7"}}
+    assert loaded.json()["done_reason"] == "load"
+
+
+@pytest.mark.asyncio
+async def test_run_level_reports_percentiles_and_injected_failures() -> None:
+    async with fake_client(ttft=0.01, tokens_per_second=0, response_tokens=2) as client:
+        healthy = await load_test.run_level(client, "chat", "fake-model", concurrency=2, requests=6)
+    async with fake_client(failure_rate=1.0) as client:
+        failing = await load_test.run_level(client, "chat", "fake-model", concurrency=2, requests=4)
+
+    assert healthy["succeeded"] == 6
+    assert healthy["ttft_ms"]["p50"] >= 10
+    assert healthy["latency_ms"]["p99"] >= healthy["latency_ms"]["p50"]
+    assert healthy["throughput_rps"] > 0
+    assert failing["succeeded"] == 0
+    assert failing["errors"] == {"HTTP 500": 4}
+
+
+def test_compare_reports_relative_changes() -> None:
+    def report(p95: float, rps: float) -> dict:
+        return {"results": [{
+            "route": "chat",
+            "concurrency": 4,
+            "latency_ms": {"p95": p95},
+            "ttft_ms": {"p95": None},
+            "throughput_rps": rps,
+        }]}
+
+    lines = load_test.compare(report(200.0, 10.0), report(150.0, 12.0))
+    assert lines == ["chat c=4: latency p95 200.0 -> 150.0 (-25.0%), rps 10.0 -> 12.0 (+20.0%)"]
+
+
+def test_importtime_report_is_grouped_by_package() -> None:
+    output = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |     langchain_core.messages",
+        "import time:       250 |        350 |   langchain_core",
+        "import time:        50 |        400 | src.server",
+    ])
+
+    times = cold_start.parse_importtime(output)
+
+    assert times["src.server"] == (50, 400)
+    assert cold_start.heaviest_packages(times) == {"langchain_core": 0.3, "src": 0.1}
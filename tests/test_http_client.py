@@ -0,0 +1,102 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from src import http_client, server
+from src.backends import BackendPool
+
+
+@pytest_asyncio.fixture
+async def keepalive_server() -> AsyncIterator[str]:
+    """Serve a minimal HTTP/1.1 endpoint that keeps connections open."""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    tcp_server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = tcp_server.sockets[0].getsockname()[1]
+    async with tcp_server:
+        yield f"http://127.0.0.1:{port}/"
+        tcp_server.close()
+
+
+@pytest.mark.asyncio
+async def test_shared_client_is_reused_until_closed() -> None:
+    await http_client.close_http_client()
+
+    client = http_client.get_http_client()
+    assert http_client.get_http_client() is client
+
+    await http_client.close_http_client()
+    assert client.is_closed
+    assert http_client.get_http_client() is not client
+    await http_client.close_http_client()
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_report_idle_keepalive_connection(
+    monkeypatch: pytest.MonkeyPatch,
+    keepalive_server: str,
+) -> None:
+    # The shared client only talks to the Ollama backends.
+    monkeypatch.setattr(http_client, "backend_pool", BackendPool([keepalive_server]))
+    await http_client.close_http_client()
+    assert http_client.get_pool_stats()["connections"] == 0
+
+    client = http_client.get_http_client()
+    for _ in range(3):
+        response = await client.get(keepalive_server)
+        assert response.text == "ok"
+
+    stats = http_client.get_pool_stats()
+    assert stats["connections"] == 1
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 0
+    await http_client.close_http_client()
+
+
+@pytest.mark.asyncio
+async def test_own_clients_share_the_pool_through_shared_transport(
+    monkeypatch: pytest.MonkeyPatch,
+    keepalive_server: str,
+) -> None:
+    monkeypatch.setattr(http_client, "backend_pool", BackendPool([keepalive_server]))
+    await http_client.close_http_client()
+    shared = http_client.get_http_client()
+    await shared.get(keepalive_server)
+
+    # As the agent's ChatOllama builds its own client.
+    async with httpx.AsyncClient(transport=http_client.shared_transport) as own:
+        assert (await own.get(keepalive_server)).text == "ok"
+
+    stats = http_client.get_pool_stats()
+    assert stats["connections"] == 1  # the shared client's connection was reused
+    assert not shared.is_closed
+    assert (await shared.get(keepalive_server)).text == "ok"
+    await http_client.close_http_client()
+
+
+@pytest.mark.asyncio
+async def test_lifespan_creates_and_closes_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    warmed_up = asyncio.Event()
+
+    async def fake_warm_up() -> dict[str, str]:
+        warmed_up.set()
+        return {}
+
+    monkeypatch.setattr(server, "warm_up_models", fake_warm_up)
+    await http_client.close_http_client()
+
+    async with server.lifespan(server.app):
+        client = http_client.get_http_client()
+        assert not client.is_closed
+        await asyncio.wait_for(warmed_up.wait(), timeout=1)
+
+    assert client.is_closed
@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from src import launcher
+
+
+def test_shared_run_directory_is_removed_after_the_workers_exit(monkeypatch: pytest.MonkeyPatch) -> None:
+    for name in ("SHARED_CACHE_PATH", "PROMETHEUS_MULTIPROC_DIR"):
+        # Setting first makes monkeypatch remove what the launcher sets.
+        monkeypatch.setenv(name, "")
+        monkeypatch.delenv(name)
+    monkeypatch.setattr(sys, "argv", ["launcher", "--workers", "2"])
+    seen: list[Path] = []
+
+    def run(app: str, **kwargs: object) -> None:
+        seen.append(Path(os.environ["SHARED_CACHE_PATH"]).parent)
+        assert Path(os.environ["PROMETHEUS_MULTIPROC_DIR"]).is_dir()
+
+    monkeypatch.setattr(launcher.uvicorn, "run", run)
+    launcher.main()
+
+    assert len(seen) == 1
+    assert not seen[0].exists()
+
+
+def test_no_run_directory_when_the_operator_sets_the_paths(
+        monkeypatch: pytest.MonkeyPatch,
+        tmp_path: Path,
+) -> None:
+    monkeypatch.setenv("SHARED_CACHE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+
+    assert launcher.prepare_shared_state(4) is None
+    assert launcher.prepare_shared_state(1) is None
@@ -0,0 +1,87 @@
+import json
+import logging
+import queue
+import threading
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from src import logger as app_logger
+from src import server
+
+
+def make_record(level: int = logging.INFO, msg: str = "hello %s", args: tuple = ("world",), **extra: object) -> logging.LogRecord:
+    record = logging.LogRecord("app", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_includes_request_id_and_extra_fields() -> None:
+    record = make_record(request_id="req-1", model="qwen3:8b")
+
+    entry = json.loads(app_logger.JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["message"] == "hello world"
+    assert entry["request_id"] == "req-1"
+    assert entry["model"] == "qwen3:8b"
+
+
+def test_filter_tags_request_id_and_samples_debug_records() -> None:
+    token = app_logger.request_id_var.set("req-2")
+    try:
+        info = make_record()
+        assert app_logger.RequestContextFilter(debug_sample_rate=0.0).filter(info)
+        assert info.request_id == "req-2"
+        assert not app_logger.RequestContextFilter(debug_sample_rate=0.0).filter(make_record(logging.DEBUG))
+        assert app_logger.RequestContextFilter(debug_sample_rate=1.0).filter(make_record(logging.DEBUG))
+    finally:
+        app_logger.request_id_var.reset(token)
+
+
+def test_queue_handler_defers_formatting_and_drops_when_full() -> None:
+    class Unformattable:
+        def __str__(self) -> str:
+            raise AssertionError("formatted on the calling thread")
+
+    handler = app_logger.NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.emit(make_record(args=(Unformattable(),)))
+    handler.emit(make_record())
+
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+
+def test_listener_writes_json_lines_off_the_calling_thread(monkeypatch: pytest.MonkeyPatch) -> None:
+    written: list[tuple[str, str]] = []
+
+    class CapturingStream:
+        def write(self, text: str) -> None:
+            written.append((threading.current_thread().name, text))
+
+        def flush(self) -> None:
+            pass
+
+    root = logging.getLogger()
+    monkeypatch.setattr(app_logger.sys, "stdout", CapturingStream())
+    monkeypatch.setattr(root, "handlers", [])
+    app_logger.initialize_logger()
+    try:
+        app_logger.LOGGER.info("Model loaded | model=%s", "qwen3:8b")
+    finally:
+        app_logger.shutdown_logger()
+
+    [(thread_name, text)] = [(name, text) for name, text in written if text.strip()]
+    assert thread_name != threading.current_thread().name
+    assert json.loads(text)["message"] == "Model loaded | model=qwen3:8b"
+    assert not any(isinstance(handler, app_logger.NonBlockingQueueHandler) for handler in root.handlers)
+
+
+@pytest.mark.asyncio
+async def test_request_id_middleware_sets_and_echoes_the_id() -> None:
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as client:
+        given = await client.get("/api/health", headers={"X-Request-ID": "abc123"})
+        generated = await client.get("/api/health")
+
+    assert given.headers["X-Request-ID"] == "abc123"
+    assert len(generated.headers["X-Request-ID"]) == 32
@@ -0,0 +1,41 @@
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from prometheus_client import REGISTRY
+
+from src import metrics
+from src.agent.tool_executor import execute_tool_calls
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_generation_speed_comes_from_eval_stats() -> None:
+    before_count = sample("chat_generation_tokens_per_second_count", route="chat", model="speed-model")
+    before_sum = sample("chat_generation_tokens_per_second_sum", route="chat", model="speed-model")
+
+    metrics.observe_generation_speed("chat", "speed-model", {"eval_count": 50, "eval_duration": 2_000_000_000})
+    metrics.observe_generation_speed("chat", "speed-model", {"done": True})  # no stats: ignored
+
+    assert sample("chat_generation_tokens_per_second_count", route="chat", model="speed-model") == before_count + 1
+    assert sample("chat_generation_tokens_per_second_sum", route="chat", model="speed-model") == before_sum + 25
+
+
+@pytest.mark.asyncio
+async def test_tool_latency_and_errors_are_recorded() -> None:
+    @tool
+    def flaky_metrics_tool(text: str) -> str:
+        """Always fails."""
+        msg = "boom"
+        raise ValueError(msg)
+
+    message = AIMessage(content="", tool_calls=[
+        {"name": "flaky_metrics_tool", "args": {"text": "x"}, "id": "1"},
+        {"name": "missing_metrics_tool", "args": {}, "id": "2"},
+    ])
+    await execute_tool_calls(message.tool_calls, {"flaky_metrics_tool": flaky_metrics_tool})
+
+    assert sample("agent_tool_errors_total", tool="flaky_metrics_tool") == 1
+    assert sample("agent_tool_errors_total", tool="missing_metrics_tool") == 1
+    assert sample("agent_tool_duration_seconds_count", tool="flaky_metrics_tool") == 1
@@ -0,0 +1,137 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from src import model_cache
+from src.shared_cache import SharedValueStore
+
+
+class CountingFetcher:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self) -> list[dict]:
+        self.calls += 1
+        return [{"name": f"model-v{self.calls}:latest"}]
+
+
+@pytest.mark.asyncio
+async def test_fresh_list_is_served_from_memory() -> None:
+    fetcher = CountingFetcher()
+    cache = model_cache.ModelListCache(fetcher, ttl=60, stale_ttl=60)
+
+    first = await cache.get_models()
+    second = await cache.get_models()
+
+    assert first == second == [{"name": "model-v1:latest"}]
+    assert fetcher.calls == 1
+    assert cache.etag is not None
+
+
+@pytest.mark.asyncio
+async def test_stale_list_is_served_while_revalidating() -> None:
+    fetcher = CountingFetcher()
+    cache = model_cache.ModelListCache(fetcher, ttl=0, stale_ttl=60)
+    await cache.get_models()
+    first_etag = cache.etag
+
+    stale = await cache.get_models()
+    assert stale == [{"name": "model-v1:latest"}]
+
+    await asyncio.sleep(0)  # let the background refresh run
+    assert fetcher.calls == 2
+    assert await cache.get_models() == [{"name": "model-v2:latest"}]
+    assert cache.etag != first_etag
+
+
+@pytest.mark.asyncio
+async def test_expired_list_is_fetched_synchronously() -> None:
+    fetcher = CountingFetcher()
+    cache = model_cache.ModelListCache(fetcher, ttl=0, stale_ttl=0)
+
+    await cache.get_models()
+    assert await cache.get_models() == [{"name": "model-v2:latest"}]
+
+    cache.invalidate()
+    assert cache.etag is None
+    assert await cache.get_models() == [{"name": "model-v3:latest"}]
+
+
+@pytest.mark.asyncio
+async def test_failed_background_refresh_keeps_stale_list() -> None:
+    calls = 0
+
+    async def flaky_fetcher() -> list[dict]:
+        nonlocal calls
+        calls += 1
+        if calls > 1:
+            msg = "ollama busy"
+            raise RuntimeError(msg)
+        return [{"name": "stable"}]
+
+    cache = model_cache.ModelListCache(flaky_fetcher, ttl=0, stale_ttl=60)
+    await cache.get_models()
+    assert await cache.get_models() == [{"name": "stable"}]
+    await asyncio.sleep(0)
+    assert await cache.get_models() == [{"name": "stable"}]
+
+
+@pytest.mark.asyncio
+async def test_is_known_model_matches_latest_tag_and_fails_open() -> None:
+    cache = model_cache.ModelListCache(CountingFetcher(), ttl=60)
+    assert await cache.is_known_model("model-v1")
+    assert await cache.is_known_model("model-v1:latest")
+    assert not await cache.is_known_model("other")
+
+    async def unreachable() -> list[dict]:
+        msg = "offline"
+        raise ConnectionError(msg)
+
+    offline_cache = model_cache.ModelListCache(unreachable)
+    assert await offline_cache.is_known_model("anything")
+
+
+@pytest.mark.asyncio
+async def test_unknown_model_refetches_the_list_at_most_once_per_interval() -> None:
+    fetcher = CountingFetcher()
+    cache = model_cache.ModelListCache(fetcher, ttl=60, miss_refresh_interval=0)
+    await cache.get_models()
+
+    # "model-v2" was pulled after the list was cached.
+    assert await cache.is_known_model("model-v2")
+    assert fetcher.calls == 2
+
+    fetcher = CountingFetcher()
+    throttled = model_cache.ModelListCache(fetcher, ttl=60, miss_refresh_interval=60)
+    await throttled.get_models()
+    assert not await throttled.is_known_model("model-v2")
+    assert not await throttled.is_known_model("missing")
+    assert fetcher.calls == 1
+
+
+def test_etag_matches_handles_lists_and_weak_tags() -> None:
+    assert model_cache.etag_matches('"a", W/"b"', '"b"')
+    assert model_cache.etag_matches("*", '"b"')
+    assert not model_cache.etag_matches('"a"', '"b"')
+    assert not model_cache.etag_matches(None, '"b"')
+
+
+@pytest.mark.asyncio
+async def test_workers_share_the_model_list(tmp_path: Path) -> None:
+    path = tmp_path / "shared.db"
+    fetcher_a, fetcher_b = CountingFetcher(), CountingFetcher()
+    worker_a = model_cache.ModelListCache(fetcher_a, ttl=60, stale_ttl=60, shared=SharedValueStore(path))
+    worker_b = model_cache.ModelListCache(fetcher_b, ttl=60, stale_ttl=60, shared=SharedValueStore(path))
+
+    assert await worker_a.get_models() == [{"name": "model-v1:latest"}]
+    assert await worker_b.get_models() == [{"name": "model-v1:latest"}]
+    assert (fetcher_a.calls, fetcher_b.calls) == (1, 0)
+    assert worker_a.etag == worker_b.etag
+
+    # A forced refresh in one worker is picked up by the other once its copy is stale.
+    fetcher_b.calls = 1
+    await worker_b.refresh(force=True)
+    worker_a._fetched_at -= 120
+    assert await worker_a.get_models() == [{"name": "model-v2:latest"}]
+    assert fetcher_a.calls == 1
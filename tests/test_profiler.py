@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from src import profiler, routes, server
+
+
+async def wait_for_ollama() -> None:
+    await asyncio.sleep(0.15)
+
+
+def burn_cpu(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def profiled_app(store: profiler.ProfileStore) -> tuple[profiler.SamplingProfiler, profiler.ProfilingMiddleware]:
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow() -> dict:
+        await asyncio.gather(wait_for_ollama(), wait_for_ollama())
+        burn_cpu(0.1)
+        return {"ok": True}
+
+    @app.get("/fast")
+    async def fast() -> dict:
+        return {"ok": True}
+
+    sampler = profiler.SamplingProfiler(store, threshold=0.03, interval=0.002)
+    return sampler, profiler.ProfilingMiddleware(app, sampler)
+
+
+@pytest.mark.asyncio
+async def test_slow_requests_are_sampled_while_running_and_waiting(tmp_path: Path) -> None:
+    store = profiler.ProfileStore(tmp_path, max_profiles=5)
+    sampler, app = profiled_app(store)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            assert (await client.get("/fast")).status_code == 200
+            assert (await client.get("/slow")).status_code == 200
+    finally:
+        sampler.stop()
+
+    [summary] = store.list()
+    assert summary["path"] == "/slow"
+    assert summary["status"] == 200
+    assert summary["samples"] > 0
+    folded = profiler.to_folded(store.get(summary["id"]))
+    stacks = [line.rsplit(" ", 1)[0] for line in folded.splitlines()]
+    # Both gathered child tasks are attributed to the request while they wait.
+    assert any(stack.startswith("waiting;") and "wait_for_ollama" in stack for stack in stacks)
+    assert any(stack.startswith("running;") and stack.split(";")[-1].startswith("burn_cpu") for stack in stacks)
+    assert sampler.get_stats()["profiled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_profiles_are_written_off_the_event_loop(tmp_path: Path) -> None:
+    writers: list[int] = []
+
+    class RecordingStore(profiler.ProfileStore):
+        def save(self, profile: dict) -> None:
+            writers.append(threading.get_ident())
+            super().save(profile)
+
+    store = RecordingStore(tmp_path)
+    sampler, app = profiled_app(store)
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            assert (await client.get("/slow")).status_code == 200
+    finally:
+        sampler.stop()
+
+    assert len(writers) == 1
+    assert writers[0] != threading.get_ident()
+    assert len(store.list()) == 1
+
+
+def test_profile_store_keeps_a_bounded_ring(tmp_path: Path) -> None:
+    store = profiler.ProfileStore(tmp_path, max_profiles=2)
+    for index in range(3):
+        store.save({"id": f"{1_700_000_000_000 + index:013d}-abcdef0{index}", "path": "/x", "stacks": {}})
+
+    assert [summary["id"] for summary in store.list()] == ["1700000000002-abcdef02", "1700000000001-abcdef01"]
+    with pytest.raises(profiler.ProfileNotFoundError):
+        store.get("1700000000000-abcdef00")
+    with pytest.raises(profiler.ProfileNotFoundError):
+        store.get("../sessions")
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoints_serve_folded_stacks(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    store = profiler.ProfileStore(tmp_path)
+    monkeypatch.setattr(routes, "profile_store", store)
+    store.save({
+        "id": "1700000000000-0123abcd",
+        "path": "/api/agent/chat",
+        "samples": 3,
+        "stacks": {"waiting;agent_node (src/agent/graph.py:1)": 2, "running;calculator (src/agent/tools.py:1)": 1},
+    })
+
+    async with AsyncClient(transport=ASGITransport(app=server.app), base_url="http://test") as client:
+        listing = (await client.get("/api/admin/profiles")).json()
+        folded = await client.get("/api/admin/profiles/1700000000000-0123abcd")
+        missing = await client.get("/api/admin/profiles/1700000000000-ffffffff")
+
+    assert listing["profiles"] == [{"id": "1700000000000-0123abcd", "path": "/api/agent/chat", "samples": 3}]
+    assert folded.headers["content-type"].startswith("text/plain")
+    assert folded.text == (
+        "running;calculator (src/agent/tools.py:1) 1\n"
+        "waiting;agent_node (src/agent/graph.py:1) 2\n"
+    )
+    assert missing.status_code == 404
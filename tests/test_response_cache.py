@@ -0,0 +1,93 @@
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+import pytest
+
+from src import response_cache
+
+
+def test_cache_key_is_canonical() -> None:
+    first = response_cache.make_cache_key(model="m", options={"temperature": 0, "seed": 1})
+    second = response_cache.make_cache_key(options={"seed": 1, "temperature": 0}, model="m")
+    assert first == second
+    assert first != response_cache.make_cache_key(model="m", options={"temperature": 0, "seed": 2})
+
+
+def test_only_repeatable_options_are_deterministic() -> None:
+    assert response_cache.is_deterministic({"temperature": 0})
+    assert response_cache.is_deterministic({"temperature": 0.7, "seed": 42})
+    assert not response_cache.is_deterministic({"temperature": 0.7})
+    assert not response_cache.is_deterministic(None)
+
+
+def test_lru_eviction_respects_byte_budget() -> None:
+    cache = response_cache.ResponseCache(max_bytes=10)
+    assert cache.put("a", [b"1234"])
+    assert cache.put("b", [b"1234"])
+    assert cache.get("a") == [b"1234"]  # "a" becomes most recently used
+    assert cache.put("c", [b"1234"])  # evicts "b"
+
+    assert cache.get("b") is None
+    assert cache.get("a") == [b"1234"]
+    assert not cache.put("huge", [b"x" * 11])
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] == 8
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_record_stores_only_complete_streams() -> None:
+    cache = response_cache.ResponseCache(max_bytes=1024)
+
+    async def stream(*chunks: bytes) -> AsyncIterator[bytes]:
+        for chunk in chunks:
+            yield chunk
+
+    # The final line is split across chunks, as it may be when relayed from Ollama.
+    complete = [b'{"message": {"content": "hi"}}\n{"do', b'ne": true}\n']
+    failed = [b'{"error": "Error: HTTP 500"}\n']
+
+    assert [line async for line in cache.record("ok", stream(*complete))] == complete
+    assert [line async for line in cache.record("bad", stream(*failed))] == failed
+
+    assert cache.get("ok") == complete
+    assert cache.get("bad") is None
+    assert [line async for line in response_cache.replay(complete)] == complete
+
+
+def test_sqlite_cache_is_shared_and_bounded(tmp_path: Path) -> None:
+    path = str(tmp_path / "shared.db")
+    worker_a = response_cache.SQLiteResponseCache(path, max_bytes=10)
+    worker_b = response_cache.SQLiteResponseCache(path, max_bytes=10)
+
+    assert worker_a.put("a", [b"12", b"34"])
+    assert worker_b.get("a") == [b"1234"]  # one worker's response is a hit in the other
+    assert worker_b.put("b", [b"1234"])
+    worker_a.get("a")  # "a" becomes most recently used
+    assert worker_a.put("c", [b"1234"])  # evicts "b"
+
+    assert worker_b.get("b") is None
+    assert not worker_b.put("huge", [b"x" * 11])
+    assert worker_a.get_stats()["entries"] == worker_b.get_stats()["entries"] == 2
+    assert worker_a.get_stats()["evictions"] == 1
+    worker_a.close()
+    worker_b.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_lookup_does_not_block_the_event_loop(tmp_path: Path) -> None:
+    cache = response_cache.SQLiteResponseCache(str(tmp_path / "shared.db"), max_bytes=10)
+    cache.put("a", [b"1234"])
+
+    cache._lock.acquire()  # as while another thread stores a response
+    lookup = asyncio.create_task(cache.lookup("a"))
+    await asyncio.sleep(0.01)  # the loop keeps running while the lookup waits
+    assert not lookup.done()
+    cache._lock.release()
+
+    assert await lookup == [b"1234"]
+    cache.close()
@@ -0,0 +1,151 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+import pytest
+
+from src import resumable
+
+
+async def chunks(*parts: bytes, gate: asyncio.Event | None = None) -> AsyncIterator[bytes]:
+    for index, part in enumerate(parts):
+        if gate is not None and index == 1:
+            await gate.wait()
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_events_are_numbered_per_line_across_chunk_boundaries() -> None:
+    manager = resumable.StreamManager(max_events=16, grace_period=60)
+    stream = manager.start(chunks(b'{"a": 1}\n{"b"', b': 2}\n', b'{"done": true}'))
+
+    events = [event async for event in manager.subscribe(stream)]
+    framed = [event async for event in manager.subscribe(stream, 1, sse=True)]
+
+    assert events == [b'{"a": 1}\n', b'{"b": 2}\n', b'{"done": true}\n']
+    assert framed == [b'id: 2\ndata: {"b": 2}\n\n', b'id: 3\ndata: {"done": true}\n\n']
+
+
+@pytest.mark.asyncio
+async def test_single_line_chunks_are_stored_without_copying() -> None:
+    manager = resumable.StreamManager(max_events=16, grace_period=60)
+    line = b'{"message": {"content": "Hi"}}\n'
+    stream = manager.start(chunks(line, b"\n"))
+    await stream.task
+
+    assert [event async for event in manager.subscribe(stream)] == [line]
+    assert stream._events[0] is line
+
+
+@pytest.mark.asyncio
+async def test_generation_continues_while_no_client_is_reading() -> None:
+    manager = resumable.StreamManager(max_events=16, grace_period=60)
+    gate = asyncio.Event()
+    stream = manager.start(chunks(b"one\n", b"two\n", b"three\n", gate=gate))
+
+    reader = manager.subscribe(stream)
+    assert await anext(reader) == b"one\n"
+    await reader.aclose()  # the client disconnects
+
+    gate.set()
+    await stream.task
+    assert stream.done
+    assert [event async for event in manager.subscribe(stream, 1)] == [b"two\n", b"three\n"]
+
+
+@pytest.mark.asyncio
+async def test_overwritten_events_cannot_be_resumed() -> None:
+    manager = resumable.StreamManager(max_events=2, grace_period=60)
+    stream = manager.start(chunks(b"1\n2\n3\n4\n"))
+    await stream.task
+
+    assert stream.can_resume_after(2)
+    assert not stream.can_resume_after(1)
+    with pytest.raises(resumable.StreamGapError):
+        await anext(manager.subscribe(stream, 1))
+
+
+@pytest.mark.asyncio
+async def test_truncated_streams_end_with_an_error_event() -> None:
+    manager = resumable.StreamManager(max_events=2, grace_period=60)
+    gate = asyncio.Event()
+    stream = manager.start(chunks(b"1\n", b"2\n3\n4\n5\n", gate=gate))
+
+    reader = manager.subscribe(stream, sse=True)
+    assert await anext(reader) == b"id: 1\ndata: 1\n\n"
+    gate.set()
+    await stream.task  # the reader falls behind the buffer
+
+    rest = [event async for event in reader]
+    assert len(rest) == 1
+    assert rest[0].startswith(b'data: {"type":"error"')
+    assert b"Events 2 to 3" in rest[0]
+
+    async def failing() -> AsyncIterator[bytes]:
+        yield b"partial\n"
+        msg = "upstream reset"
+        raise RuntimeError(msg)
+
+    failed = manager.start(failing())
+    events = [event async for event in manager.subscribe(failed)]
+    assert events[0] == b"partial\n"
+    assert events[1] == resumable.error_event("Stream failed: upstream reset")
+
+
+@pytest.mark.asyncio
+async def test_finished_streams_expire_after_the_grace_period() -> None:
+    manager = resumable.StreamManager(max_events=16, grace_period=0.01)
+    stream = manager.start(chunks(b"done\n"))
+    assert [event async for event in manager.subscribe(stream)] == [b"done\n"]
+
+    await asyncio.sleep(0.05)
+    with pytest.raises(resumable.StreamNotFoundError):
+        manager.get(stream.stream_id)
+    assert manager.get_stats()["streams"] == 0
+
+
+@pytest.mark.asyncio
+async def test_abandoned_streams_are_cancelled_unless_resumed_in_time() -> None:
+    manager = resumable.StreamManager(max_events=16, grace_period=60, cancel_after=0.05)
+
+    async def endless() -> AsyncIterator[bytes]:
+        while True:
+            yield b"token\n"
+            await asyncio.sleep(0.005)
+
+    resumed = manager.start(endless())
+    abandoned = manager.start(endless())
+    for stream in (resumed, abandoned):
+        reader = manager.subscribe(stream)
+        await anext(reader)
+        await reader.aclose()
+
+    reader = manager.subscribe(resumed, 1)  # the client comes back in time
+    await anext(reader)
+    await asyncio.sleep(0.1)
+
+    assert abandoned.task.cancelled()
+    assert abandoned.done
+    assert not resumed.done
+    assert manager.get_stats()["cancelled"] == 1
+    await reader.aclose()
+    resumed.task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_for_streams_and_cancels_the_rest() -> None:
+    manager = resumable.StreamManager(max_events=16, grace_period=60, cancel_after=60)
+    gate = asyncio.Event()
+
+    async def endless() -> AsyncIterator[bytes]:
+        while True:
+            yield b"token\n"
+            await asyncio.sleep(0.005)
+
+    finishing = manager.start(chunks(b"a\n", b"b\n", gate=gate))
+    stuck = manager.start(endless())
+    asyncio.get_running_loop().call_later(0.02, gate.set)
+
+    assert await manager.drain(timeout=0.1) == 1
+    assert finishing.done
+    assert not finishing.task.cancelled()
+    assert stuck.task.cancelled()
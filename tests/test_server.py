@@ -1,4 +1,7 @@
+import asyncio
 import json
+import subprocess
+import sys
 from collections.abc import AsyncIterator
 from typing import Any
 
@@ -7,13 +10,22 @@ import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 
-from src import routes, server, streaming
+from src import admission, model_cache, response_cache, resumable, routes, server, sessions, streaming
+from src.agent import tool_cache, tool_executor
 from src.config import OLLAMA_API_BASE, OLLAMA_TAGS_URL
 
 
 @pytest_asyncio.fixture
-async def async_client() -> AsyncIterator[AsyncClient]:
+async def async_client(monkeypatch: pytest.MonkeyPatch) -> AsyncIterator[AsyncClient]:
     """Provide an httpx client bound to the FastAPI ASGI app."""
+    async def fetch_known_models() -> list[dict[str, str]]:
+        return [{"name": "test-model"}]
+
+    monkeypatch.setattr(routes, "model_list_cache", model_cache.ModelListCache(fetch_known_models))
+    monkeypatch.setattr(routes, "admission_controller", admission.AdmissionController())
+    monkeypatch.setattr(routes, "session_store", sessions.MemorySessionStore())
+    monkeypatch.setattr(routes, "stream_manager", resumable.StreamManager())
+    monkeypatch.setattr(tool_executor, "tool_result_cache", tool_cache.ToolResultCache())
     transport = ASGITransport(app=server.app)
     async with AsyncClient(transport=transport, base_url="http://testserver") as client:
         yield client
@@ -49,23 +61,22 @@ async def test_list_models_success(
         def __init__(self, *args: Any, **kwargs: Any) -> None:
             pass
 
-        async def __aenter__(self) -> "DummyAsyncClient":
-            return self
-
-        async def __aexit__(self, exc_type, exc, tb) -> None:
-            return None
-
-        async def get(self, url: str) -> DummyResponse:
+        async def get(self, url: str, **kwargs: Any) -> DummyResponse:
             assert url == OLLAMA_TAGS_URL
             return DummyResponse(models_payload)
 
-    monkeypatch.setattr(routes.httpx, "AsyncClient", DummyAsyncClient)
+    monkeypatch.setattr(model_cache, "get_http_client", DummyAsyncClient)
+    monkeypatch.setattr(routes, "model_list_cache", model_cache.ModelListCache(model_cache.fetch_models))
 
     response = await async_client.get("/api/models")
 
     assert response.status_code == 200
     assert response.json() == {"models": models_payload["models"]}
 
+    cached = await async_client.get("/api/models", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == response.headers["ETag"]
+
 
 @pytest.mark.asyncio
 async def test_list_models_failure(
@@ -78,16 +89,11 @@ async def test_list_models_failure(
         def __init__(self, *args: Any, **kwargs: Any) -> None:
             pass
 
-        async def __aenter__(self) -> "FailingAsyncClient":
-            return self
-
-        async def __aexit__(self, exc_type, exc, tb) -> None:
-            return None
-
-        async def get(self, url: str) -> None:
+        async def get(self, url: str, **kwargs: Any) -> None:
             raise httpx.ConnectError("boom", request=request)
 
-    monkeypatch.setattr(routes.httpx, "AsyncClient", FailingAsyncClient)
+    monkeypatch.setattr(model_cache, "get_http_client", FailingAsyncClient)
+    monkeypatch.setattr(routes, "model_list_cache", model_cache.ModelListCache(model_cache.fetch_models))
 
     response = await async_client.get("/api/models")
 
@@ -102,10 +108,9 @@ async def test_chat_endpoint_streams_response(
     monkeypatch: pytest.MonkeyPatch,
     async_client: AsyncClient,
 ) -> None:
-    chunks = [
-        json.dumps({"message": {"content": "Hello"}}),
-        json.dumps({"done": True}),
-    ]
+    body = (json.dumps({"message": {"content": "Hello"}}) + "\n" + json.dumps({"done": True}) + "\n").encode()
+    # Chunk boundaries do not line up with NDJSON lines; they must be relayed as-is.
+    chunks = [body[:7], body[7:30], body[30:]]
 
     class DummyStreamResponse:
         async def __aenter__(self) -> "DummyStreamResponse":
@@ -117,7 +122,7 @@ async def test_chat_endpoint_streams_response(
         def raise_for_status(self) -> None:
             return None
 
-        async def aiter_lines(self) -> AsyncIterator[str]:
+        async def aiter_bytes(self) -> AsyncIterator[bytes]:
             for entry in chunks:
                 yield entry
 
@@ -125,19 +130,14 @@ async def test_chat_endpoint_streams_response(
         def __init__(self, *args: Any, **kwargs: Any) -> None:
             pass
 
-        async def __aenter__(self) -> "StreamingAsyncClient":
-            return self
-
-        async def __aexit__(self, exc_type, exc, tb) -> None:
-            return None
-
-        def stream(self, method: str, url: str, json: dict[str, Any]) -> DummyStreamResponse:
+        def stream(self, method: str, url: str, json: dict[str, Any], **kwargs: Any) -> DummyStreamResponse:
             assert method == "POST"
             assert url == OLLAMA_API_BASE
             assert json["model"] == "test-model"
+            assert "keep_alive" in json
             return DummyStreamResponse()
 
-    monkeypatch.setattr(streaming.httpx, "AsyncClient", StreamingAsyncClient)
+    monkeypatch.setattr(streaming, "get_http_client", StreamingAsyncClient)
 
     payload = {"model": "test-model", "messages": [], "stream": True}
 
@@ -153,6 +153,202 @@ async def test_chat_endpoint_streams_response(
     ]
 
 
+@pytest.mark.asyncio
+async def test_chat_endpoint_puts_a_mid_line_failure_on_its_own_line(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    class BrokenStreamResponse:
+        async def __aenter__(self) -> "BrokenStreamResponse":
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb) -> None:
+            return None
+
+        def raise_for_status(self) -> None:
+            return None
+
+        async def aiter_bytes(self) -> AsyncIterator[bytes]:
+            yield b'{"message": {"content": "Hel'
+            msg = "connection reset"
+            raise httpx.ReadError(msg)
+
+    class BrokenStreamingClient:
+        def stream(self, method: str, url: str, json: dict[str, Any], **kwargs: Any) -> BrokenStreamResponse:
+            return BrokenStreamResponse()
+
+    monkeypatch.setattr(streaming, "get_http_client", BrokenStreamingClient)
+
+    response = await async_client.post("/api/chat", json={"model": "test-model", "messages": [], "stream": True})
+    lines = [line async for line in response.aiter_lines()]
+
+    assert lines[0] == '{"message": {"content": "Hel'
+    assert json.loads(lines[-1]) == {"error": "An unexpected error occurred: connection reset"}
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoints_reject_unknown_model(async_client: AsyncClient) -> None:
+    chat = await async_client.post("/api/chat", json={"model": "missing-model", "messages": []})
+    agent = await async_client.post(
+        "/api/agent/chat",
+        json={"model": "missing-model", "messages": [{"role": "user", "content": "Hi"}]},
+    )
+
+    assert chat.status_code == 404
+    assert agent.status_code == 404
+    assert "ollama pull missing-model" in chat.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoint_returns_429_when_queue_is_full(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(routes, "admission_controller", controller)
+    await controller.acquire("test-model")  # occupy the only slot
+
+    response = await async_client.post("/api/chat", json={"model": "test-model", "messages": []})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert controller.get_stats()["models"]["test-model"]["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_chat_endpoint_replays_cached_deterministic_response(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    upstream_calls = 0
+
+    async def fake_stream(request_data: dict[str, Any], **options: Any) -> AsyncIterator[bytes]:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        yield b'{"message": {"content": "Hi"}}\n'
+        yield b'{"done": true}\n'
+
+    monkeypatch.setattr(routes, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(routes, "response_cache", response_cache.ResponseCache(max_bytes=1024))
+    monkeypatch.setattr(routes, "ollama_stream_generator", fake_stream)
+
+    deterministic = {"model": "test-model", "messages": [], "options": {"temperature": 0}}
+    first = await async_client.post("/api/chat", json=deterministic)
+    second = await async_client.post("/api/chat", json=deterministic)
+    sampled = await async_client.post("/api/chat", json={"model": "test-model", "messages": []})
+    bypassed = await async_client.post("/api/chat", json=deterministic, headers={"X-Response-Cache": "bypass"})
+
+    assert second.text == first.text
+    assert second.headers["X-Cache"] == "HIT"
+    assert "X-Cache" not in sampled.headers
+    assert "X-Cache" not in bypassed.headers
+    assert upstream_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_response_cache_keeps_streaming_and_non_streaming_bodies_apart(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    async def fake_stream(request_data: dict[str, Any], **options: Any) -> AsyncIterator[bytes]:
+        if request_data["stream"]:
+            yield b'{"message": {"content": "Hi"}, "done": false}\n'
+        yield b'{"message": {"content": "Hi"}, "done": true}\n'
+
+    monkeypatch.setattr(routes, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(routes, "response_cache", response_cache.ResponseCache(max_bytes=1024))
+    monkeypatch.setattr(routes, "ollama_stream_generator", fake_stream)
+
+    streamed = {"model": "test-model", "messages": [], "options": {"temperature": 0}, "stream": True}
+    whole = {**streamed, "stream": False}
+    first_streamed = await async_client.post("/api/chat", json=streamed)
+    first_whole = await async_client.post("/api/chat", json=whole)
+    second_whole = await async_client.post("/api/chat", json=whole)
+
+    assert "X-Cache" not in first_whole.headers
+    assert len(first_streamed.text.splitlines()) == 2
+    assert second_whole.headers["X-Cache"] == "HIT"
+    assert second_whole.text == first_whole.text
+    assert len(second_whole.text.splitlines()) == 1
+
+
+@pytest.mark.asyncio
+async def test_admin_model_load_and_unload(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    actions: list[tuple[str, str]] = []
+
+    async def fake_load(model_name: str) -> None:
+        actions.append(("load", model_name))
+
+    async def failing_unload(model_name: str) -> None:
+        msg = "ollama offline"
+        raise RuntimeError(msg)
+
+    monkeypatch.setattr(routes, "load_model", fake_load)
+    monkeypatch.setattr(routes, "unload_model", failing_unload)
+
+    loaded = await async_client.post("/api/admin/models/load", json={"model": "qwen3:8b"})
+    unloaded = await async_client.post("/api/admin/models/unload", json={"model": "qwen3:8b"})
+
+    assert loaded.json() == {"model": "qwen3:8b", "status": "loaded"}
+    assert actions == [("load", "qwen3:8b")]
+    assert unloaded.status_code == 502
+    assert "ollama offline" in unloaded.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_session_flow_sends_only_new_messages(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    seen_histories: list[list[str]] = []
+
+    class EchoLLM:
+        async def astream(self, messages: list[Any]) -> AsyncIterator[Any]:
+            seen_histories.append([message.content for message in messages])
+            yield type("Chunk", (), {"content": f"reply {len(seen_histories)}"})
+
+    monkeypatch.setattr(streaming, "get_simple_llm", lambda model_name, **options: EchoLLM())
+
+    created = await async_client.post("/api/sessions", json={"model": "test-model"})
+    session_id = created.json()["session_id"]
+
+    for text in ("first", "second"):
+        response = await async_client.post(
+            f"/api/sessions/{session_id}/messages",
+            json={"content": text, "tool_choice": "none"},
+        )
+        assert json.loads(response.text.splitlines()[-1])["type"] == "done"
+
+    assert seen_histories == [["first"], ["first", "reply 1", "second"]]
+
+    history = await async_client.get(f"/api/sessions/{session_id}")
+    assert [message["role"] for message in history.json()["messages"]] == ["user", "assistant"] * 2
+
+    assert (await async_client.delete(f"/api/sessions/{session_id}")).status_code == 200
+    missing = await async_client.post(f"/api/sessions/{session_id}/messages", json={"content": "hi"})
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_rejected_session_message_is_not_stored(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    controller = admission.AdmissionController(max_concurrent=1, max_queue=0)
+    monkeypatch.setattr(routes, "admission_controller", controller)
+    session_id = (await async_client.post("/api/sessions", json={"model": "test-model"})).json()["session_id"]
+    await controller.acquire("test-model")  # occupy the only slot
+
+    rejected = await async_client.post(f"/api/sessions/{session_id}/messages", json={"content": "hi"})
+
+    assert rejected.status_code == 429
+    history = await async_client.get(f"/api/sessions/{session_id}")
+    assert history.json()["messages"] == []
+
+
 @pytest.mark.asyncio
 async def test_agent_endpoint_simple_mode(
     monkeypatch: pytest.MonkeyPatch,
@@ -164,12 +360,13 @@ async def test_agent_endpoint_simple_mode(
         def __init__(self) -> None:
             self.invocations: list[list[dict[str, str]]] = []
 
-        def invoke(self, messages: list[Any]) -> Any:
+        async def astream(self, messages: list[Any]) -> AsyncIterator[Any]:
             self.invocations.append(messages)
-            return type("Response", (), {"content": "Simple reply"})
+            for token in ("Simple", " reply"):
+                yield type("Chunk", (), {"content": token})
 
     dummy_llm = DummyLLM()
-    monkeypatch.setattr(streaming, "create_simple_llm", lambda model_name: dummy_llm)
+    monkeypatch.setattr(streaming, "get_simple_llm", lambda model_name, **options: dummy_llm)
 
     response = await async_client.post(
         "/api/agent/chat",
@@ -186,6 +383,8 @@ async def test_agent_endpoint_simple_mode(
             received.append(json.loads(line))
 
     assert any(entry.get("type") == "status" for entry in received)
+    deltas = [entry["content"] for entry in received if entry["type"] == "message_delta"]
+    assert deltas == ["Simple", " reply"]
     assert {"type": "message", "content": "Simple reply"} in received
     assert received[-1]["type"] == "done"
 
@@ -203,8 +402,9 @@ async def test_agent_endpoint_tool_flow(
             self.tool_calls = tool_calls or []
 
     class DummyAgent:
-        async def astream(self, initial_state: dict) -> AsyncIterator[dict]:
-            yield {
+        async def astream(self, initial_state: dict, stream_mode: list[str]) -> AsyncIterator[tuple[str, Any]]:
+            assert stream_mode == ["messages", "updates"]
+            yield "updates", {
                 "agent": {
                     "messages": [
                         DummyMessage(
@@ -215,28 +415,28 @@ async def test_agent_endpoint_tool_flow(
                     ]
                 }
             }
-            yield {
+            yield "updates", {
                 "tools": {
                     "tool_results": [
                         {"tool": "calculator", "result": "4"},
                     ]
                 }
             }
-            yield {
+            yield "messages", (DummyMessage(content="All "), {"langgraph_node": "agent"})
+            yield "messages", (DummyMessage(content="done"), {"langgraph_node": "agent"})
+            yield "messages", (DummyMessage(content="4"), {"langgraph_node": "tools"})
+            yield "updates", {
                 "agent": {
                     "messages": [
                         DummyMessage(content="All done")
                     ]
                 }
             }
-        def invoke(self, initial_state: dict) -> dict:
-            return {
-                "messages": [
-                    DummyMessage(content="All done"),
-                ]
-            }
+        def invoke(self, initial_state: dict) -> dict:  # pragma: no cover - must not run
+            msg = "agent graph must only be executed once per request"
+            raise AssertionError(msg)
 
-    monkeypatch.setattr(streaming, "create_agent_graph", lambda model_name: DummyAgent())
+    monkeypatch.setattr(streaming, "get_agent_graph", lambda model_name, **options: DummyAgent())
 
     response = await async_client.post(
         "/api/agent/chat",
@@ -256,10 +456,176 @@ async def test_agent_endpoint_tool_flow(
     assert {"type": "status", "content": "Agent mode activated"} in events
     assert {"type": "tool_call", "tool": "calculator", "args": {"expression": "2+2"}} in events
     assert {"type": "tool_result", "tool": "calculator", "result": "4"} in events
+    assert [e["content"] for e in events if e["type"] == "message_delta"] == ["All ", "done"]
     assert {"type": "message", "content": "All done"} in events
     assert events[-1]["type"] == "done"
 
 
+@pytest.mark.asyncio
+async def test_agent_deltas_of_each_turn_start_a_new_message(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    from langchain_core.messages import AIMessage, AIMessageChunk
+
+    monkeypatch.setattr(streaming, "ENABLE_AGENT_MODE", True)
+    tool_call = {"id": "tool-1", "name": "calculator", "args": {"expression": "2+2"}}
+
+    class DummyAgent:
+        async def astream(self, initial_state: dict, stream_mode: list[str]) -> AsyncIterator[tuple[str, Any]]:
+            for token in ("Let me ", "calculate."):
+                yield "messages", (AIMessageChunk(content=token, id="run-1"), {"langgraph_node": "agent"})
+            yield "updates", {"agent": {"messages": [AIMessage(content="Let me calculate.", tool_calls=[tool_call])]}}
+            yield "updates", {"tools": {"tool_results": [{"tool": "calculator", "result": "4"}]}}
+            for token in ("It is ", "4."):
+                yield "messages", (AIMessageChunk(content=token, id="run-2"), {"langgraph_node": "agent"})
+            yield "updates", {"agent": {"messages": [AIMessage(content="It is 4.")]}}
+
+    monkeypatch.setattr(streaming, "get_agent_graph", lambda model_name, **options: DummyAgent())
+
+    response = await async_client.post(
+        "/api/agent/chat",
+        json={
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "What is 2+2?"}],
+            "tool_choice": "auto",
+            "stream": True,
+        },
+    )
+    events = [json.loads(line) async for line in response.aiter_lines() if line]
+
+    # Rebuild the answer the way a client does, starting over at each message.
+    messages: list[str] = []
+    for event in events:
+        if event["type"] == "message_start":
+            messages.append("")
+        elif event["type"] == "message_delta":
+            messages[-1] += event["content"]
+
+    assert messages == ["Let me calculate.", "It is 4."]
+    assert {"type": "message", "content": messages[-1]} in events
+
+
+@pytest.mark.asyncio
+async def test_agent_endpoint_runs_each_node_once(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    from langchain_core.messages import AIMessage
+
+    from src.agent import graph as agent_graph
+    from src.agent import registry
+    from src.agent.tools import calculator
+
+    monkeypatch.setattr(streaming, "ENABLE_AGENT_MODE", True)
+
+    class CountingLLM:
+        calls = 0
+
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            pass
+
+        def bind_tools(self, tools: list) -> "CountingLLM":
+            return self
+
+        async def ainvoke(self, messages: list[Any]) -> AIMessage:
+            CountingLLM.calls += 1
+            if CountingLLM.calls == 1:
+                return AIMessage(
+                    content="",
+                    tool_calls=[{"id": "tool-1", "name": "calculator", "args": {"expression": "2+2"}}],
+                )
+            return AIMessage(content="Four")
+
+    tool_runs: list[str] = []
+
+    def counting_calculator(expression: str) -> str:
+        tool_runs.append(expression)
+        return calculator.func(expression)
+
+    counted_tool = calculator.model_copy(update={"func": counting_calculator})
+
+    monkeypatch.setattr(agent_graph, "ChatOllama", CountingLLM)
+    monkeypatch.setattr(agent_graph, "get_tools", lambda: [counted_tool])
+    registry.invalidate_model()
+
+    response = await async_client.post(
+        "/api/agent/chat",
+        json={
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "What is 2+2?"}],
+            "tool_choice": "auto",
+            "stream": True,
+        },
+    )
+
+    events = []
+    async for line in response.aiter_lines():
+        if line:
+            events.append(json.loads(line))
+
+    assert CountingLLM.calls == 2
+    assert tool_runs == ["2+2"]
+    assert {"type": "message_delta", "content": "Four"} in events
+    assert {"type": "message", "content": "Four"} in events
+    assert events[-1]["type"] == "done"
+    registry.invalidate_model()
+
+
+@pytest.mark.asyncio
+async def test_parallel_agent_requests_overlap(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    import asyncio
+
+    from langchain_core.messages import AIMessage
+
+    from src.agent import graph as agent_graph
+    from src.agent import registry
+
+    monkeypatch.setattr(streaming, "ENABLE_AGENT_MODE", True)
+    parallel_requests = 4
+    in_flight = 0
+    peak_in_flight = 0
+
+    class SlowLLM:
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            pass
+
+        def bind_tools(self, tools: list) -> "SlowLLM":
+            return self
+
+        async def ainvoke(self, messages: list[Any]) -> AIMessage:
+            nonlocal in_flight, peak_in_flight
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return AIMessage(content="ok")
+
+    monkeypatch.setattr(agent_graph, "ChatOllama", SlowLLM)
+    monkeypatch.setattr(routes, "admission_controller", admission.AdmissionController(max_concurrent=parallel_requests))
+    registry.invalidate_model()
+
+    async def run_request() -> list[dict]:
+        response = await async_client.post(
+            "/api/agent/chat",
+            json={
+                "model": "test-model",
+                "messages": [{"role": "user", "content": "Hi"}],
+                "tool_choice": "auto",
+            },
+        )
+        return [json.loads(line) for line in response.text.splitlines() if line]
+
+    results = await asyncio.gather(*(run_request() for _ in range(parallel_requests)))
+
+    assert peak_in_flight == parallel_requests
+    assert all(events[-1]["type"] == "done" for events in results)
+    registry.invalidate_model()
+
+
 @pytest.mark.asyncio
 async def test_agent_endpoint_disabled_mode_falls_back_to_simple(
     monkeypatch: pytest.MonkeyPatch,
@@ -268,10 +634,10 @@ async def test_agent_endpoint_disabled_mode_falls_back_to_simple(
     monkeypatch.setattr(streaming, "ENABLE_AGENT_MODE", False)
 
     class DummyLLM:
-        def invoke(self, messages: list[Any]) -> Any:
-            return type("Response", (), {"content": "Fallback reply"})
+        async def astream(self, messages: list[Any]) -> AsyncIterator[Any]:
+            yield type("Chunk", (), {"content": "Fallback reply"})
 
-    monkeypatch.setattr(streaming, "create_simple_llm", lambda model_name: DummyLLM())
+    monkeypatch.setattr(streaming, "get_simple_llm", lambda model_name, **options: DummyLLM())
 
     response = await async_client.post(
         "/api/agent/chat",
@@ -308,10 +674,10 @@ async def test_agent_endpoint_stream_handles_agent_exception(
             raise RuntimeError("boom")
 
     class ExplodingAgent:
-        def astream(self, initial_state: dict) -> ExplodingIterator:
+        def astream(self, initial_state: dict, **kwargs: Any) -> ExplodingIterator:
             return ExplodingIterator()
 
-    monkeypatch.setattr(streaming, "create_agent_graph", lambda model_name: ExplodingAgent())
+    monkeypatch.setattr(streaming, "get_agent_graph", lambda model_name, **options: ExplodingAgent())
 
     response = await async_client.post(
         "/api/agent/chat",
@@ -350,16 +716,10 @@ async def test_chat_endpoint_handles_connect_error(
         def __init__(self, *args: Any, **kwargs: Any) -> None:
             pass
 
-        async def __aenter__(self) -> "FailingStreamingClient":
-            return self
-
-        async def __aexit__(self, exc_type, exc, tb) -> None:
-            return None
-
-        def stream(self, method: str, url: str, json: dict[str, Any]) -> FailingStreamResponse:
+        def stream(self, method: str, url: str, json: dict[str, Any], **kwargs: Any) -> FailingStreamResponse:
             return FailingStreamResponse()
 
-    monkeypatch.setattr(streaming.httpx, "AsyncClient", FailingStreamingClient)
+    monkeypatch.setattr(streaming, "get_http_client", FailingStreamingClient)
 
     response = await async_client.post(
         "/api/chat",
@@ -374,3 +734,212 @@ async def test_chat_endpoint_handles_connect_error(
     assert errors == [
         {"error": f"Error: Could not connect to Ollama at {OLLAMA_API_BASE}"},
     ]
+
+
+@pytest.mark.asyncio
+async def test_dropped_stream_resumes_from_last_event_id(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    upstream_calls = 0
+
+    async def fake_stream(request_data: dict[str, Any], **options: Any) -> AsyncIterator[bytes]:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        for word in ("Hel", "lo", "!"):
+            yield json.dumps({"message": {"content": word}}).encode() + b"\n"
+        yield b'{"done": true}\n'
+
+    monkeypatch.setattr(routes, "ollama_stream_generator", fake_stream)
+
+    first_line = None
+    async with async_client.stream("POST", "/api/chat", json={"model": "test-model", "messages": []}) as response:
+        stream_id = response.headers["X-Stream-ID"]
+        async for line in response.aiter_lines():
+            first_line = json.loads(line)
+            break  # the connection drops after the first event
+
+    resumed = await async_client.get(f"/api/streams/{stream_id}", headers={"Last-Event-ID": "1"})
+    sse = await async_client.get(
+        f"/api/streams/{stream_id}",
+        headers={"Last-Event-ID": "3", "Accept": "text/event-stream"},
+    )
+    missing = await async_client.get("/api/streams/unknown")
+
+    assert first_line == {"message": {"content": "Hel"}}
+    assert [json.loads(line) for line in resumed.text.splitlines()] == [
+        {"message": {"content": "lo"}},
+        {"message": {"content": "!"}},
+        {"done": True},
+    ]
+    assert sse.headers["content-type"].startswith("text/event-stream")
+    assert sse.text == 'id: 4\ndata: {"done": true}\n\n'
+    assert missing.status_code == 404
+    assert upstream_calls == 1
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_closes_upstream_stream(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    upstream_closed = asyncio.Event()
+
+    class EndlessOllamaStream(httpx.AsyncByteStream):
+        async def __aiter__(self) -> AsyncIterator[bytes]:
+            while True:
+                yield b'{"message": {"content": "token"}, "done": false}\n'
+                await asyncio.sleep(0.01)
+
+        async def aclose(self) -> None:
+            upstream_closed.set()
+
+    fake_ollama = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, stream=EndlessOllamaStream()))
+    )
+    manager = resumable.StreamManager(cancel_after=0)
+    monkeypatch.setattr(streaming, "get_http_client", lambda: fake_ollama)
+    monkeypatch.setattr(routes, "stream_manager", manager)
+
+    body = json.dumps({"model": "test-model", "messages": []}).encode()
+    first_chunk_sent = asyncio.Event()
+    request_sent = False
+
+    async def receive() -> dict[str, Any]:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await first_chunk_sent.wait()
+        return {"type": "http.disconnect"}  # the browser tab closes mid-answer
+
+    async def send(message: dict[str, Any]) -> None:
+        if message["type"] == "http.response.body" and message.get("body"):
+            first_chunk_sent.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat",
+        "raw_path": b"/api/chat",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"testserver"), (b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+    await asyncio.wait_for(server.app(scope, receive, send), timeout=2)
+    await asyncio.wait_for(upstream_closed.wait(), timeout=1)
+
+    assert manager.get_stats()["cancelled"] == 1
+    assert routes.admission_controller.get_stats()["models"]["test-model"]["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_reports_chat_latency_and_speed(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    class FinalChunkResponse:
+        async def __aenter__(self) -> "FinalChunkResponse":
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb) -> None:
+            return None
+
+        def raise_for_status(self) -> None:
+            return None
+
+        async def aiter_bytes(self) -> AsyncIterator[bytes]:
+            yield b'{"message": {"content": "Hi"}, "done": false}\n{"done": true, "eval_'
+            yield b'count": 40, "eval_duration": 1000000000}\n'
+
+    class FakeOllama:
+        def stream(self, method: str, url: str, json: dict[str, Any], **kwargs: Any) -> FinalChunkResponse:
+            return FinalChunkResponse()
+
+    monkeypatch.setattr(streaming, "get_http_client", FakeOllama)
+    await async_client.post("/api/chat", json={"model": "test-model", "messages": []})
+
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'chat_time_to_first_token_seconds_count{model="test-model",route="chat"}' in body
+    assert 'chat_request_duration_seconds_count{model="test-model",route="chat"}' in body
+    assert 'chat_generation_tokens_per_second_sum{model="test-model",route="chat"}' in body
+    assert 'chat_streams_in_flight{route="chat"} 0.0' in body
+
+
+@pytest.mark.asyncio
+async def test_timing_header_appends_span_tree(
+    monkeypatch: pytest.MonkeyPatch,
+    async_client: AsyncClient,
+) -> None:
+    class FinalChunkResponse:
+        async def __aenter__(self) -> "FinalChunkResponse":
+            return self
+
+        async def __aexit__(self, exc_type, exc, tb) -> None:
+            return None
+
+        def raise_for_status(self) -> None:
+            return None
+
+        async def aiter_bytes(self) -> AsyncIterator[bytes]:
+            yield b'{"message": {"content": "Hi"}, "done": false}\n'
+            yield b'{"done": true, "prompt_eval_duration": 5000000, "eval_duration": 20000000, "eval_count": 4}\n'
+
+    class FakeOllama:
+        def stream(self, method: str, url: str, json: dict[str, Any], **kwargs: Any) -> FinalChunkResponse:
+            return FinalChunkResponse()
+
+    class Chunk:
+        def __init__(self, content: str, response_metadata: dict[str, Any]) -> None:
+            self.content = content
+            self.response_metadata = response_metadata
+
+    class StreamingLLM:
+        async def astream(self, messages: list[Any]) -> AsyncIterator[Chunk]:
+            yield Chunk("Hello", {})
+            yield Chunk("", {"eval_duration": 3000000, "eval_count": 2})
+
+    monkeypatch.setattr(streaming, "get_http_client", FakeOllama)
+    monkeypatch.setattr(streaming, "get_simple_llm", lambda model_name, **options: StreamingLLM())
+
+    chat = await async_client.post(
+        "/api/chat", json={"model": "test-model", "messages": []}, headers={"X-Timing": "true"}
+    )
+    agent = await async_client.post(
+        "/api/agent/chat",
+        json={"model": "test-model", "messages": [{"role": "user", "content": "hi"}], "tool_choice": "none"},
+        headers={"X-Timing": "true"},
+    )
+    untimed = await async_client.post("/api/chat", json={"model": "test-model", "messages": []})
+
+    chat_timing = json.loads(chat.text.splitlines()[-1])
+    assert chat_timing["type"] == "timing"
+    upstream, stream = chat_timing["spans"]["children"]
+    assert upstream["name"] == "upstream_connect"
+    assert stream["attrs"] == {"prefill_ms": 5.0, "generate_ms": 20.0, "eval_count": 4}
+
+    agent_events = [json.loads(line) for line in agent.text.splitlines()]
+    assert [event["type"] for event in agent_events[-2:]] == ["timing", "done"]
+    spans = agent_events[-2]["spans"]
+    assert [child["name"] for child in spans["children"]] == ["context", "llm"]
+    assert spans["children"][1]["attrs"] == {"generate_ms": 3.0, "eval_count": 2}
+    assert "serialize_ms" in spans["attrs"]
+
+    assert "timing" not in untimed.text
+
+
+def test_server_import_leaves_the_agent_stack_unloaded() -> None:
+    code = (
+        "import sys, src.server; "
+        "print(sorted({m.split('.')[0] for m in sys.modules} & {'langchain_core', 'langgraph', 'jinja2'}))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import pytest
+
+from src import sessions
+
+
+@pytest.mark.asyncio
+async def test_memory_store_round_trip_and_lru_eviction() -> None:
+    store = sessions.MemorySessionStore(max_sessions=2)
+    first = await store.create("m")
+    second = await store.create("m")
+
+    await store.append(first.session_id, "user", "hello")
+    await store.get(first.session_id)  # "first" becomes most recently used
+    await store.create("m")  # evicts "second"
+
+    assert (await store.get(first.session_id)).messages == [{"role": "user", "content": "hello"}]
+    with pytest.raises(sessions.SessionNotFoundError):
+        await store.get(second.session_id)
+
+
+@pytest.mark.asyncio
+async def test_sqlite_store_persists_history(tmp_path: Path) -> None:
+    path = tmp_path / "sessions.db"
+    store = sessions.SQLiteSessionStore(path)
+    session = await store.create("qwen3:8b")
+    await store.append(session.session_id, "user", "hi")
+    await store.append(session.session_id, "assistant", "hello!")
+    store.close()
+
+    reopened = sessions.SQLiteSessionStore(path)
+    loaded = await reopened.get(session.session_id)
+    assert loaded.model == "qwen3:8b"
+    assert loaded.messages == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello!"},
+    ]
+
+    await reopened.delete(session.session_id)
+    with pytest.raises(sessions.SessionNotFoundError):
+        await reopened.append(session.session_id, "user", "again")
+    with pytest.raises(sessions.SessionNotFoundError):
+        await reopened.delete(session.session_id)
+    reopened.close()
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src import timing
+from src.agent import graph as agent_graph
+from src.agent.tools import calculator
+
+
+def test_spans_are_no_ops_without_an_active_timeline() -> None:
+    with timing.span("ignored") as span:
+        span.set(extra=1)
+        span.set_llm_stats({"eval_duration": 1})
+    assert timing.record_span("ignored", 0.0) is not None
+
+
+@pytest.mark.asyncio
+async def test_spans_nest_across_concurrent_tasks() -> None:
+    timeline = timing.Timeline("request", model="m")
+    timeline.activate()
+
+    async def tool(name: str) -> None:
+        with timing.span(f"tool:{name}"):
+            await asyncio.sleep(0.01)
+
+    with timing.span("node:tools"):
+        await asyncio.gather(tool("a"), tool("b"))
+    with timing.span("llm") as llm:
+        llm.set_llm_stats({"prompt_eval_duration": 120_000_000, "eval_duration": 2_500_000_000, "eval_count": 50})
+
+    tree = timeline.finish()
+
+    assert tree["name"] == "request"
+    assert tree["attrs"] == {"model": "m"}
+    tools, llm_node = tree["children"]
+    assert [child["name"] for child in tools["children"]] == ["tool:a", "tool:b"]
+    assert all(child["duration_ms"] >= 10 for child in tools["children"])
+    assert llm_node["attrs"] == {"prefill_ms": 120.0, "generate_ms": 2500.0, "eval_count": 50}
+    with timing.span("after-finish") as span:
+        assert not isinstance(span, timing.Span)
+
+
+@pytest.mark.asyncio
+async def test_agent_graph_reports_node_llm_and_tool_spans(monkeypatch: pytest.MonkeyPatch) -> None:
+    class ToolAwareLLM:
+        def __init__(self, *args, **kwargs) -> None:
+            self.calls = 0
+
+        def bind_tools(self, tools: list) -> "ToolAwareLLM":
+            return self
+
+        async def ainvoke(self, messages) -> AIMessage:
+            self.calls += 1
+            if self.calls == 1:
+                return AIMessage(
+                    content="",
+                    tool_calls=[{"id": "tool-1", "name": "calculator", "args": {"expression": "2+2"}}],
+                )
+            return AIMessage(content="4", response_metadata={"eval_duration": 1_000_000, "eval_count": 1})
+
+    monkeypatch.setattr(agent_graph, "ChatOllama", ToolAwareLLM)
+    monkeypatch.setattr(agent_graph, "get_tools", lambda: [calculator])
+    workflow = agent_graph.create_agent_graph("mock-model")
+
+    timeline = timing.Timeline("agent")
+    timeline.activate()
+    await workflow.ainvoke({
+        "messages": [HumanMessage(content="Compute 2+2")],
+        "reasoning_steps": [],
+        "tool_results": [],
+        "iteration_count": 0,
+    })
+    tree = timeline.finish()
+
+    assert [child["name"] for child in tree["children"]] == ["node:agent", "node:tools", "node:agent"]
+    assert [child["name"] for child in tree["children"][0]["children"]] == ["prompt", "llm"]
+    assert tree["children"][1]["children"][0]["name"] == "tool:calculator"
+    assert tree["children"][2]["children"][-1]["attrs"] == {"generate_ms": 1.0, "eval_count": 1}
@@ -0,0 +1,60 @@
+from typing import Any
+
+import pytest
+
+from src import warmup
+from src.config import OLLAMA_API_BASE
+
+
+class RecordingClient:
+    def __init__(self, failing_models: tuple[str, ...] = ()) -> None:
+        self.payloads: list[dict[str, Any]] = []
+        self.failing_models = failing_models
+
+    async def post(self, url: str, json: dict[str, Any], **kwargs: Any) -> "RecordingClient":
+        assert url == OLLAMA_API_BASE
+        self.payloads.append(json)
+        if json["model"] in self.failing_models:
+            msg = "model not found"
+            raise RuntimeError(msg)
+        return self
+
+    def raise_for_status(self) -> None:
+        return None
+
+
+def test_keep_alive_uses_per_model_overrides(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(warmup, "MODEL_KEEP_ALIVE", "30m")
+    monkeypatch.setattr(warmup, "MODEL_KEEP_ALIVE_OVERRIDES", {"pinned": "-1", "short": "5m"})
+
+    assert warmup.get_keep_alive("pinned") == -1
+    assert warmup.get_keep_alive("short") == "5m"
+    assert warmup.get_keep_alive("other") == "30m"
+
+
+@pytest.mark.asyncio
+async def test_load_and_unload_send_keep_alive(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = RecordingClient()
+    monkeypatch.setattr(warmup, "get_http_client", lambda: client)
+    monkeypatch.setattr(warmup, "MODEL_KEEP_ALIVE", "1h")
+
+    await warmup.load_model("m")
+    await warmup.unload_model("m")
+
+    assert client.payloads == [
+        {"model": "m", "messages": [], "keep_alive": "1h"},
+        {"model": "m", "messages": [], "keep_alive": 0},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_continues_after_a_failure(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = RecordingClient(failing_models=("broken",))
+    monkeypatch.setattr(warmup, "get_http_client", lambda: client)
+    monkeypatch.setattr(warmup, "WARMUP_MODELS", ["broken", "good"])
+
+    results = await warmup.warm_up_models()
+
+    assert results["good"] == "loaded"
+    assert results["broken"].startswith("error:")
+    assert [payload["model"] for payload in client.payloads] == ["broken", "good"]